@@ -9,10 +9,11 @@ class ProfileAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "user__email")
     list_select_related = ("user",)
     ordering = ("user__username",)
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("pending_requests_count", "unread_messages_count", "created_at", "updated_at")
     fieldsets = (
         ("Utilisateur", {"fields": ("user",)}),
         ("Données corporelles", {"fields": ("sex", "height_cm", "weight_kg", "goal")}),
+        ("Compteurs", {"fields": ("pending_requests_count", "unread_messages_count")}),
         ("Meta", {"fields": ("created_at", "updated_at")}),
     )
     autocomplete_fields = ("user",)  
\ No newline at end of file
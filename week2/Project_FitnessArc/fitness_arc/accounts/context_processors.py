@@ -1,27 +1,41 @@
-from .models import Friendship
+"""
+Variables globales des templates.
+
+Everything comes from the user's Profile (one query, cached on request.user
+and shared by the three processors), and only when a template actually uses
+a variable: the values are callables, resolved lazily by the template engine.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+
+
+def get_profile(request):
+    """Profile of the logged-in user, or None (anonymous, staff without profile)."""
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return None
+    try:
+        return user.profile
+    except ObjectDoesNotExist:
+        return None
+
 
 def friends_requests_count(request):
     """Returns the count of pending friend requests for the current user."""
-    if request.user.is_authenticated:
-        count = Friendship.objects.filter(to_user=request.user, status='pending').count()
-        return {'pending_requests_count': count}
-    return {'pending_requests_count': 0}
+    def count():
+        profile = get_profile(request)
+        return profile.pending_requests_count if profile else 0
+    return {'pending_requests_count': count}
 
 
 def user_features(request):
     """Returns which features are enabled for the current user."""
-    if request.user.is_authenticated and hasattr(request.user, 'profile'):
-        profile = request.user.profile
-        return {
-            'feature_workouts': profile.feature_workouts,
-            'feature_nutrition': profile.feature_nutrition,
-            'feature_running': profile.feature_running,
-            'feature_leaderboard': profile.feature_leaderboard,
-        }
-    # Show all features for anonymous users
+    def feature(name):
+        def enabled():
+            profile = get_profile(request)
+            # Show all features for anonymous users
+            return getattr(profile, name) if profile else True
+        return enabled
     return {
-        'feature_workouts': True,
-        'feature_nutrition': True,
-        'feature_running': True,
-        'feature_leaderboard': True,
-    }
\ No newline at end of file
+        name: feature(name)
+        for name in ('feature_workouts', 'feature_nutrition', 'feature_running', 'feature_leaderboard')
+    }
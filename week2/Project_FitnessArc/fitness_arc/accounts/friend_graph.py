@@ -0,0 +1,147 @@
+"""
+Graphe d'amitié : ensembles d'ids d'amis par utilisateur, en cache.
+
+friend_ids(user_id) is read from the Django cache and loaded from the
+accepted Friendship rows on a miss; the Friendship signals drop the entries
+of both users on every save/delete. A friend check is then a set lookup,
+and suggestions (friends of friends) need one cache get_many plus at most
+one query for the missing sets. Access checks and the friends list do not
+trust the cache and read the database (are_friends_db, friends_of).
+
+The default cache is per process: other workers only see a change when
+their entry expires (FRIEND_GRAPH_CACHE_SECONDS). A shared cache (Redis,
+see settings.CACHES) makes the invalidation immediate everywhere.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Friendship
+
+User = get_user_model()
+
+_KEY = "friend_graph:{}"
+
+
+def _key(user_id):
+    return _KEY.format(user_id)
+
+
+def _load(user_ids):
+    """{user_id: frozenset of friend ids} from the database, one query."""
+    friends = {user_id: set() for user_id in user_ids}
+    rows = (
+        Friendship.objects
+        .filter(status='accepted')
+        .filter(Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids))
+        .values_list('from_user_id', 'to_user_id')
+    )
+    for from_id, to_id in rows:
+        if from_id in friends:
+            friends[from_id].add(to_id)
+        if to_id in friends:
+            friends[to_id].add(from_id)
+    return {user_id: frozenset(ids) for user_id, ids in friends.items()}
+
+
+def friend_ids_many(user_ids):
+    """{user_id: frozenset of friend ids} for several users: one cache read, one query for the misses."""
+    user_ids = set(user_ids)
+    cached = cache.get_many([_key(user_id) for user_id in user_ids])
+    found = {user_id: cached[_key(user_id)] for user_id in user_ids if _key(user_id) in cached}
+    missing = user_ids - found.keys()
+    if missing:
+        loaded = _load(missing)
+        cache.set_many({_key(user_id): ids for user_id, ids in loaded.items()},
+                       timeout=settings.FRIEND_GRAPH_CACHE_SECONDS)
+        found.update(loaded)
+    return found
+
+
+def friend_ids(user_id):
+    """frozenset of the ids of a user's friends."""
+    return friend_ids_many([user_id])[user_id]
+
+
+def invalidate(*user_ids):
+    keys = [_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # A read between the write and its commit may have cached the old set again
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def friends_of(user):
+    """
+    Friends of `user` as a User queryset (profile joined), by username.
+    Read from the database: a worker's cached set may predate an unfriend.
+    """
+    accepted = Friendship.objects.filter(status='accepted')
+    return (
+        User.objects
+        .filter(Q(pk__in=accepted.filter(from_user=user).values('to_user_id'))
+                | Q(pk__in=accepted.filter(to_user=user).values('from_user_id')))
+        .select_related('profile')
+        .order_by('username')
+    )
+
+
+def remove_friendship(a, b):
+    """Delete every Friendship between `a` and `b` (either direction, any status)."""
+    deleted, _ = Friendship.objects.filter(
+        Q(from_user=a, to_user=b) | Q(from_user=b, to_user=a),
+    ).delete()
+    invalidate(a.pk, b.pk)
+    return deleted
+
+
+def are_friends(a, b):
+    """From the cached graph: for display only, may be FRIEND_GRAPH_CACHE_SECONDS old on other workers."""
+    return b.pk in friend_ids(a.pk)
+
+
+def are_friends_db(a, b):
+    """Accepted friendship read from the database, for access checks."""
+    return Friendship.objects.filter(
+        Q(from_user=a, to_user=b) | Q(from_user=b, to_user=a), status='accepted',
+    ).exists()
+
+
+def mutual_friends(a, b):
+    """Users who are friends with both `a` and `b`."""
+    ids = friend_ids_many([a.pk, b.pk])
+    return User.objects.filter(pk__in=ids[a.pk] & ids[b.pk]).order_by('username')
+
+
+def friend_suggestions(user, k=5):
+    """
+    Up to `k` friends of friends, most mutual friends first (then oldest
+    account). Users with a pending request either way are left out.
+    Each returned user has a `mutual_count` attribute.
+    """
+    mine = friend_ids(user.pk)
+    if not mine:
+        return []
+    counts = Counter()
+    for ids in friend_ids_many(mine).values():
+        counts.update(ids)
+
+    pending = Friendship.objects.filter(
+        Q(from_user=user) | Q(to_user=user), status='pending',
+    ).values_list('from_user_id', 'to_user_id')
+    excluded = mine | {user.pk} | {user_id for pair in pending for user_id in pair}
+    ranked = sorted(
+        ((count, user_id) for user_id, count in counts.items() if user_id not in excluded),
+        key=lambda item: (-item[0], item[1]),
+    )[:k]
+
+    users = User.objects.in_bulk([user_id for _, user_id in ranked])
+    suggestions = []
+    for count, user_id in ranked:
+        if user_id in users:
+            users[user_id].mutual_count = count
+            suggestions.append(users[user_id])
+    return suggestions
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:05
+
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_badge_counters(apps, schema_editor):
+    """Compteurs initiaux, en un UPDATE par compteur (same queries as the services, frozen here)."""
+    Profile = apps.get_model('accounts', 'Profile')
+    Friendship = apps.get_model('accounts', 'Friendship')
+    Message = apps.get_model('messaging', 'Message')
+
+    def count(queryset):
+        return Coalesce(Subquery(queryset.order_by().annotate(n=Func(F('pk'), function='COUNT')).values('n')), 0)
+
+    pending = Friendship.objects.filter(to_user_id=OuterRef('user_id'), status='pending')
+    unread = (
+        Message.objects
+        .filter(conversation__participants=OuterRef('user_id'), is_read=False)
+        .exclude(sender_id=OuterRef('user_id'))
+    )
+    Profile.objects.update(pending_requests_count=count(pending), unread_messages_count=count(unread))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_profile_feature_leaderboard_and_more'),
+        ('messaging', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='pending_requests_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='unread_messages_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_badge_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Index names on auth_user (the User model is not ours, hence raw SQL)
+PREFIX_INDEX = "accounts_user_username_prefix"
+TRIGRAM_INDEX = "accounts_user_username_trgm"
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Index de la recherche d'utilisateurs (accounts.services.search_users).
+    PostgreSQL: b-tree on UPPER(username) with text_pattern_ops for
+    istartswith, trigram GIN for icontains. SQLite: NOCASE index, which its
+    case-insensitive LIKE can use for prefixes.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} ON auth_user (UPPER("username"::text) text_pattern_ops)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON auth_user USING gin (UPPER("username"::text) gin_trgm_ops)'
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} ON auth_user ("username" COLLATE NOCASE)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    for name in (PREFIX_INDEX, TRIGRAM_INDEX):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_profile_badge_counters'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
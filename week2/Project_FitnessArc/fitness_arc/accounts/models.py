@@ -46,12 +46,29 @@ class Profile(models.Model):
     feature_running = models.BooleanField(default=True, help_text="Activer le module Running")
     feature_leaderboard = models.BooleanField(default=True, help_text="Activer le module Classement")
 
+    # Badge counters (denormalized), written only with UPDATE queries by the
+    # Friendship / Message signals: see accounts.services and messaging.services
+    pending_requests_count = models.PositiveIntegerField(default=0, editable=False)
+    unread_messages_count = models.PositiveIntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    COUNTER_FIELDS = ('pending_requests_count', 'unread_messages_count')
+
     def __str__(self) -> str:
         return f"Profile<{self.user.username}>"
 
+    def save(self, *args, **kwargs):
+        # A full save of an existing profile must not overwrite the counters
+        # with the (possibly stale) values loaded earlier in the request
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Friendship(models.Model):
     """Friendship between two users with pending/accepted/rejected status."""
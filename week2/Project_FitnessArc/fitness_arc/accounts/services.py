@@ -0,0 +1,68 @@
+"""
+Compteurs dénormalisés du Profile (badges de la barre de navigation)
+et recherche d'utilisateurs.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, Func, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Upper
+
+from .models import Friendship, Profile
+
+User = get_user_model()
+
+SEARCH_PAGE_SIZE = 20
+# Shorter queries only match username prefixes (trigrams need 3 characters)
+SEARCH_MIN_SUBSTRING = 3
+
+
+def count_subquery(queryset):
+    """COUNT(*) of a correlated queryset as a scalar subquery (no GROUP BY)."""
+    return Coalesce(
+        Subquery(queryset.order_by().annotate(n=Func(F('pk'), function='COUNT')).values('n')),
+        0,
+    )
+
+
+def refresh_pending_requests(user_ids):
+    """Recount the pending friend requests received by these users, in one UPDATE."""
+    pending = Friendship.objects.filter(to_user_id=OuterRef('user_id'), status='pending')
+    Profile.objects.filter(user_id__in=user_ids).update(pending_requests_count=count_subquery(pending))
+
+
+def search_users(user, query, page=1, size=SEARCH_PAGE_SIZE):
+    """
+    Comptes que `user` peut ajouter, dont le nom contient `query`.
+    Friends, pending requests (either way), the user itself, staff and
+    inactive accounts are excluded in SQL. Prefix matches come first.
+    Served by the indexes of migration accounts 0007 (UPPER(username)
+    prefix b-tree, trigram GIN on PostgreSQL).
+    Returns (users, has_next); no COUNT, one query per page.
+    """
+    query = query.strip()
+    if not query:
+        return [], False
+    linked = ('accepted', 'pending')
+    candidates = (
+        User.objects
+        .filter(is_active=True, is_staff=False, is_superuser=False)
+        .exclude(pk=user.pk)
+        .exclude(pk__in=Friendship.objects.filter(from_user=user, status__in=linked).values('to_user_id'))
+        .exclude(pk__in=Friendship.objects.filter(to_user=user, status__in=linked).values('from_user_id'))
+    )
+    if len(query) < SEARCH_MIN_SUBSTRING:
+        # Index order: the first page stops after `size` rows
+        matches = candidates.filter(username__istartswith=query).order_by(Upper('username'), 'pk')
+    else:
+        matches = (
+            candidates
+            .filter(username__icontains=query)
+            .annotate(rank=Case(
+                When(username__istartswith=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ))
+            .order_by('rank', Upper('username'), 'pk')
+        )
+    offset = (max(page, 1) - 1) * size
+    rows = list(matches.only('id', 'username')[offset:offset + size + 1])
+    return rows[:size], len(rows) > size
@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
-from .models import Profile
+from . import friend_graph
+from .models import Friendship, Profile
+from .services import refresh_pending_requests
 
 User = get_user_model()
 
@@ -23,3 +25,25 @@ def ensure_and_save_profile(sender, instance, **kwargs):
     if not instance.is_superuser and not instance.is_staff:
         Profile.objects.get_or_create(user=instance)
         instance.profile.save()
+
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def refresh_pending_requests_count(sender, instance, **kwargs):
+    """Recompte les demandes en attente du destinataire (badge de la navbar)."""
+    refresh_pending_requests([instance.to_user_id])
+
+
+@receiver(post_save, sender=User)
+def forget_cached_friends(sender, instance, created, **kwargs):
+    # A reused id (e.g. after a rolled back transaction) must not inherit a cached friend set
+    if created:
+        friend_graph.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def invalidate_friend_graph(sender, instance, **kwargs):
+    """Les ensembles d'amis en cache des deux utilisateurs sont périmés."""
+    friend_graph.invalidate(instance.from_user_id, instance.to_user_id)
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts import friend_graph
+from accounts.models import Friendship
+
+
+class FriendGraphTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.me, self.ann, self.ben, self.cat, self.dan = (
+            User.objects.create_user(username=name, password="x")
+            for name in ("me", "ann", "ben", "cat", "dan")
+        )
+        for a, b in ((self.me, self.ann), (self.me, self.ben), (self.ann, self.cat),
+                     (self.ben, self.cat), (self.ann, self.dan)):
+            Friendship.objects.create(from_user=a, to_user=b, status="accepted")
+
+    def test_friend_checks_are_served_from_the_cache(self):
+        self.assertEqual(friend_graph.friend_ids(self.me.pk), {self.ann.pk, self.ben.pk})
+        with self.assertNumQueries(0):
+            self.assertTrue(friend_graph.are_friends(self.me, self.ann))
+            self.assertFalse(friend_graph.are_friends(self.me, self.cat))
+
+    def test_friendship_changes_invalidate_both_users(self):
+        self.assertFalse(friend_graph.are_friends(self.cat, self.me))
+        Friendship.objects.create(from_user=self.cat, to_user=self.me, status="accepted")
+        self.assertTrue(friend_graph.are_friends(self.me, self.cat))
+
+        Friendship.objects.filter(from_user=self.me, to_user=self.ann).delete()
+        self.assertFalse(friend_graph.are_friends(self.ann, self.me))
+
+    def test_mutual_friends_and_suggestions(self):
+        self.assertEqual(list(friend_graph.mutual_friends(self.me, self.cat)), [self.ann, self.ben])
+
+        suggestions = friend_graph.friend_suggestions(self.me, k=5)
+        self.assertEqual(suggestions, [self.cat, self.dan])
+        self.assertEqual(suggestions[0].mutual_count, 2)
+
+        # A pending request is not suggested again
+        Friendship.objects.create(from_user=self.me, to_user=self.cat)
+        self.assertEqual(friend_graph.friend_suggestions(self.me), [self.dan])
+
+    def test_friend_dashboard_requires_friendship(self):
+        self.client.force_login(self.me)
+        resp = self.client.get(reverse("accounts:friend_dashboard", args=[self.cat.pk]))
+        self.assertRedirects(resp, reverse("accounts:friends_list"))
+        resp = self.client.get(reverse("accounts:friends_list"))
+        self.assertEqual([u.pk for u in resp.context["friends"]], [self.ann.pk, self.ben.pk])
+        self.assertContains(resp, "2 amis en commun")
+
+    def test_friend_dashboard_checks_the_database_not_the_cache(self):
+        self.client.force_login(self.me)
+        self.assertTrue(friend_graph.are_friends(self.me, self.ann))
+        # As if another worker had the unfriend: queryset update sends no signal, the cache is stale
+        Friendship.objects.filter(from_user=self.me, to_user=self.ann).update(status="rejected")
+        self.assertTrue(friend_graph.are_friends(self.me, self.ann))
+
+        resp = self.client.get(reverse("accounts:friend_dashboard", args=[self.ann.pk]))
+        self.assertRedirects(resp, reverse("accounts:friends_list"))
+
+    def test_friends_list_reads_the_database_not_the_cache(self):
+        self.client.force_login(self.me)
+        self.assertTrue(friend_graph.are_friends(self.me, self.ann))
+        Friendship.objects.filter(from_user=self.me, to_user=self.ann).update(status="rejected")
+
+        resp = self.client.get(reverse("accounts:friends_list"))
+        self.assertEqual([u.pk for u in resp.context["friends"]], [self.ben.pk])
+
+    def test_remove_friend_deletes_both_directions(self):
+        Friendship.objects.create(from_user=self.ann, to_user=self.me, status="pending")
+        self.client.force_login(self.me)
+        self.client.get(reverse("accounts:remove_friend", args=[self.ann.pk]))
+
+        self.assertFalse(Friendship.objects.filter(from_user__in=[self.me, self.ann],
+                                                   to_user__in=[self.me, self.ann]).exists())
+        self.assertFalse(friend_graph.are_friends(self.me, self.ann))
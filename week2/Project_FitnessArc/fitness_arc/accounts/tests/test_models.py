@@ -1,6 +1,8 @@
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 from django.contrib.auth import get_user_model
-from accounts.models import Profile
+from accounts.context_processors import friends_requests_count, user_features
+from accounts.models import Friendship, Profile
+from messaging.context_processors import unread_messages
 
 
 class ProfileModelTests(TestCase):
@@ -15,3 +17,43 @@ class ProfileModelTests(TestCase):
         User = get_user_model()
         u = User.objects.create_user(username="alice", password="x")
         self.assertEqual(str(u.profile), f"Profile<{u.username}>")
+
+
+class BadgeCountersTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user(username="alice", password="x")
+        self.bob = User.objects.create_user(username="bob", password="x")
+
+    def test_pending_requests_count_follows_friendships(self):
+        friendship = Friendship.objects.create(from_user=self.alice, to_user=self.bob)
+        self.bob.profile.refresh_from_db()
+        self.assertEqual(self.bob.profile.pending_requests_count, 1)
+
+        friendship.status = 'accepted'
+        friendship.save()
+        self.bob.profile.refresh_from_db()
+        self.assertEqual(self.bob.profile.pending_requests_count, 0)
+
+    def test_profile_save_keeps_counters(self):
+        profile = Profile.objects.get(user=self.bob)
+        Friendship.objects.create(from_user=self.alice, to_user=self.bob)
+        # Stale in-memory counter: a full save must not write it back
+        profile.goal = 'cut'
+        profile.save()
+        self.assertEqual(Profile.objects.get(user=self.bob).pending_requests_count, 1)
+
+    def test_context_processors_are_lazy(self):
+        Friendship.objects.create(from_user=self.alice, to_user=self.bob)
+        request = RequestFactory().get("/")
+        request.user = get_user_model().objects.get(pk=self.bob.pk)
+
+        with self.assertNumQueries(0):
+            context = {}
+            for processor in (friends_requests_count, user_features, unread_messages):
+                context.update(processor(request))
+        # One Profile query, shared by every variable
+        with self.assertNumQueries(1):
+            self.assertEqual(context['pending_requests_count'](), 1)
+            self.assertEqual(context['unread_messages_count'](), 0)
+            self.assertTrue(context['feature_running']())
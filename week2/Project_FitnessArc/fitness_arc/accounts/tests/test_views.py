@@ -1,7 +1,7 @@
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from accounts.models import Profile
+from accounts.models import Friendship, Profile
 
 
 class AccountsViewsTests(TestCase):
@@ -71,3 +71,39 @@ class AccountsViewsTests(TestCase):
         self.assertEqual(u.profile.height_cm, 170)
         self.assertEqual(str(u.profile.weight_kg), "60.00")
         self.assertEqual(u.profile.goal, "cut")
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.me = User.objects.create_user(username="me", password="x")
+        for name in ("marc", "marie", "anne-marie", "maxime", "staff_mark"):
+            User.objects.create_user(username=name, password="x", is_staff=name.startswith("staff"))
+        self.client.force_login(self.me)
+        self.url = reverse("accounts:user_search")
+
+    def _names(self, **params):
+        return [r["username"] for r in self.client.get(self.url, params).json()["results"]]
+
+    def test_prefix_matches_come_before_substring_matches(self):
+        self.assertEqual(self._names(q="mar"), ["marc", "marie", "anne-marie"])
+        # Short queries only match prefixes
+        self.assertEqual(self._names(q="ma"), ["marc", "marie", "maxime"])
+
+    def test_friends_and_pending_requests_are_excluded(self):
+        User = get_user_model()
+        Friendship.objects.create(from_user=self.me, to_user=User.objects.get(username="marc"), status="accepted")
+        Friendship.objects.create(from_user=User.objects.get(username="marie"), to_user=self.me)
+
+        self.assertEqual(self._names(q="mar"), ["anne-marie"])
+
+    def test_results_are_paginated(self):
+        User = get_user_model()
+        User.objects.bulk_create([User(username=f"zed{i:02d}") for i in range(25)])
+
+        first = self.client.get(self.url, {"q": "zed"}).json()
+        second = self.client.get(self.url, {"q": "zed", "page": 2}).json()
+        self.assertEqual(len(first["results"]), 20)
+        self.assertTrue(first["has_next"])
+        self.assertEqual([r["username"] for r in second["results"]], [f"zed{i}" for i in range(20, 25)])
+        self.assertFalse(second["has_next"])
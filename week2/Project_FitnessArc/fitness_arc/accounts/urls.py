@@ -40,6 +40,7 @@ urlpatterns = [
     
     # Friends URLs
     path("friends/", views.friends_list, name="friends_list"),
+    path("friends/search/", views.user_search, name="user_search"),
     path("friends/send/<int:user_id>/", views.send_friend_request, name="send_friend_request"),
     path("friends/accept/<int:friendship_id>/", views.accept_friend_request, name="accept_friend_request"),
     path("friends/reject/<int:friendship_id>/", views.reject_friend_request, name="reject_friend_request"),
@@ -3,6 +3,7 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth.models import User  
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.views import View
@@ -24,8 +25,10 @@ from django.contrib.auth.views import PasswordChangeView
 from django.urls import reverse
 from .tokens import activation_token
 from .forms import SignupForm, ProfileForm
+from . import friend_graph
 from .models import Profile, Friendship
-from messaging.models import Message
+from .services import search_users
+from messaging.models import ConversationParticipant
 
 import logging
 logger = logging.getLogger(__name__)
@@ -99,28 +102,21 @@ class ProfileEditView(LoginRequiredMixin, UpdateView):
 def friends_list(request):
     """List of friends and pending requests."""
     """Liste des amis + demandes en attente+messages non lus"""
-    friends = User.objects.filter(
-        Q(friendships_received__from_user=request.user, friendships_received__status='accepted') |
-        Q(friendships_sent__to_user=request.user, friendships_sent__status='accepted')
-    ).distinct()
+    friends = list(friend_graph.friends_of(request.user))
     
     pending_requests = Friendship.objects.filter(to_user=request.user, status='pending')
     
     sent_requests = Friendship.objects.filter(from_user=request.user, status='pending')
     
-    # Exclude current user and admin/staff accounts
-    all_users = User.objects.exclude(pk=request.user.pk).exclude(is_superuser=True).exclude(is_staff=True).order_by('username')
-
-    # messages non lu par l'utilisateur
-    unread_qs = (
-        Message.objects
-        .filter(conversation__participants=request.user, is_read=False)
-        .exclude(sender=request.user)
-    )
-
-    # ID de qui a envoye message
+    # Conversations avec des messages non lus, puis leurs autres participants
+    unread_conversations = ConversationParticipant.objects.filter(
+        user=request.user, unread_count__gt=0,
+    ).values('conversation_id')
     unread_sender_ids = set(
-        unread_qs.values_list('sender_id', flat=True).distinct()
+        ConversationParticipant.objects
+        .filter(conversation_id__in=unread_conversations)
+        .exclude(user=request.user)
+        .values_list('user_id', flat=True)
     )
     
     for f in friends:
@@ -131,10 +127,34 @@ def friends_list(request):
         'friends': friends,
         'pending_requests': pending_requests,
         'sent_requests': sent_requests,
-        'all_users': all_users,
+        'suggestions': friend_graph.friend_suggestions(request.user),
     }
     return render(request, 'accounts/friends_list.html', context)
 
+@login_required
+def user_search(request):
+    """
+    Recherche d'utilisateurs à ajouter (JSON, pour la saisie au fil de l'eau).
+    ?q=<texte>&page=<n>
+    """
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return JsonResponse({"error": "Page invalide"}, status=400)
+    users, has_next = search_users(request.user, request.GET.get('q', ''), page=page)
+    return JsonResponse({
+        "results": [
+            {
+                "id": u.pk,
+                "username": u.username,
+                "add_url": reverse('accounts:send_friend_request', args=[u.pk]),
+            }
+            for u in users
+        ],
+        "page": page,
+        "has_next": has_next,
+    })
+
 @login_required
 def send_friend_request(request, user_id):
     """Send friend request to another user"""
@@ -144,6 +164,10 @@ def send_friend_request(request, user_id):
         messages.error(request, "Vous ne pouvez pas vous ajouter vous-même !")
         return redirect('accounts:friends_list')
     
+    if friend_graph.are_friends(request.user, to_user):
+        messages.info(request, f"Vous êtes déjà ami avec {to_user.username}")
+        return redirect('accounts:friends_list')
+
     # Check if a relationship already exists (in both directions)
     existing = Friendship.objects.filter(
         Q(from_user=request.user, to_user=to_user) |
@@ -193,10 +217,7 @@ def reject_friend_request(request, friendship_id):
 def remove_friend(request, user_id):
     """Remove a friend"""
     friend = get_object_or_404(User, pk=user_id)
-    Friendship.objects.filter(
-        Q(from_user=request.user, to_user=friend) |
-        Q(from_user=friend, to_user=request.user)
-    ).delete()
+    friend_graph.remove_friendship(request.user, friend)
     messages.success(request, f"{friend.username} retiré de vos amis")
     return redirect('accounts:friends_list')
 
@@ -205,12 +226,8 @@ def friend_dashboard(request, user_id):
     """View a friend's dashboard"""
     friend = get_object_or_404(User, pk=user_id)
     
-    is_friend = Friendship.objects.filter(
-        Q(from_user=request.user, to_user=friend, status='accepted') |
-        Q(from_user=friend, to_user=request.user, status='accepted')
-    ).exists()
-    
-    if not is_friend:
+    # Database check: the cached graph may not have seen an unfriend yet
+    if not friend_graph.are_friends_db(request.user, friend):
         messages.error(request, "Vous devez être ami avec cet utilisateur pour voir son dashboard")
         return redirect('accounts:friends_list')
     
@@ -0,0 +1,247 @@
+"""
+Outils de benchmark : génération de données synthétiques en masse et
+requêtes "chaudes" des vues principales (pour EXPLAIN / mesures).
+
+Seeding uses chunked bulk_create only (no per-row signals); the denormalized
+data (session totals, PRs, DailyUserStats, leaderboard snapshot) is filled
+in directly or rebuilt at the end.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from accounts import friend_graph
+from accounts.models import Friendship, Profile
+from accounts.services import refresh_pending_requests
+from dashboard.models import DailyUserStats
+from dashboard.services import day_start, rebuild_daily_stats
+from messaging.models import Conversation, ConversationParticipant, Message
+from messaging.services import refresh_unread_counts, refresh_unread_messages
+from nutrition.models import Food, FoodLog
+from running.models import Run
+from workouts.models import PR, Exercise, PRHistory, SetLog, WorkoutSession
+from workouts.pr_engine import rebuild_pr_history
+
+User = get_user_model()
+
+BENCH_PASSWORD = "bench-pass-123"
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _bench_exercises(count=12):
+    """Exercises used by the synthetic sessions (created once, reused)."""
+    groups = ["chest", "back", "legs", "shoulders", "arms", "core"]
+    exercises = []
+    for i in range(count):
+        exercise, _ = Exercise.objects.get_or_create(
+            slug=f"bench-exercise-{i}",
+            defaults={"name": f"Bench exercise {i}", "muscle_group": groups[i % len(groups)], "equipment": "barbell"},
+        )
+        exercises.append(exercise)
+    return exercises
+
+
+def _bench_foods(count=30):
+    foods = []
+    for i in range(count):
+        food, _ = Food.objects.get_or_create(
+            slug=f"bench-food-{i}",
+            defaults={
+                "name": f"Bench food {i}",
+                "kcal_per_100g": Decimal(50 + i * 10),
+                "protein_per_100g": Decimal(i % 25),
+                "carbs_per_100g": Decimal((i * 3) % 60),
+                "fat_per_100g": Decimal(i % 15),
+            },
+        )
+        foods.append(food)
+    return foods
+
+
+def seed_synthetic_data(users=100, days=90, prefix="bench", friends_per_user=5,
+                        messages_per_user=10, chunk_size=2000, seed=42, log=None):
+    """
+    Generate `users` synthetic users with `days` of history each: sessions
+    (3-4 per week) with set logs, 3 food logs a day, 2 runs a week, PRs,
+    friendships and conversations with messages.
+    Returns the list of created user ids.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    today = timezone.localdate()
+    start_index = User.objects.filter(username__startswith=f"{prefix}_").count()
+    password = make_password(BENCH_PASSWORD)
+    exercises = _bench_exercises()
+    foods = _bench_foods()
+
+    with transaction.atomic():
+        new_users = [
+            User(username=f"{prefix}_{start_index + i}", email=f"{prefix}_{start_index + i}@example.com", password=password)
+            for i in range(users)
+        ]
+        for chunk in _chunks(new_users, chunk_size):
+            User.objects.bulk_create(chunk)
+        user_ids = list(
+            User.objects.filter(username__in=[u.username for u in new_users]).values_list("pk", flat=True)
+        )
+        Profile.objects.bulk_create([Profile(user_id=uid) for uid in user_ids], batch_size=chunk_size)
+        log(f"{len(user_ids)} utilisateurs")
+
+        # Sessions first (their pks are needed by the set logs)
+        sessions, session_sets = [], []
+        for uid in user_ids:
+            for offset in range(days):
+                if rng.random() > 0.5:
+                    continue
+                day = today - timedelta(days=offset)
+                sets = [
+                    (rng.choice(exercises), n, rng.randint(3, 12), Decimal(rng.randrange(20, 160, 5)))
+                    for n in range(1, rng.randint(6, 18))
+                ]
+                sessions.append(WorkoutSession(
+                    owner_id=uid, is_completed=offset > 0 or rng.random() > 0.5,
+                    duration_minutes=rng.randint(30, 90),
+                    total_volume=float(sum(w * r for _, _, r, w in sets)),
+                    total_sets=len(sets), total_reps=sum(r for _, _, r, _ in sets),
+                ))
+                session_sets.append((day, sets))
+        for chunk in _chunks(sessions, chunk_size):
+            WorkoutSession.objects.bulk_create(chunk)
+        # date is auto_now_add: set the real dates afterwards
+        for session, (day, _) in zip(sessions, session_sets):
+            session.date = day
+        for chunk in _chunks(sessions, chunk_size):
+            WorkoutSession.objects.bulk_update(chunk, ["date"])
+        log(f"{len(sessions)} séances")
+
+        set_logs = [
+            SetLog(session=session, exercise=exercise, set_number=n, reps=reps, weight_kg=weight)
+            for session, (day, sets) in zip(sessions, session_sets)
+            for exercise, n, reps, weight in sets
+        ]
+        for chunk in _chunks(set_logs, chunk_size):
+            SetLog.objects.bulk_create(chunk)
+        # PR history replayed by pr_engine (every metric, est_1rm included),
+        # the PRs are its best values: both always match
+        history_count = rebuild_pr_history(user_ids)
+        # Replayed in date order: the last row of each record is its best
+        best = {
+            (row["owner_id"], row["exercise_id"], row["metric"]): row
+            for row in PRHistory.objects.filter(owner_id__in=user_ids)
+            .values("owner_id", "exercise_id", "metric", "value", "date").order_by("date", "id")
+        }
+        prs = [PR(owner_id=row["owner_id"], exercise_id=row["exercise_id"], metric=row["metric"],
+                  value=row["value"], date=row["date"])
+               for row in best.values()]
+        PR.objects.bulk_create(prs, batch_size=chunk_size)
+        log(f"{len(set_logs)} séries, {len(prs)} PR, {history_count} lignes d'historique")
+
+        food_logs = [
+            FoodLog(owner_id=uid, date=today - timedelta(days=offset), food=rng.choice(foods),
+                    quantity=Decimal(rng.randrange(50, 400, 10)), meal_type=meal)
+            for uid in user_ids
+            for offset in range(days)
+            for meal in ("breakfast", "lunch", "dinner")
+        ]
+        for food_log in food_logs:
+            food_log.compute_macros()
+        for chunk in _chunks(food_logs, chunk_size):
+            FoodLog.objects.bulk_create(chunk)
+        log(f"{len(food_logs)} repas")
+
+        runs = []
+        for uid in user_ids:
+            for offset in range(0, days, 3):
+                distance = rng.randint(3000, 15000)
+                moving = int(distance * rng.uniform(0.25, 0.4))
+                start = timezone.make_aware(datetime.combine(today - timedelta(days=offset), time(7, 30)))
+                runs.append(Run(
+                    user_id=uid, source="strava", name="Bench run", distance_m=distance,
+                    moving_time_s=moving, elapsed_time_s=moving + 60, start_date=start,
+                    calories_burned=distance * 0.06,
+                ))
+        for chunk in _chunks(runs, chunk_size):
+            Run.objects.bulk_create(chunk)
+        log(f"{len(runs)} courses")
+
+        friendships, pairs = [], set()
+        for uid in user_ids:
+            for other in rng.sample(user_ids, min(friends_per_user, len(user_ids) - 1) + 1):
+                pair = (min(uid, other), max(uid, other))
+                if other == uid or pair in pairs:
+                    continue
+                pairs.add(pair)
+                friendships.append(Friendship(from_user_id=uid, to_user_id=other, status="accepted"))
+        Friendship.objects.bulk_create(friendships, batch_size=chunk_size)
+        friend_graph.invalidate(*user_ids)
+
+        conversations = [Conversation(pair_key=f"{low}:{high}") for low, high in pairs]
+        Conversation.objects.bulk_create(conversations, batch_size=chunk_size)
+        per_conversation = max(1, messages_per_user * len(user_ids) // max(1, len(pairs)))
+        messages = [
+            Message(conversation=conv, sender_id=pair[i % 2], text=f"Message {i}")
+            for conv, pair in zip(conversations, pairs)
+            for i in range(per_conversation)
+        ]
+        for chunk in _chunks(messages, chunk_size):
+            Message.objects.bulk_create(chunk)
+        # The members have read a random prefix (60-100%) of their conversation
+        read_upto = {}
+        for start in range(0, len(messages), per_conversation):
+            block = messages[start:start + per_conversation]
+            read_upto[block[0].conversation_id] = block[max(0, int(len(block) * rng.uniform(0.6, 1.0)) - 1)].pk
+        ConversationParticipant.objects.bulk_create(
+            [ConversationParticipant(conversation_id=conv.pk, user_id=uid, last_read_message_id=read_upto.get(conv.pk, 0))
+             for conv, pair in zip(conversations, pairs) for uid in pair],
+            batch_size=chunk_size,
+        )
+        # bulk_create skips the signals that maintain the unread and badge counters
+        for chunk in _chunks([conv.pk for conv in conversations], 500):
+            refresh_unread_counts(chunk)
+        for chunk in _chunks(user_ids, 500):
+            refresh_pending_requests(chunk)
+            refresh_unread_messages(chunk)
+        log(f"{len(friendships)} amitiés, {len(messages)} messages")
+
+        for chunk in _chunks(user_ids, 200):
+            rebuild_daily_stats(chunk)
+        log(f"{DailyUserStats.objects.filter(user_id__in=user_ids).count()} lignes DailyUserStats")
+
+    return user_ids
+
+
+def hot_queries(user):
+    """
+    The per-user queries of the hot views (dashboard, leaderboard, nutrition,
+    running, messaging), as (label, queryset) pairs for EXPLAIN.
+    """
+    today = timezone.localdate()
+    month_ago = today - timedelta(days=30)
+    week_ago = today - timedelta(days=7)
+    return [
+        ("dashboard: sessions since a date",
+         WorkoutSession.objects.filter(owner=user, date__gte=week_ago).values("date", "is_completed")),
+        ("dashboard: completed history",
+         WorkoutSession.objects.filter(owner=user, date__gte=month_ago, is_completed=True).order_by("-date")[:10]),
+        ("dashboard: rollup rows",
+         DailyUserStats.objects.filter(user=user, date__gte=month_ago)),
+        ("dashboard: recent PRs",
+         PR.objects.filter(owner=user).order_by("-date")[:5]),
+        ("nutrition_today: today's logs",
+         FoodLog.objects.filter(owner=user, date=today)),
+        ("my_runs: latest runs",
+         Run.objects.filter(user=user).order_by("-start_date")),
+        ("dashboard: runs of a day range",
+         Run.objects.filter(user=user, start_date__gte=day_start(week_ago))),
+        ("friends_list: conversations with unread messages",
+         ConversationParticipant.objects.filter(user=user, unread_count__gt=0)),
+    ]
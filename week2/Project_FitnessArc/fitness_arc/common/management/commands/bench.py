@@ -0,0 +1,117 @@
+"""
+Commande de management qui chronomètre les vues principales via le client de
+test Django et affiche un rapport JSON (requêtes SQL, percentiles de temps,
+pic mémoire) à comparer d'un commit à l'autre.
+
+    python manage.py seed_benchmark --users 1000
+    python manage.py bench --runs 30 --output bench.json
+"""
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+User = get_user_model()
+
+# URL names of the hot views
+VIEWS = [
+    "dashboard:index",
+    "leaderboard:index",
+    "nutrition_today",
+    "recipe_list",
+    "workouts:exercise_list",
+    "accounts:friends_list",
+    "messaging:inbox",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Chronomètre les vues principales et affiche un rapport JSON (requêtes, temps, mémoire)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Utilisateur connecté (défaut: premier utilisateur bench_)')
+        parser.add_argument('--runs', type=int, default=20, help='Mesures par vue (défaut: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Requêtes de chauffe par vue (défaut: 2)')
+        parser.add_argument('--views', nargs='*', default=VIEWS, help='Noms d\'URL à mesurer')
+        parser.add_argument('--output', type=str, help='Écrire aussi le rapport JSON dans ce fichier')
+
+    def handle(self, *args, **options):
+        user = self._pick_user(options.get('user'))
+        hosts = [h for h in settings.ALLOWED_HOSTS if h and h != '*']
+        client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost', raise_request_exception=False)
+        client.force_login(user)
+
+        report = {
+            "database": connection.vendor,
+            "user": user.username,
+            "runs": options['runs'],
+            "views": {},
+        }
+        for name in options['views']:
+            report["views"][name] = self._bench_view(client, reverse(name), options['runs'], options['warmup'])
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options.get('output'):
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"✅ Rapport écrit dans {options['output']}"))
+
+    def _pick_user(self, username):
+        users = User.objects.filter(is_superuser=False)
+        user = users.filter(username=username).first() if username else (
+            users.filter(username__startswith='bench_').order_by('pk').first() or users.order_by('pk').first()
+        )
+        if user is None:
+            raise CommandError("Aucun utilisateur : lancez d'abord `python manage.py seed_benchmark`")
+        return user
+
+    def _bench_view(self, client, url, runs, warmup):
+        for _ in range(warmup):
+            client.get(url)
+
+        timings = []
+        for _ in range(max(1, runs)):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # execute_wrapper rather than queries_log: with DEBUG the log is capped
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            client.get(url)
+
+        # Separate run: tracemalloc slows the request down
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "url": url,
+            "status": response.status_code,
+            "queries": len(queries),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p90_ms": round(percentile(timings, 90), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "max_ms": round(max(timings), 2),
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
@@ -0,0 +1,147 @@
+"""
+Commande de management qui affiche les plans EXPLAIN (et le temps moyen) des
+requêtes chaudes avec et sans les index composites des vues principales.
+Fonctionne sous SQLite et PostgreSQL : tout (génération --seed comprise, puis
+suppression des index) se fait dans une transaction annulée à la fin, la base
+n'est jamais modifiée.
+
+Never run it against production: on PostgreSQL the DROP INDEX statements
+hold ACCESS EXCLUSIVE locks on the live tables until the rollback, which
+blocks every read and write of these tables for the whole run. It refuses
+to run unless DEBUG is on or --allow-drop-indexes is given.
+
+    python manage.py explain_hot_queries --seed 200
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from common.benchmark import hot_queries, seed_synthetic_data
+from messaging.models import Message
+from nutrition.models import FoodLog
+from running.models import Run
+from workouts.models import PR, WorkoutSession
+
+User = get_user_model()
+
+# Models whose Meta.indexes serve the hot per-user date-range filters
+INDEXED_MODELS = [WorkoutSession, PR, FoodLog, Run, Message]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Affiche les plans EXPLAIN des requêtes chaudes avant/après les index composites'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Générer d\'abord N utilisateurs synthétiques, supprimés à la fin (défaut: 0)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=180,
+            help='Jours d\'historique par utilisateur généré (défaut: 180)',
+        )
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Utilisateur dont on explique les requêtes (défaut: le plus actif)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Nombre d\'exécutions pour le temps moyen (défaut: 20)',
+        )
+        parser.add_argument(
+            '--allow-drop-indexes',
+            action='store_true',
+            help='Autoriser la suppression temporaire des index sans DEBUG (jamais en production : verrouille les tables)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_drop_indexes']:
+            raise CommandError(
+                "DEBUG est désactivé : cette commande verrouille les tables le temps de la mesure "
+                "(DROP INDEX). Jamais en production ; sur une base de test, ajoutez --allow-drop-indexes"
+            )
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.stdout.write(f"Génération de {options['seed']} utilisateurs (annulée à la fin)...")
+                    seed_synthetic_data(users=options['seed'], days=options['days'],
+                                        log=lambda m: self.stdout.write(f"  → {m}"))
+
+                user = self._pick_user(options.get('user'))
+                queries = hot_queries(user)
+                self.stdout.write(f"Base : {connection.vendor} — utilisateur : {user.username}\n")
+
+                after = {label: self._measure(qs, options['repeat'], 'with indexes') for label, qs in queries}
+                self._drop_indexes()
+                before = {label: self._measure(qs, options['repeat'], 'without indexes') for label, qs in queries}
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for label, _ in queries:
+            plan_before, ms_before = before[label]
+            plan_after, ms_after = after[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"■ {label}"))
+            self.stdout.write(f"  Sans index ({ms_before:.2f} ms):")
+            self.stdout.write(self._indent(plan_before))
+            self.stdout.write(f"  Avec index ({ms_after:.2f} ms):")
+            self.stdout.write(self._indent(plan_after))
+            self.stdout.write("")
+
+        self.stdout.write(self.style.SUCCESS("✅ Terminé (base inchangée : données et index restaurés)"))
+
+    def _pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Utilisateur "{username}" introuvable')
+        user = (
+            WorkoutSession.objects.values_list('owner', flat=True)
+            .order_by().distinct().first()
+        )
+        if user is None:
+            raise CommandError("Aucune séance en base : utilisez --seed N")
+        return User.objects.get(pk=user)
+
+    def _drop_indexes(self):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {quote(index.name)}")
+
+    def _measure(self, queryset, repeat, phase):
+        """
+        EXPLAIN + mean execution time of the raw SQL. The phase is added as a
+        comment so the driver's statement cache (sqlite3) does not hand back
+        a plan prepared before the indexes were dropped.
+        """
+        sql, params = queryset.query.sql_with_params()
+        sql = f"/* {phase} */ {sql}"
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            plan = "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+            started = time.perf_counter()
+            for _ in range(max(1, repeat)):
+                cursor.execute(sql, params)
+                cursor.fetchall()
+        return plan, (time.perf_counter() - started) * 1000 / max(1, repeat)
+
+    def _indent(self, text):
+        return "\n".join(f"    {line}" for line in text.splitlines())
@@ -0,0 +1,43 @@
+"""
+Commande de management qui rejoue les vues principales dans ce processus et
+affiche l'agrégat de PerfMiddleware en JSON (requêtes SQL, temps, N+1).
+The aggregate is per process: on a running server, read it on /perf/ instead.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from common.management.commands.bench import VIEWS
+from common.middleware import registry
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Affiche les statistiques de PerfMiddleware (requêtes SQL, temps, N+1) par vue, en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Utilisateur connecté pour rejouer les vues')
+        parser.add_argument('--runs', type=int, default=5, help='Requêtes par vue (défaut: 5)')
+        parser.add_argument('--views', nargs='*', default=VIEWS, help='Noms d\'URL à rejouer')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_superuser=False)
+        user = users.filter(username=options['user']).first() if options.get('user') else users.order_by('pk').first()
+        if user is None:
+            raise CommandError("Aucun utilisateur pour rejouer les vues")
+
+        hosts = [h for h in settings.ALLOWED_HOSTS if h and h != '*']
+        client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost', raise_request_exception=False)
+        client.force_login(user)
+
+        registry.reset()
+        for name in options['views']:
+            for _ in range(max(1, options['runs'])):
+                client.get(reverse(name))
+
+        self.stdout.write(json.dumps(registry.snapshot(), indent=2))
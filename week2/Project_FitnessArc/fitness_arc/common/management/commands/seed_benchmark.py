@@ -0,0 +1,44 @@
+"""
+Commande de management qui génère une base synthétique pour les benchmarks
+(utilisateurs, séances, séries, repas, courses, amitiés, messages).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from common.benchmark import BENCH_PASSWORD, seed_synthetic_data
+from leaderboard.services import refresh_leaderboard_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Génère N utilisateurs synthétiques avec un historique réaliste (bulk_create par lots)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Nombre d\'utilisateurs (défaut: 100)')
+        parser.add_argument('--days', type=int, default=90, help='Jours d\'historique par utilisateur (défaut: 90)')
+        parser.add_argument('--friends', type=int, default=5, help='Amis par utilisateur (défaut: 5)')
+        parser.add_argument('--messages', type=int, default=10, help='Messages par utilisateur (défaut: 10)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Taille des lots bulk_create (défaut: 2000)')
+        parser.add_argument('--prefix', type=str, default='bench', help='Préfixe des usernames (défaut: bench)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du générateur aléatoire (défaut: 42)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.stdout.write(f"Génération de {options['users']} utilisateurs sur {options['days']} jours...")
+
+        user_ids = seed_synthetic_data(
+            users=options['users'],
+            days=options['days'],
+            prefix=options['prefix'],
+            friends_per_user=options['friends'],
+            messages_per_user=options['messages'],
+            chunk_size=options['chunk_size'],
+            seed=options['seed'],
+            log=lambda message: self.stdout.write(f"  → {message}"),
+        )
+        refresh_leaderboard_snapshot()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(user_ids)} utilisateurs générés en {time.monotonic() - started:.1f}s "
+            f"(mot de passe : {BENCH_PASSWORD})"
+        ))
@@ -0,0 +1,221 @@
+"""
+Instrumentation des requêtes : nombre de requêtes SQL, temps DB, temps de
+rendu des templates et temps de vue, par nom d'URL.
+
+- Each response gets a Server-Timing header (visible in the browser devtools).
+- A rolling in-process aggregate (per worker) is kept in `registry`, readable
+  from the staff-only /perf/ page or `python manage.py perf_report`.
+- The same SQL shape executed more than PERF_NPLUSONE_THRESHOLD times in one
+  request is reported as a probable N+1.
+
+PerfMiddleware.__init__ installs its hooks, so nothing is patched unless the
+middleware is listed in settings.MIDDLEWARE: a wrapper on the Django template
+backend's render() (the render signals only exist under tests), and a query
+wrapper on every database connection. Both find the request's counters
+through a ContextVar, which also follows async views into sync_to_async.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoBackendTemplate
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("perf_request_stats", default=None)
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def sql_shape(sql):
+    """SQL with the variable parts collapsed: IN (%s, %s, ...) and inline numbers."""
+    return _NUMBER.sub("N", _IN_LIST.sub("IN (...)", sql))
+
+
+class RequestStats:
+    """Counters of one request, filled by the DB wrapper and the template hook."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.shapes = Counter()
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def repeated_shapes(self, threshold):
+        return {shape: count for shape, count in self.shapes.items() if count > threshold}
+
+
+class PerfRegistry:
+    """Rolling per-view aggregate (last `window` requests of each URL name)."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._views = defaultdict(self._new_entry)
+
+    def _new_entry(self):
+        return {
+            "count": 0,
+            "total_ms": deque(maxlen=self.window),
+            "queries": deque(maxlen=self.window),
+            "nplusone": Counter(),
+        }
+
+    def record(self, view_name, total_ms, stats, repeated):
+        with self._lock:
+            entry = self._views[view_name]
+            entry["count"] += 1
+            entry["total_ms"].append(total_ms)
+            entry["queries"].append(stats.queries)
+            for shape, count in repeated.items():
+                entry["nplusone"][shape] = max(entry["nplusone"][shape], count)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self):
+        """{view_name: summary} sorted by p95 time, slowest first."""
+        with self._lock:
+            views = {name: (entry["count"], list(entry["total_ms"]), list(entry["queries"]), dict(entry["nplusone"]))
+                     for name, entry in self._views.items()}
+        summary = {}
+        for name, (count, timings, queries, nplusone) in views.items():
+            ordered = sorted(timings)
+            summary[name] = {
+                "requests": count,
+                "p50_ms": round(ordered[len(ordered) // 2], 2),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                "max_ms": round(ordered[-1], 2),
+                "avg_queries": round(sum(queries) / len(queries), 1),
+                "max_queries": max(queries),
+                "nplusone": nplusone,
+            }
+        return dict(sorted(summary.items(), key=lambda item: item[1]["p95_ms"], reverse=True))
+
+
+registry = PerfRegistry(window=getattr(settings, "PERF_WINDOW", 500))
+
+
+def _timed_template_render(render):
+    """Wrap the Django template backend render to add its time to the current request."""
+    def wrapper(self, *args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return render(self, *args, **kwargs)
+        stats._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats._template_depth -= 1
+            if stats._template_depth == 0:
+                # Nested render_to_string calls are already counted by the outer one
+                stats.template_ms += (time.perf_counter() - started) * 1000
+    wrapper.perf_instrumented = True
+    return wrapper
+
+
+def _timed_query(execute, sql, params, many, context):
+    """Connection execute wrapper: counts into the current request, if any."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def _instrument_connection(connection, **kwargs):
+    if _timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_query)
+
+
+def install_hooks():
+    """Idempotent: template render wrapper, and the query wrapper on this thread's and future connections."""
+    if not getattr(DjangoBackendTemplate.render, "perf_instrumented", False):
+        DjangoBackendTemplate.render = _timed_template_render(DjangoBackendTemplate.render)
+    connection_created.connect(_instrument_connection, dispatch_uid="perf_timed_query")
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(connection)
+
+
+class PerfMiddleware:
+    """
+    Mesure chaque requête et ajoute un en-tête Server-Timing
+    (db, tpl, view, total) ; alimente `registry`. Sync et async : Django
+    choisit le mode selon le middleware suivant (WhiteNoise est sync-only).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, "PERF_NPLUSONE_THRESHOLD", 10)
+        install_hooks()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Under ASGI this runs in a sync_to_async thread whose connection
+        # may have been opened before install_hooks
+        for connection in connections.all(initialized_only=True):
+            _instrument_connection(connection)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+
+        # db overlaps the others (lazy querysets run during rendering);
+        # view is everything outside template rendering
+        view_ms = max(0.0, total_ms - stats.template_ms)
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries"',
+            f"tpl;dur={stats.template_ms:.1f}",
+            f"view;dur={view_ms:.1f}",
+            f"total;dur={total_ms:.1f}",
+        ])
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "<unresolved>"
+        repeated = stats.repeated_shapes(self.threshold)
+        for shape, count in repeated.items():
+            logger.warning("N+1 probable dans %s : %d x %s", view_name, count, shape[:200])
+        registry.record(view_name, total_ms, stats, repeated)
+        return response
@@ -1,3 +1,129 @@
 from django.test import TestCase
 
 # Create your tests here.
+import json
+from io import StringIO
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from common.benchmark import seed_synthetic_data
+from common.middleware import PerfMiddleware, RequestStats, registry, sql_shape
+from dashboard.models import DailyUserStats
+from django.db.models import Max
+from workouts.models import PR, PRHistory, WorkoutSession
+
+User = get_user_model()
+
+
+class SyntheticDataTests(TestCase):
+    def test_seed_fills_denormalized_columns(self):
+        user_ids = seed_synthetic_data(users=3, days=10)
+
+        self.assertEqual(len(user_ids), 3)
+        session = WorkoutSession.objects.filter(owner_id__in=user_ids).first()
+        self.assertEqual(session.total_sets, session.set_logs.count())
+        self.assertTrue(DailyUserStats.objects.filter(user_id__in=user_ids).exists())
+
+    def test_seeded_prs_match_their_history(self):
+        user_ids = seed_synthetic_data(users=2, days=10)
+
+        history = {
+            (row["owner_id"], row["exercise_id"], row["metric"]): row["best"]
+            for row in PRHistory.objects.filter(owner_id__in=user_ids)
+            .values("owner_id", "exercise_id", "metric").annotate(best=Max("value")).order_by()
+        }
+        prs = {(pr.owner_id, pr.exercise_id, pr.metric): pr.value for pr in PR.objects.filter(owner_id__in=user_ids)}
+        self.assertEqual(prs, history)
+        self.assertEqual({metric for _, _, metric in prs}, {"max_weight", "max_reps", "est_1rm"})
+
+    def test_explain_hot_queries_leaves_indexes_in_place(self):
+        out = StringIO()
+        call_command("explain_hot_queries", seed=2, days=5, repeat=1, allow_drop_indexes=True, stdout=out)
+
+        self.assertIn("Sans index", out.getvalue())
+        # Seeded rows and dropped indexes only lived in the rolled back transaction
+        self.assertFalse(User.objects.filter(username__startswith="bench_").exists())
+        out = StringIO()
+        call_command("explain_hot_queries", seed=2, days=5, repeat=1, allow_drop_indexes=True, stdout=out)
+        self.assertIn("workouts_session_done_date", out.getvalue())
+
+
+    def test_explain_hot_queries_refuses_without_debug(self):
+        # The test runner turns DEBUG off, as in production
+        with self.assertRaisesMessage(CommandError, "--allow-drop-indexes"):
+            call_command("explain_hot_queries", repeat=1, stdout=StringIO())
+
+
+class BenchCommandTests(TestCase):
+    def test_bench_reports_each_view_as_json(self):
+        call_command("seed_benchmark", users=2, days=3, stdout=StringIO())
+        out = StringIO()
+        call_command("bench", runs=2, warmup=0, views=["dashboard:index", "leaderboard:index"], stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["user"], "bench_0")
+        dashboard = report["views"]["dashboard:index"]
+        self.assertEqual(dashboard["status"], 200)
+        self.assertGreater(dashboard["queries"], 0)
+        self.assertLessEqual(dashboard["p50_ms"], dashboard["max_ms"])
+
+
+class PerfMiddlewareTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username="perf", password="pass")
+
+    def test_response_has_server_timing_and_is_recorded(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("dashboard:index"))
+
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "tpl;dur=", "view;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+        stats = registry.snapshot()["dashboard:index"]
+        self.assertEqual(stats["requests"], 1)
+        self.assertGreater(stats["max_queries"], 0)
+
+    async def test_async_requests_are_measured_too(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("dashboard:index"))
+
+        self.assertRegex(response["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertGreater(registry.snapshot()["dashboard:index"]["max_queries"], 0)
+
+    async def test_middleware_runs_async_under_an_async_handler(self):
+        async def view(request):
+            return HttpResponse("ok")
+
+        middleware = PerfMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get("/"))
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    def test_repeated_sql_shape_is_flagged(self):
+        stats = RequestStats()
+        for pk in range(12):
+            stats.shapes[sql_shape(f'SELECT * FROM "t" WHERE "t"."id" = {pk}')] += 1
+        stats.shapes[sql_shape('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)')] += 1
+
+        self.assertEqual(stats.repeated_shapes(10), {'SELECT * FROM "t" WHERE "t"."id" = N': 12})
+        self.assertEqual(sql_shape('WHERE "id" IN (%s, %s)'), 'WHERE "id" IN (...)')
+
+    def test_perf_page_is_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("common:perf")).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("common:perf"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "common:perf")
+
+        self.client.post(reverse("common:perf"))
+        self.assertNotIn("dashboard:index", registry.snapshot())
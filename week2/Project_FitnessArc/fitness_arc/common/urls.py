@@ -5,4 +5,5 @@ app_name = 'common'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('perf/', views.perf, name='perf'),
 ]
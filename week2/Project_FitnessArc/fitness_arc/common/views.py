@@ -1,6 +1,10 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect, render
 from django.utils import timezone
 
+from .middleware import registry
+
 def index(request):
     """Page d'accueil du site"""
     context = {}
@@ -11,3 +15,15 @@ def index(request):
         context['today_logs_count'] = request.user.food_logs.filter(date=today).count()
     
     return render(request, 'common/index.html', context)
+
+
+@staff_member_required
+def perf(request):
+    """Statistiques de performance par vue (agrégat glissant de ce worker)"""
+    if request.method == "POST":
+        registry.reset()
+        return redirect("common:perf")
+    return render(request, 'common/perf.html', {
+        'views': registry.snapshot(),
+        'threshold': settings.PERF_NPLUSONE_THRESHOLD,
+    })
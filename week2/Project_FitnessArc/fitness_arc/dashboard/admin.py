@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DailyUserStats
+
+
+@admin.register(DailyUserStats)
+class DailyUserStatsAdmin(admin.ModelAdmin):
+    list_display = ("user", "date", "sessions_count", "volume_kg", "kcal_in", "kcal_out", "prs_count")
+    list_filter = ("date",)
+    search_fields = ("user__username",)
@@ -0,0 +1,71 @@
+"""
+Commande de management pour reconstruire la table DailyUserStats depuis les données brutes
+(séances, séries, repas, courses, PR). À lancer après un import en masse ou pour un backfill.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboard.models import DailyUserStats
+from dashboard.services import rebuild_daily_stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les statistiques journalières (DailyUserStats) par lots d\'utilisateurs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Reconstruire uniquement pour cet utilisateur (username)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Nombre d\'utilisateurs traités par lot (défaut: 200)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Taille des lots bulk_create/bulk_update (défaut: 1000)',
+        )
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Ne rien faire si la table contient déjà des lignes (utile en release)',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and DailyUserStats.objects.exists():
+            self.stdout.write("DailyUserStats déjà rempli, skip")
+            return
+
+        users = User.objects.order_by('pk')
+        if options.get('user'):
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f'Utilisateur "{options["user"]}" introuvable'))
+                return
+
+        user_ids = list(users.values_list('pk', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+        totals = [0, 0, 0]
+        started = time.monotonic()
+
+        for i in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[i:i + chunk_size]
+            with transaction.atomic():
+                counts = rebuild_daily_stats(chunk, batch_size=options['batch_size'])
+            totals = [t + c for t, c in zip(totals, counts)]
+            self.stdout.write(f"  → {min(i + chunk_size, len(user_ids))}/{len(user_ids)} utilisateurs")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Terminé en {time.monotonic() - started:.1f}s : "
+            f"{totals[0]} créées, {totals[1]} mises à jour, {totals[2]} supprimées"
+        ))
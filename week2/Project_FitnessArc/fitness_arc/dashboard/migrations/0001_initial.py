@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('volume_kg', models.FloatField(default=0, help_text='Training volume (kg x reps)')),
+                ('sets_count', models.PositiveIntegerField(default=0)),
+                ('training_minutes', models.PositiveIntegerField(default=0)),
+                ('sessions_count', models.PositiveIntegerField(default=0)),
+                ('kcal_in', models.FloatField(default=0, help_text='Calories eaten (kcal)')),
+                ('protein_g', models.FloatField(default=0)),
+                ('carbs_g', models.FloatField(default=0)),
+                ('fat_g', models.FloatField(default=0)),
+                ('kcal_out', models.FloatField(default=0, help_text='Calories burned by sessions and runs (kcal)')),
+                ('run_distance_m', models.FloatField(default=0)),
+                ('prs_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily user stats',
+                'verbose_name_plural': 'Daily user stats',
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
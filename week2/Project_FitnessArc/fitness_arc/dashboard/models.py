@@ -1,3 +1,40 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+User = settings.AUTH_USER_MODEL
+
+
+class DailyUserStats(models.Model):
+    """
+    Per-user, per-day rollup of training, nutrition and running activity.
+    Only completed workout sessions are counted. Rows are kept current by the
+    signals in dashboard/signals.py and can be rebuilt with
+    `python manage.py rebuild_daily_stats`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+
+    volume_kg = models.FloatField(default=0, help_text="Training volume (kg x reps)")
+    sets_count = models.PositiveIntegerField(default=0)
+    training_minutes = models.PositiveIntegerField(default=0)
+    sessions_count = models.PositiveIntegerField(default=0)
+
+    kcal_in = models.FloatField(default=0, help_text="Calories eaten (kcal)")
+    protein_g = models.FloatField(default=0)
+    carbs_g = models.FloatField(default=0)
+    fat_g = models.FloatField(default=0)
+    kcal_out = models.FloatField(default=0, help_text="Calories burned by sessions and runs (kcal)")
+
+    run_distance_m = models.FloatField(default=0)
+    prs_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "date")
+        ordering = ["date"]
+        verbose_name = "Daily user stats"
+        verbose_name_plural = "Daily user stats"
+
+    def __str__(self):
+        return f"Stats {self.user_id} {self.date}"
@@ -1,33 +1,93 @@
 from django.utils import timezone
-from django.db.models import Sum
-from datetime import timedelta
+from django.db.models import Count, Prefetch, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from datetime import datetime, time, timedelta
 from collections import defaultdict
-from workouts.models import WorkoutSession, SetLog, PR
+from workouts.models import WorkoutSession, SetLog, PR, set_volume_expression
 from nutrition.models import FoodLog
+from .models import DailyUserStats
 try:
     from running.models import Run
 except ImportError:
     Run = None
-import calendar 
-from django.db.models import F, FloatField, ExpressionWrapper
+import calendar
+
+
+# Value columns of DailyUserStats
+DAILY_STATS_FIELDS = [
+    'volume_kg', 'sets_count', 'training_minutes', 'sessions_count',
+    'kcal_in', 'protein_g', 'carbs_g', 'fat_g', 'kcal_out',
+    'run_distance_m', 'prs_count',
+]
+
+
+def _daily_session_stats(user, start):
+    """
+    One grouped query over the user's sessions since start.
+    Returns {(date, is_completed): {'count', 'minutes', 'volume'}}.
+    """
+    rows = (
+        WorkoutSession.objects
+        .filter(owner=user, date__gte=start)
+        .values('date', 'is_completed')
+        .annotate(
+            count=Count('id'),
+            minutes=Coalesce(Sum('duration_minutes'), 0),
+            volume=Coalesce(Sum('total_volume'), 0.0),
+        )
+    )
+    return {(r['date'], r['is_completed']): r for r in rows}
+
+
+def _muscle_volume_stats(user, start):
+    """
+    One grouped query over the user's completed set logs since start.
+    Returns rows of (muscle_group, volume).
+    """
+    return list(
+        SetLog.objects
+        .filter(session__owner=user, session__date__gte=start, session__is_completed=True)
+        .values('exercise__muscle_group')
+        .annotate(volume=Sum(set_volume_expression()))
+    )
+
+
+def _daily_rollup(user, start):
+    """The user's DailyUserStats rows since start. Returns {date: row}."""
+    rows = DailyUserStats.objects.filter(user=user, date__gte=start).values('date', *DAILY_STATS_FIELDS)
+    return {r['date']: r for r in rows}
+
+
+def _in_range(d, start, end=None):
+    """start <= d <= end, end=None meaning no upper bound."""
+    return start <= d and (end is None or d <= end)
+
 
 def get_dashboard_data(user, ref_date=None):
-    """Calculate all dashboard data for a user including calories, volume, PRs, and workout history."""
+    """
+    Calculate all dashboard data for a user including calories, volume, PRs, and workout history.
+
+    Completed-session, nutrition and running metrics are read from the
+    DailyUserStats rollup; the current week (which also counts sessions in
+    progress) and the muscle groups come from two grouped queries on the raw
+    tables. The number of queries does not grow with the user's history.
+    """
     today = timezone.now().date()
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     five_weeks_ago = today - timedelta(days=35)
+    one_year_ago = today - timedelta(days=365)
 
     if ref_date is None:
-        focus_date = today         
+        focus_date = today
     else:
         focus_date = ref_date
     month_start = focus_date.replace(day=1)
     last_day = calendar.monthrange(focus_date.year, today.month)[1]
     month_end = today.replace(day=last_day)
-    
+
     # Month navigation for calendar
-    current_month = month_start  
+    current_month = month_start
 
     # Previous month
     if current_month.month == 1:
@@ -48,69 +108,57 @@ def get_dashboard_data(user, ref_date=None):
     # Month name
     current_month_label = current_month.strftime("%B %Y")
 
-    
+    # Comparison window with previous week
+    prev_week_end = week_ago - timedelta(days=1)
+    prev_week_start = prev_week_end - timedelta(days=6)
+
+    # === Rollup rows (completed sessions, nutrition, runs, PRs) ===
+    rollup = _daily_rollup(user, min(one_year_ago, month_start))
+    empty_day = dict.fromkeys(DAILY_STATS_FIELDS, 0)
+
+    def rollup_between(field, start, end=None):
+        return sum(row[field] for d, row in rollup.items() if _in_range(d, start, end))
+
+    # === Raw grouped queries (sessions in progress count for the current week) ===
+    session_stats = _daily_session_stats(user, week_ago)
+    muscle_rows = _muscle_volume_stats(user, month_ago)
+
+    def sessions_between(start, end=None):
+        """Sum session count and minutes (completed or not) of the grouped rows."""
+        count = minutes = 0
+        for (d, completed), row in session_stats.items():
+            if _in_range(d, start, end):
+                count += row['count']
+                minutes += row['minutes']
+        return count, minutes
+
     # Nutrition calories (today)
-    today_food_logs = FoodLog.objects.filter(owner=user, date=today)
-    calories_consumed = float(sum(log.kcal for log in today_food_logs))
-    protein_consumed = float(sum(log.protein for log in today_food_logs))
-    
-    # Workout calories (today)
-    today_workouts = WorkoutSession.objects.filter(owner=user, date=today)
-    calories_burned = float(sum(session.estimated_calories_burned for session in today_workouts))
-    
-    # Running calories (today)
-    if Run is not None:
-        today_runs = Run.objects.filter(user=user, start_date__date=today)
-        calories_burned += float(sum(run.calories_burned or 0 for run in today_runs))
-    
+    today_stats = rollup.get(today, empty_day)
+    calories_consumed = float(today_stats['kcal_in'])
+    protein_consumed = float(today_stats['protein_g'])
+
+    # Workout calories (today), avg 5 kcal/min as in WorkoutSession.estimated_calories_burned
+    _, today_minutes = sessions_between(today, today)
+    calories_burned = float(today_minutes * 5)
+
+    # Running calories (today): kcal_out minus the completed sessions' share
+    calories_burned += float(today_stats['kcal_out'] - today_stats['training_minutes'] * 5)
+
     # Calorie balance
     calorie_balance = calories_consumed - calories_burned
-    
-    # Training volume (last 7 days)
-    recent_sessions = WorkoutSession.objects.filter(
-        owner=user,
-        date__gte=week_ago
-    ).prefetch_related('set_logs')
-    
-    weekly_volume = sum(session.total_volume for session in recent_sessions)
-    
-    # Comparison with previous week
-    prev_week_end = week_ago - timedelta(days=1)
-    prev_week_start = prev_week_end - timedelta(days=6)
 
-    # Previous week completed sessions
-    prev_week_sessions = WorkoutSession.objects.filter(
-        owner=user,
-        is_completed=True,
-        date__gte=prev_week_start,
-        date__lte=prev_week_end,
-    ).prefetch_related('set_logs')
-
-    # Previous week session count
-    prev_sessions_count = prev_week_sessions.count()
-
-    # Previous week volume
-    prev_week_volume = sum(sess.total_volume for sess in prev_week_sessions)
-
-    # Previous week training time (in minutes)
-    prev_week_training_time = 0
-    for sess in prev_week_sessions:
-        if sess.duration_minutes:
-            prev_week_training_time += sess.duration_minutes
-
-    # Previous week calories burned
-    prev_week_calories_burned = sum(
-        sess.estimated_calories_burned for sess in prev_week_sessions
+    # Training volume (last 7 days)
+    weekly_volume = sum(
+        row['volume'] for (d, completed), row in session_stats.items() if d >= week_ago
     )
-    
-    # Add running calories for previous week
-    if Run is not None:
-        prev_week_runs = Run.objects.filter(
-            user=user,
-            start_date__date__gte=prev_week_start,
-            start_date__date__lte=prev_week_end,
-        )
-        prev_week_calories_burned += sum(run.calories_burned or 0 for run in prev_week_runs)
+
+    # Previous week completed sessions: count, volume and training time (in minutes)
+    prev_sessions_count = rollup_between('sessions_count', prev_week_start, prev_week_end)
+    prev_week_training_time = rollup_between('training_minutes', prev_week_start, prev_week_end)
+    prev_week_volume = rollup_between('volume_kg', prev_week_start, prev_week_end)
+
+    # Previous week calories burned (sessions + running)
+    prev_week_calories_burned = rollup_between('kcal_out', prev_week_start, prev_week_end)
 
     # Recent PRs (last 5)
     recent_prs = PR.objects.filter(owner=user).order_by('-date')[:5]
@@ -134,7 +182,7 @@ def get_dashboard_data(user, ref_date=None):
             'value': pr.value,
             'date': pr.date,
         })
-    
+
     best_prs_grouped = []
     for ex_name, prs_list in grouped.items():
         best_prs_grouped.append({
@@ -142,80 +190,59 @@ def get_dashboard_data(user, ref_date=None):
             'prs': prs_list,
         })
 
-    # This week session count
-    sessions_count = recent_sessions.count()
-
-    # Session duration
-    weekly_training_time = 0
-    for session in recent_sessions:
-        if session.duration_minutes:
-            weekly_training_time += session.duration_minutes
-    weekly_training_hours = weekly_training_time // 60   
+    # This week session count and duration
+    sessions_count, weekly_training_time = sessions_between(week_ago)
+    weekly_training_hours = weekly_training_time // 60
     weekly_training_min = weekly_training_time % 60
-    
+
     # Workout history (last 30 days, completed only)
-    workout_history = WorkoutSession.objects.filter(
-        owner=user,
-        date__gte=month_ago,
-        is_completed=True
-    ).prefetch_related('set_logs__exercise').order_by('-date')[:10]
-    
+    workout_history = list(
+        WorkoutSession.objects.filter(
+            owner=user,
+            date__gte=month_ago,
+            is_completed=True
+        ).prefetch_related(
+            Prefetch('set_logs', queryset=SetLog.objects.select_related('exercise'))
+        ).order_by('-date')[:10]
+    )
+
+    # Month calendar
+    month_sessions = list(
+        WorkoutSession.objects.filter(
+            owner=user,
+            date__gte=month_start,
+            date__lte=month_end,
+            is_completed=True,
+        ).select_related('from_template')
+    )
+
     # Calculate details for each workout
     workout_details = []
     for session in workout_history:
-        # PRs detected during this session
-        session_prs = PR.objects.filter(owner=user, date=session.date)
-        
         # Unique exercises
         exercises = {}
-        for log in session.set_logs.all():
+        set_logs = session.set_logs.all()
+        for log in set_logs:
             ex_name = log.exercise.name
             if ex_name not in exercises:
                 exercises[ex_name] = {'sets': 0, 'reps': 0}
             exercises[ex_name]['sets'] += 1
-            exercises[ex_name]['reps'] += log.reps
-        
+            exercises[ex_name]['reps'] += log.reps or 0
+
         workout_details.append({
             'session': session,
             'exercises': exercises,
-            'prs_count': session_prs.count(),
-            'total_sets': session.set_logs.count(),
+            # PRs detected during this session
+            'prs_count': rollup.get(session.date, empty_day)['prs_count'],
+            'total_sets': session.total_sets,
         })
 
-    # Month calendar
-    month_sessions = WorkoutSession.objects.filter(
-        owner=user,
-        date__gte=month_start,
-        date__lte=month_end,
-        is_completed=True,
-    ).prefetch_related('set_logs__exercise', 'from_template')
-    
-    month_sessions_count = month_sessions.count()
-    month_total_duration = 0
-    month_total_volume = 0
-    month_total_calories_burned = 0
-
-    for sess in month_sessions:
-        if sess.duration_minutes:
-            month_total_duration += sess.duration_minutes
-        month_total_volume += sess.total_volume
-        month_total_calories_burned += sess.estimated_calories_burned
-    
-    # Ajouter les calories de running pour le mois
-    if Run is not None:
-        month_runs = Run.objects.filter(
-            user=user,
-            start_date__date__gte=month_start,
-            start_date__date__lte=month_end,
-        )
-        month_total_calories_burned += sum(run.calories_burned or 0 for run in month_runs)
-
-    # Number of PRs created this month
-    month_prs_count = PR.objects.filter(
-        owner=user,
-        date__gte=month_start,
-        date__lte=month_end,
-    ).count()
+    # Month totals (sessions + running calories, PRs created this month)
+    month_sessions_count = rollup_between('sessions_count', month_start, month_end)
+    month_total_duration = rollup_between('training_minutes', month_start, month_end)
+    month_total_volume = rollup_between('volume_kg', month_start, month_end)
+    month_total_calories_burned = rollup_between('kcal_out', month_start, month_end)
+    month_prs_count = rollup_between('prs_count', month_start, month_end)
 
 
     sessions_by_date = defaultdict(list)
@@ -229,9 +256,9 @@ def get_dashboard_data(user, ref_date=None):
         week_days = []
         for d in week:
             week_days.append({
-                'date': d,                            
-                'day': d.day,                         
-                'in_month': (d.month == focus_date.month), 
+                'date': d,
+                'day': d.day,
+                'in_month': (d.month == focus_date.month),
                 'is_today': (d == today),
                 'has_workout': d in sessions_by_date,
                 'sessions': sessions_by_date.get(d, []),
@@ -241,16 +268,8 @@ def get_dashboard_data(user, ref_date=None):
         # --- Streak et constance mensuelle ---
 
     # All completed session dates (e.g., over 1 year)
-    one_year_ago = today - timedelta(days=365)
-    all_dates_qs = WorkoutSession.objects.filter(
-        owner=user,
-        is_completed=True,
-        date__gte=one_year_ago,
-        date__lte=today,
-    ).values_list('date', flat=True).distinct()
-
-    # Put in a set for O(1) access
-    all_dates = set(all_dates_qs)
+    completed_dates = {d for d, row in rollup.items() if row['sessions_count']}
+    all_dates = {d for d in completed_dates if _in_range(d, one_year_ago, today)}
 
     # Current streak (counting back from today)
     current_streak = 0
@@ -277,12 +296,9 @@ def get_dashboard_data(user, ref_date=None):
 
     # Monthly consistency: days with session / elapsed days
     days_passed_in_month = (today - month_start).days + 1
-    active_days_this_month = WorkoutSession.objects.filter(
-        owner=user,
-        is_completed=True,
-        date__gte=month_start,
-        date__lte=today,
-    ).values('date').distinct().count()
+    active_days_this_month = len(
+        [d for d in completed_dates if _in_range(d, month_start, today)]
+    )
 
     if days_passed_in_month > 0:
         monthly_consistency = round(
@@ -291,121 +307,65 @@ def get_dashboard_data(user, ref_date=None):
     else:
         monthly_consistency = 0.0
 
-    
+
     # === Nouveaux Graphiques ===
-    
+
     # 1. Workouts par Semaine (5 dernières semaines)
     weekly_workouts = defaultdict(int)
-    all_sessions = WorkoutSession.objects.filter(
-        owner=user,
-        date__gte=five_weeks_ago,
-        is_completed=True
-    )
-    
-    for session in all_sessions:
-        week_num = session.date.isocalendar()[1]
-        weekly_workouts[week_num] += 1
-    
+    for d, row in rollup.items():
+        if row['sessions_count'] and _in_range(d, five_weeks_ago):
+            weekly_workouts[d.isocalendar()[1]] += row['sessions_count']
+
     sorted_weeks = sorted(weekly_workouts.items())[-5:]
     weekly_workouts_labels = [f"S{w[0]}" for w in sorted_weeks]
     weekly_workouts_data = [w[1] for w in sorted_weeks]
-    
+
     # 2. Calories Journalières (7 derniers jours)
     daily_calories_labels = []
     daily_calories_consumed = []
     daily_calories_burned = []
-    
+
     for i in range(6, -1, -1):
         date = today - timedelta(days=i)
         daily_calories_labels.append(date.strftime('%d/%m'))
-        
+
+        day_stats = rollup.get(date, empty_day)
+
         # Calories consumed
-        food_logs = FoodLog.objects.filter(owner=user, date=date)
-        consumed = sum(log.kcal for log in food_logs)
+        consumed = day_stats['kcal_in']
         daily_calories_consumed.append(round(float(consumed or 0), 1))
-        
-        # Calories burned
-        workouts = WorkoutSession.objects.filter(owner=user, date=date, is_completed=True)
-        burned = sum(w.estimated_calories_burned for w in workouts)
-        
-        # Ajouter les calories de running pour ce jour
-        if Run is not None:
-            day_runs = Run.objects.filter(user=user, start_date__date=d)
-            burned += sum(run.calories_burned or 0 for run in day_runs)
-        
+
+        # Calories burned (completed sessions + running)
+        burned = day_stats['kcal_out']
+
         daily_calories_burned.append(round(float(burned or 0), 1))
-    
+
     # 3. Volume Hebdomadaire (5 dernières semaines)
     weekly_volumes = defaultdict(float)
-    volume_sessions = WorkoutSession.objects.filter(
-        owner=user,
-        date__gte=five_weeks_ago,
-        is_completed=True
-    ).prefetch_related('set_logs')
-    
-    for session in volume_sessions:
-        week_num = session.date.isocalendar()[1]
-        weekly_volumes[week_num] += session.total_volume
-    
+    for d, row in rollup.items():
+        if row['sessions_count'] and _in_range(d, five_weeks_ago):
+            weekly_volumes[d.isocalendar()[1]] += row['volume_kg']
+
     sorted_vol_weeks = sorted(weekly_volumes.items())[-5:]
     weekly_volume_labels = [f"S{w[0]}" for w in sorted_vol_weeks]
     weekly_volume_data = [round(float(w[1] or 0), 1) for w in sorted_vol_weeks]
-    
+
     # 4. Macros du jour
-    today_food_logs = FoodLog.objects.filter(owner=user, date=today)
-   # quantity is in grams, food macros are per 100g
-    cal_expr = ExpressionWrapper(
-        F('food__kcal_per_100g') * F('quantity') / 100.0,
-        output_field=FloatField()
-        )
-    prot_expr = ExpressionWrapper(
-        F('food__protein_per_100g') * F('quantity') / 100.0,
-        output_field=FloatField()
-        )
-    carb_expr = ExpressionWrapper(
-        F('food__carbs_per_100g') * F('quantity') / 100.0,
-        output_field=FloatField()
-        )
-    fat_expr = ExpressionWrapper(
-        F('food__fat_per_100g') * F('quantity') / 100.0,
-        output_field=FloatField()
-        )
-    
-    totals = today_food_logs.aggregate(
-        total_calories = Sum(cal_expr),
-        total_protein  = Sum(prot_expr),
-        total_carbs    = Sum(carb_expr),
-        total_fat      = Sum(fat_expr),
-        )
-    calories_consumed = totals['total_calories'] or 0
-    protein_consumed_chart  = totals['total_protein']  or 0
-    carbs_consumed    = totals['total_carbs']    or 0
-    fat_consumed      = totals['total_fat']      or 0
-    
+    calories_consumed = today_stats['kcal_in']
+    protein_consumed_chart  = today_stats['protein_g']
+    carbs_consumed    = today_stats['carbs_g']
+    fat_consumed      = today_stats['fat_g']
+
     week_sessions_diff = sessions_count - prev_sessions_count
     week_volume_diff = weekly_volume - prev_week_volume
     week_training_time_diff = weekly_training_time - prev_week_training_time
     week_calories_diff = calories_burned - prev_week_calories_burned
 
     # Muscle group distribution (last month)
-
     muscle_volume = defaultdict(float)
-
-    logs = SetLog.objects.filter(
-        session__owner=user,
-        session__is_completed=True,
-        session__date__gte=month_ago,
-    ).select_related('exercise')
-
-    for log in logs:
-        
-        group = getattr(log.exercise, 'muscle_group', 'Autre') or 'Autre'
-
-        vol = getattr(log, 'volume', None)
-        if vol is None:
-            vol = (log.weight_kg or 0) * (log.reps or 0)
-
-        muscle_volume[group] += float(vol)
+    for row in muscle_rows:
+        group = row['exercise__muscle_group'] or 'Autre'
+        muscle_volume[group] += float(row['volume'] or 0)
 
     muscle_groups_labels = []
     muscle_groups_values = []
@@ -430,7 +390,7 @@ def get_dashboard_data(user, ref_date=None):
         'weekly_workouts_labels': weekly_workouts_labels,
         'weekly_workouts_data': weekly_workouts_data,
         'weekly_training_time': weekly_training_time,
-        'weekly_training_hours': weekly_training_hours,      
+        'weekly_training_hours': weekly_training_hours,
         'weekly_training_min': weekly_training_min,
         'daily_calories_labels': daily_calories_labels,
         'daily_calories_consumed': daily_calories_consumed,
@@ -471,3 +431,136 @@ def get_dashboard_data(user, ref_date=None):
         'muscle_groups_labels': muscle_groups_labels,
         'muscle_groups_values': muscle_groups_values,
     }
+
+
+# === Daily stats rollup (DailyUserStats) ===
+
+def day_start(day):
+    """Aware datetime of local midnight: a start_date__date filter as a range on the indexed column."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def compute_daily_stats(user_ids, start=None, end=None):
+    """
+    Compute DailyUserStats values from the raw tables for the given users,
+    optionally restricted to [start, end].
+    Returns {(user_id, date): {field: value}} with one grouped query per table.
+    """
+    def date_filter(field):
+        filters = {}
+        if start is not None:
+            filters[f'{field}__gte'] = start
+        if end is not None:
+            filters[f'{field}__lte'] = end
+        return filters
+
+    stats = defaultdict(lambda: dict.fromkeys(DAILY_STATS_FIELDS, 0))
+
+    sessions = (
+        WorkoutSession.objects
+        .filter(owner_id__in=user_ids, is_completed=True, **date_filter('date'))
+        .values('owner_id', 'date')
+        .annotate(
+            n=Count('id'),
+            minutes=Coalesce(Sum('duration_minutes'), 0),
+            sets=Coalesce(Sum('total_sets'), 0),
+            volume=Coalesce(Sum('total_volume'), 0.0),
+        )
+    )
+    for row in sessions:
+        day = stats[(row['owner_id'], row['date'])]
+        day['sessions_count'] = row['n']
+        day['training_minutes'] = row['minutes']
+        day['kcal_out'] += row['minutes'] * 5
+        day['sets_count'] = row['sets']
+        day['volume_kg'] = float(row['volume'])
+
+    food = (
+        FoodLog.objects
+        .filter(owner_id__in=user_ids, **date_filter('date'))
+        .values('owner_id', 'date')
+        .annotate(
+            # Stored per-entry macros: no join on Food
+            kcal=Sum('kcal'),
+            protein=Sum('protein'),
+            carbs=Sum('carbs'),
+            fat=Sum('fat'),
+        )
+    )
+    for row in food:
+        day = stats[(row['owner_id'], row['date'])]
+        day['kcal_in'] = float(row['kcal'] or 0)
+        day['protein_g'] = float(row['protein'] or 0)
+        day['carbs_g'] = float(row['carbs'] or 0)
+        day['fat_g'] = float(row['fat'] or 0)
+
+    if Run is not None:
+        run_range = {}
+        if start is not None:
+            run_range['start_date__gte'] = day_start(start)
+        if end is not None:
+            run_range['start_date__lt'] = day_start(end + timedelta(days=1))
+        runs = (
+            Run.objects
+            .filter(user_id__in=user_ids, **run_range)
+            .annotate(day=TruncDate('start_date'))
+            .values('user_id', 'day')
+            .annotate(kcal=Sum('calories_burned'), distance=Sum('distance_m'))
+            .order_by()
+        )
+        for row in runs:
+            day = stats[(row['user_id'], row['day'])]
+            day['kcal_out'] += float(row['kcal'] or 0)
+            day['run_distance_m'] = float(row['distance'] or 0)
+
+    prs = (
+        PR.objects
+        .filter(owner_id__in=user_ids, **date_filter('date'))
+        .values('owner_id', 'date')
+        .annotate(n=Count('id'))
+    )
+    for row in prs:
+        stats[(row['owner_id'], row['date'])]['prs_count'] = row['n']
+
+    return dict(stats)
+
+
+def refresh_daily_stats(user_id, day):
+    """Recompute the DailyUserStats row of one user for one day (deleted when empty)."""
+    values = compute_daily_stats([user_id], start=day, end=day).get((user_id, day))
+    if values is None:
+        DailyUserStats.objects.filter(user_id=user_id, date=day).delete()
+        return None
+    row, _ = DailyUserStats.objects.update_or_create(user_id=user_id, date=day, defaults=values)
+    return row
+
+
+def rebuild_daily_stats(user_ids, batch_size=1000):
+    """
+    Rebuild every DailyUserStats row of the given users from the raw tables.
+    Rows are written with bulk_create/bulk_update and stale rows are removed.
+    Returns (created, updated, deleted) counts.
+    """
+    computed = compute_daily_stats(user_ids)
+    existing = {
+        (row.user_id, row.date): row
+        for row in DailyUserStats.objects.filter(user_id__in=user_ids)
+    }
+
+    to_create, to_update = [], []
+    for (user_id, day), values in computed.items():
+        row = existing.pop((user_id, day), None)
+        if row is None:
+            to_create.append(DailyUserStats(user_id=user_id, date=day, **values))
+        elif any(getattr(row, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(row, field, value)
+            to_update.append(row)
+
+    DailyUserStats.objects.bulk_create(to_create, batch_size=batch_size)
+    DailyUserStats.objects.bulk_update(to_update, DAILY_STATS_FIELDS, batch_size=batch_size)
+    stale_ids = [row.pk for row in existing.values()]
+    if stale_ids:
+        DailyUserStats.objects.filter(pk__in=stale_ids).delete()
+
+    return len(to_create), len(to_update), len(stale_ids)
@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from nutrition.models import FoodLog
+from workouts.models import WorkoutSession, SetLog, PR
+from workouts.pr_engine import prs_changed
+
+from .services import Run, refresh_daily_stats
+
+User = get_user_model()
+
+
+def _deleted_with_owner(kwargs):
+    """True when the row is removed by a user deletion (the rollup rows cascade too)."""
+    return isinstance(kwargs.get('origin'), User)
+
+
+@receiver(post_save, sender=WorkoutSession)
+@receiver(post_delete, sender=WorkoutSession)
+def refresh_stats_for_session(sender, instance, **kwargs):
+    """Keep the session's day up to date (count, minutes, volume)."""
+    if _deleted_with_owner(kwargs):
+        return
+    refresh_daily_stats(instance.owner_id, instance.date)
+
+
+@receiver(post_save, sender=SetLog)
+@receiver(post_delete, sender=SetLog)
+def refresh_stats_for_set_log(sender, instance, **kwargs):
+    """
+    Only completed sessions are part of the rollup: sets logged during a session
+    in progress are picked up when the session is completed.
+    """
+    origin = kwargs.get('origin')
+    if _deleted_with_owner(kwargs) or isinstance(origin, WorkoutSession):
+        # The session's own post_delete refreshes its day once
+        return
+
+    session = (
+        WorkoutSession.objects
+        .filter(pk=instance.session_id, is_completed=True)
+        .values('owner_id', 'date')
+        .first()
+    )
+    if session:
+        refresh_daily_stats(session['owner_id'], session['date'])
+
+
+@receiver(post_save, sender=FoodLog)
+@receiver(post_delete, sender=FoodLog)
+def refresh_stats_for_food_log(sender, instance, **kwargs):
+    if _deleted_with_owner(kwargs):
+        return
+    refresh_daily_stats(instance.owner_id, instance.date)
+
+
+def refresh_stats_for_run(sender, instance, **kwargs):
+    if _deleted_with_owner(kwargs):
+        return
+    start = instance.start_date
+    day = timezone.localdate(start) if timezone.is_aware(start) else start.date()
+    refresh_daily_stats(instance.user_id, day)
+
+
+if Run is not None:
+    post_save.connect(refresh_stats_for_run, sender=Run)
+    post_delete.connect(refresh_stats_for_run, sender=Run)
+
+
+@receiver(post_save, sender=PR)
+@receiver(post_delete, sender=PR)
+def refresh_stats_for_pr(sender, instance, **kwargs):
+    if _deleted_with_owner(kwargs):
+        return
+    refresh_daily_stats(instance.owner_id, instance.date)
+
+
+@receiver(prs_changed)
+def refresh_stats_for_bulk_prs(sender, owner_id, dates, **kwargs):
+    """PRs created in bulk by the PR engine: one refresh per affected day."""
+    for day in dates:
+        refresh_daily_stats(owner_id, day)
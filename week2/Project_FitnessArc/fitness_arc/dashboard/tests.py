@@ -1,11 +1,20 @@
 from django.test import TestCase
 
 # Create your tests here.
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from workouts.models import WorkoutSession
-from dashboard.services import get_dashboard_data
+from django.utils import timezone
+from workouts.models import WorkoutSession, Exercise, SetLog, PR
+from nutrition.models import Food, FoodLog
+from running.models import Run
+from dashboard.models import DailyUserStats
+from dashboard.services import get_dashboard_data, compute_daily_stats
 from dashboard.templatetags.time_format import duration_hm
 from django.test import SimpleTestCase
 
@@ -45,6 +54,148 @@ class DashboardServiceTests(TestCase):
         self.assertEqual(data["weekly_training_min"], 15)
 
 
+class DashboardQueryBudgetTests(TestCase):
+    """The dashboard must cost a constant number of queries, whatever the history size."""
+
+    QUERY_BUDGET = 12
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="budget", password="testpass123")
+        self.exercise = Exercise.objects.create(
+            name="Squat", slug="squat", muscle_group="legs", equipment="barbell"
+        )
+        self.food = Food.objects.create(
+            name="Riz", slug="riz",
+            kcal_per_100g=Decimal('130.00'), protein_per_100g=Decimal('2.70'),
+            carbs_per_100g=Decimal('28.00'), fat_per_100g=Decimal('0.30'),
+        )
+        for metric in ("max_weight", "max_reps", "est_1rm"):
+            PR.objects.create(owner=self.user, exercise=self.exercise, metric=metric, value=Decimal('100.00'))
+
+    def _add_history(self, days):
+        today = timezone.now().date()
+        for i in range(days):
+            day = today - timedelta(days=i)
+            session = WorkoutSession.objects.create(owner=self.user, duration_minutes=40)
+            # date is auto_now_add: move the session back in time, then log its sets
+            WorkoutSession.objects.filter(pk=session.pk).update(date=day, is_completed=True)
+            for n in range(1, 4):
+                SetLog.objects.create(
+                    session=session, exercise=self.exercise, set_number=n,
+                    reps=5, weight_kg=Decimal('100.00'),
+                )
+            FoodLog.objects.create(owner=self.user, date=day, food=self.food, quantity=Decimal('200.00'))
+            Run.objects.create(
+                user=self.user, source='manual', name="Run", distance_m=5000,
+                moving_time_s=1500, elapsed_time_s=1500, calories_burned=300,
+                start_date=timezone.make_aware(datetime.combine(day, time(12, 0))),
+            )
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            get_dashboard_data(self.user)
+        return len(ctx)
+
+    def test_query_count_is_bounded(self):
+        self._add_history(3)
+        self.assertLessEqual(self._count_queries(), self.QUERY_BUDGET)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self._add_history(3)
+        small = self._count_queries()
+        self._add_history(20)
+        self.assertEqual(self._count_queries(), small)
+
+    def test_daily_charts_use_each_day_values(self):
+        self._add_history(3)
+        data = get_dashboard_data(self.user)
+
+        # 3 days with 200 g of rice (260 kcal) and 40 min + a 300 kcal run
+        self.assertEqual(data["daily_calories_consumed"][-3:], [260.0, 260.0, 260.0])
+        self.assertEqual(data["daily_calories_burned"][-3:], [500.0, 500.0, 500.0])
+        self.assertEqual(data["daily_calories_burned"][:4], [0.0, 0.0, 0.0, 0.0])
+        self.assertEqual(data["weekly_volume"], 4500)
+        self.assertEqual(data["current_streak"], 3)
+        self.assertEqual(data["muscle_groups_labels"], ["legs"])
+
+
+class DailyUserStatsTests(TestCase):
+    """The rollup is kept current by signals and can be rebuilt in bulk."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="rollup", password="testpass123")
+        self.exercise = Exercise.objects.create(
+            name="Bench", slug="bench", muscle_group="chest", equipment="barbell"
+        )
+        self.food = Food.objects.create(
+            name="Poulet", slug="poulet",
+            kcal_per_100g=Decimal('165.00'), protein_per_100g=Decimal('31.00'),
+            carbs_per_100g=Decimal('0.00'), fat_per_100g=Decimal('3.60'),
+        )
+
+    def _completed_session(self):
+        session = WorkoutSession.objects.create(owner=self.user)
+        SetLog.objects.create(session=session, exercise=self.exercise, set_number=1,
+                              reps=10, weight_kg=Decimal('60.00'))
+        SetLog.objects.create(session=session, exercise=self.exercise, set_number=2,
+                              reps=8, weight_kg=Decimal('70.00'))
+        session.duration_minutes = 30
+        session.is_completed = True
+        session.save()
+        return session
+
+    def test_in_progress_sessions_are_not_counted(self):
+        session = WorkoutSession.objects.create(owner=self.user)
+        SetLog.objects.create(session=session, exercise=self.exercise, set_number=1,
+                              reps=10, weight_kg=Decimal('60.00'))
+        self.assertFalse(DailyUserStats.objects.filter(user=self.user).exists())
+
+    def test_completing_a_session_updates_the_day(self):
+        session = self._completed_session()
+        stats = DailyUserStats.objects.get(user=self.user, date=session.date)
+
+        self.assertEqual(stats.sessions_count, 1)
+        self.assertEqual(stats.sets_count, 2)
+        self.assertEqual(stats.training_minutes, 30)
+        self.assertEqual(stats.volume_kg, 60 * 10 + 70 * 8)
+        self.assertEqual(stats.kcal_out, 150)
+
+    def test_food_logs_and_deletions_are_tracked(self):
+        today = timezone.localdate()
+        log = FoodLog.objects.create(owner=self.user, date=today, food=self.food, quantity=Decimal('200.00'))
+        stats = DailyUserStats.objects.get(user=self.user, date=today)
+        self.assertAlmostEqual(stats.kcal_in, 330.0)
+        self.assertAlmostEqual(stats.protein_g, 62.0)
+
+        log.delete()
+        self.assertFalse(DailyUserStats.objects.filter(user=self.user, date=today).exists())
+
+    def test_session_delete_refreshes_the_day(self):
+        session = self._completed_session()
+        session.delete()
+        self.assertFalse(DailyUserStats.objects.filter(user=self.user).exists())
+
+    def test_rebuild_command_matches_incremental_rows(self):
+        session = self._completed_session()
+        FoodLog.objects.create(owner=self.user, date=session.date, food=self.food, quantity=Decimal('100.00'))
+        incremental = compute_daily_stats([self.user.pk])
+
+        DailyUserStats.objects.all().delete()
+        call_command("rebuild_daily_stats", chunk_size=1, stdout=StringIO())
+
+        rows = DailyUserStats.objects.filter(user=self.user)
+        self.assertEqual(rows.count(), len(incremental))
+        row = rows.get(date=session.date)
+        for field, value in incremental[(self.user.pk, session.date)].items():
+            self.assertEqual(getattr(row, field), value)
+
+    def test_rebuild_if_empty_keeps_existing_rows(self):
+        self._completed_session()
+        DailyUserStats.objects.update(sessions_count=42)
+        call_command("rebuild_daily_stats", if_empty=True, stdout=StringIO())
+        self.assertEqual(DailyUserStats.objects.get(user=self.user).sessions_count, 42)
+
+
 class DurationHmFilterTests(SimpleTestCase):
     def test_only_minutes(self):
         self.assertEqual(duration_hm(45), "45min")
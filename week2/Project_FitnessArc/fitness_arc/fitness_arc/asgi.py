@@ -3,6 +3,21 @@ ASGI config for fitness_arc project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+This is the production entry point (Procfile, railway.json):
+
+    gunicorn fitness_arc.asgi:application -k uvicorn.workers.UvicornWorker --workers 1
+
+The live messaging streams (messaging.views.conversation_stream and
+unread_stream, server-sent events) need it; under WSGI (runserver, the
+fitness_arc.wsgi entry point) they answer 204 and the pages fall back to
+polling every 5 s.
+
+Keep a single worker: the default in-memory channel layer
+(settings.MESSAGING_CHANNEL_LAYER) only reaches clients connected to the
+process that publishes, so with two workers half of the events would be
+lost. Synchronous views run in the worker's thread pool. Scaling out needs
+a shared layer (e.g. Redis pub/sub) first.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
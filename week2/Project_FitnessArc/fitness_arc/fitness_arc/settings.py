@@ -74,6 +74,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common.middleware.PerfMiddleware',  # Server-Timing + /perf/ (first: measures everything below)
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -223,6 +224,40 @@ STRAVA_CLIENT_SECRET = os.environ.get("STRAVA_CLIENT_SECRET")
 # Use environment variable for redirect URI (for production)
 STRAVA_REDIRECT_URI = os.environ.get("STRAVA_REDIRECT_URI", "http://127.0.0.1:8000/running/strava/callback/")
 
+# Leaderboard snapshot: rebuilt at this period by the Procfile `scheduler`
+# process (`refresh_leaderboard --loop`); pages only read it and flag it as
+# stale past this age
+LEADERBOARD_REFRESH_SECONDS = int(os.environ.get("LEADERBOARD_REFRESH_SECONDS", 300))
+
+# Per-request instrumentation (common.middleware.PerfMiddleware):
+# same SQL shape repeated more than this in one request = probable N+1,
+# and number of requests kept per view in the rolling aggregate
+PERF_NPLUSONE_THRESHOLD = int(os.environ.get("PERF_NPLUSONE_THRESHOLD", 10))
+PERF_WINDOW = int(os.environ.get("PERF_WINDOW", 500))
+
+# Cache: local memory (per process) unless REDIS_URL points to a shared Redis
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+
+# Cached friend id sets (accounts.friend_graph); with the per-process cache
+# this is also how long another worker may see an outdated friendship
+FRIEND_GRAPH_CACHE_SECONDS = int(os.environ.get("FRIEND_GRAPH_CACHE_SECONDS", 300))
+
+# Search time of the meal plan optimizer (nutrition.meal_planner), on top of
+# its few SQL queries: past it the best plan found so far is shown
+MEAL_PLAN_TIME_BUDGET_MS = int(os.environ.get("MEAL_PLAN_TIME_BUDGET_MS", 200))
+
+# Live messaging (server-sent events, ASGI only, see fitness_arc/asgi.py):
+# broadcast layer and keep-alive interval of the open streams. The in-memory
+# layer is per process: it requires a single web worker (Procfile)
+MESSAGING_CHANNEL_LAYER = os.environ.get("MESSAGING_CHANNEL_LAYER", "messaging.realtime.InMemoryChannelLayer")
+MESSAGING_SSE_HEARTBEAT = int(os.environ.get("MESSAGING_SSE_HEARTBEAT", 15))
+
 # Security settings for production
 if not DEBUG:
     # Railway handles SSL/HTTPS via proxy, so don't force redirect in Django
@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import LeaderboardSnapshot
+
+
+@admin.register(LeaderboardSnapshot)
+class LeaderboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("rank", "user", "xp", "level", "league", "computed_at")
+    search_fields = ("user__username",)
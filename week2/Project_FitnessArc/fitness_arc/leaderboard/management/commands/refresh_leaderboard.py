@@ -0,0 +1,57 @@
+"""
+Commande de management pour reconstruire le classement (LeaderboardSnapshot).
+Les pages ne le reconstruisent jamais : `--loop` tourne comme process dédié
+(Procfile `scheduler`) et le reconstruit toutes les LEADERBOARD_REFRESH_SECONDS.
+
+    python manage.py refresh_leaderboard            # une fois (release, cron)
+    python manage.py refresh_leaderboard --loop     # process planificateur
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from leaderboard.services import refresh_leaderboard_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit le snapshot du leaderboard (XP, niveau, ligue et rang de chaque utilisateur)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Reconstruire en boucle, toutes les --every secondes')
+        parser.add_argument('--every', type=int, default=None,
+                            help='Période de --loop en secondes (défaut: LEADERBOARD_REFRESH_SECONDS)')
+        parser.add_argument('--runs', type=int, default=None,
+                            help="Arrêter --loop après ce nombre de reconstructions (défaut: jamais)")
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.refresh()
+            return
+        every = settings.LEADERBOARD_REFRESH_SECONDS if options['every'] is None else options['every']
+        runs = 0
+        while options['runs'] is None or runs < options['runs']:
+            started = time.monotonic()
+            close_old_connections()
+            try:
+                self.refresh()
+            except Exception:
+                # The previous snapshot stays served; retry at the next period
+                logger.exception("Leaderboard refresh failed")
+            finally:
+                close_old_connections()
+            runs += 1
+            if options['runs'] is None or runs < options['runs']:
+                time.sleep(max(0, every - (time.monotonic() - started)))
+
+    def refresh(self):
+        started = time.monotonic()
+        count = refresh_leaderboard_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Leaderboard reconstruit : {count} joueurs classés en {time.monotonic() - started:.1f}s"
+        ))
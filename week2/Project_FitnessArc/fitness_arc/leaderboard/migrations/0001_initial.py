@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sessions_30d', models.PositiveIntegerField(default=0)),
+                ('volume_30d', models.FloatField(default=0)),
+                ('prs_count', models.PositiveIntegerField(default=0)),
+                ('xp', models.FloatField(default=0)),
+                ('level', models.PositiveIntegerField(default=0)),
+                ('league', models.CharField(max_length=20)),
+                ('rank', models.PositiveIntegerField(help_text='Dense rank by XP (ties share a rank)')),
+                ('computed_at', models.DateTimeField(help_text='Time of the rebuild this row comes from (stale since)')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_snapshot', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Leaderboard snapshot',
+                'verbose_name_plural': 'Leaderboard snapshots',
+                'ordering': ['rank', 'user_id'],
+                'indexes': [models.Index(fields=['rank', 'user'], name='leaderboard_rank_a96d0e_idx')],
+            },
+        ),
+    ]
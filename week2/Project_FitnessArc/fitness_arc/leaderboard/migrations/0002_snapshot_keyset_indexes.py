@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboardsnapshot',
+            index=models.Index(fields=['-xp', 'user'], name='leaderboard_xp_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardsnapshot',
+            index=models.Index(fields=['league', '-xp', 'user'], name='leaderboard_league_xp_idx'),
+        ),
+    ]
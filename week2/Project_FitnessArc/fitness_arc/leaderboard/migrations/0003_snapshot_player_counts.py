@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_player_counts(apps, schema_editor):
+    """Counts of the current snapshot, until its next rebuild."""
+    LeaderboardSnapshot = apps.get_model('leaderboard', 'LeaderboardSnapshot')
+    LeaderboardSnapshot.objects.update(total_players=LeaderboardSnapshot.objects.count())
+    for row in LeaderboardSnapshot.objects.values('league').annotate(players=Count('id')):
+        LeaderboardSnapshot.objects.filter(league=row['league']).update(league_players=row['players'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0002_snapshot_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboardsnapshot',
+            name='league_players',
+            field=models.PositiveIntegerField(default=0, help_text="Ranked users of this row's league at the rebuild"),
+        ),
+        migrations.AddField(
+            model_name='leaderboardsnapshot',
+            name='total_players',
+            field=models.PositiveIntegerField(default=0, help_text='Ranked users at the rebuild'),
+        ),
+        migrations.RunPython(fill_player_counts, migrations.RunPython.noop),
+    ]
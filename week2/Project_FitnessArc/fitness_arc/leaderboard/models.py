@@ -1,3 +1,35 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class LeaderboardSnapshot(models.Model):
+    """
+    Classement précalculé : une ligne par utilisateur, reconstruite par
+    leaderboard.services.refresh_leaderboard_snapshot.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="leaderboard_snapshot")
+    sessions_30d = models.PositiveIntegerField(default=0)
+    volume_30d = models.FloatField(default=0)
+    prs_count = models.PositiveIntegerField(default=0)
+    xp = models.FloatField(default=0)
+    level = models.PositiveIntegerField(default=0)
+    league = models.CharField(max_length=20)
+    rank = models.PositiveIntegerField(help_text="Dense rank by XP (ties share a rank)")
+    computed_at = models.DateTimeField(help_text="Time of the rebuild this row comes from (stale since)")
+    # Sizes of the board at that rebuild, so that pages need no COUNT
+    total_players = models.PositiveIntegerField(default=0, help_text="Ranked users at the rebuild")
+    league_players = models.PositiveIntegerField(default=0, help_text="Ranked users of this row's league at the rebuild")
+
+    class Meta:
+        ordering = ['rank', 'user_id']
+        indexes = [
+            models.Index(fields=['rank', 'user']),
+            # Keyset pagination: ORDER BY xp DESC, user_id (global and per league)
+            models.Index(fields=['-xp', 'user'], name='leaderboard_xp_user_idx'),
+            models.Index(fields=['league', '-xp', 'user'], name='leaderboard_league_xp_idx'),
+        ]
+        verbose_name = "Leaderboard snapshot"
+        verbose_name_plural = "Leaderboard snapshots"
+
+    def __str__(self):
+        return f"#{self.rank} {self.user} ({self.xp:.0f} XP)"
@@ -1,52 +1,36 @@
 # leaderboard/services.py
+from collections import Counter
 from datetime import timedelta
 
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
-from workouts.models import WorkoutSession, PR
+from accounts.models import Friendship
+from dashboard.models import DailyUserStats
 
+from .models import LeaderboardSnapshot
 
-User = get_user_model()
-
-
-def compute_user_stats(user):
-    """
-    Calculate basic stats for a user for the leaderboard.
-    Returns XP, level, and league based on sessions, volume, and PRs.
-    """
-    today = timezone.now().date()
-    month_ago = today - timedelta(days=30)
 
-    # Completed sessions in last 30 days
-    sessions = WorkoutSession.objects.filter(
-        owner=user,
-        is_completed=True,
-        date__gte=month_ago,
-    )
+User = get_user_model()
 
-    sessions_count = sessions.count()
+# pg_advisory_xact_lock key: rebuilds from several processes run one at a time
+REFRESH_ADVISORY_LOCK = 5_318_008
 
-    # Total volume over 30 days
-    total_volume = sum(sess.total_volume for sess in sessions)
 
-    # Number of PRs recorded (all time)
-    prs_count = PR.objects.filter(owner=user).count()
+def _stats_window():
+    """Start of the leaderboard window (sessions and volume of the last 30 days)."""
+    today = timezone.now().date()
+    return today - timedelta(days=30)
 
-    # XP calculation:
-    #  - 10 XP per session
-    #  - 1 XP per 100 kg of volume (last 30 days)
-    #  - 5 XP per PR
-    xp = (
-        sessions_count * 10
-        + (total_volume / 100.0)
-        + prs_count * 5
-    )
 
-    # Level = XP // 50
+def level_and_league(xp):
+    """Level = XP // 50, league based on level."""
     level = int(xp // 50)
 
-    # League based on level
     if level >= 20:
         league = "Master"
     elif level >= 15:
@@ -59,6 +43,42 @@ def compute_user_stats(user):
         league = "Silver"
     else:
         league = "Bronze"
+    return level, league
+
+
+def xp_expression(sessions_count, total_volume, prs_count):
+    """
+    XP calculation:
+     - 10 XP per session
+     - 1 XP per 100 kg of volume (last 30 days)
+     - 5 XP per PR
+    Works with plain numbers as well as query expressions.
+    """
+    return sessions_count * 10 + total_volume / 100.0 + prs_count * 5
+
+
+def compute_user_stats(user):
+    """
+    Calculate basic stats for a user for the leaderboard.
+    Returns XP, level, and league based on sessions, volume, and PRs.
+    Reads the DailyUserStats rollup (one aggregate query).
+    """
+    last_30_days = Q(date__gte=_stats_window())
+
+    totals = DailyUserStats.objects.filter(user=user).aggregate(
+        # Completed sessions in last 30 days
+        sessions_count=Coalesce(Sum('sessions_count', filter=last_30_days), 0),
+        # Total volume over 30 days
+        total_volume=Coalesce(Sum('volume_kg', filter=last_30_days), 0.0),
+        # Number of PRs recorded (all time)
+        prs_count=Coalesce(Sum('prs_count'), 0),
+    )
+    sessions_count = totals['sessions_count']
+    total_volume = totals['total_volume']
+    prs_count = totals['prs_count']
+
+    xp = xp_expression(sessions_count, total_volume, prs_count)
+    level, league = level_and_league(xp)
 
     return {
         "user": user,
@@ -71,21 +91,50 @@ def compute_user_stats(user):
     }
 
 
+def annotate_user_stats(users):
+    """
+    Same stats as compute_user_stats for a whole User queryset, in one query:
+    conditional sums over the user's DailyUserStats rows (a single join, so no
+    fan-out between sessions and PRs), XP computed in SQL and used for ordering.
+    """
+    last_30_days = Q(daily_stats__date__gte=_stats_window())
+    return (
+        users
+        .annotate(
+            sessions_30d=Coalesce(Sum('daily_stats__sessions_count', filter=last_30_days), 0),
+            volume_30d=Coalesce(Sum('daily_stats__volume_kg', filter=last_30_days), 0.0),
+            prs_total=Coalesce(Sum('daily_stats__prs_count'), 0),
+        )
+        .annotate(xp=ExpressionWrapper(
+            xp_expression(F('sessions_30d'), F('volume_30d'), F('prs_total')),
+            output_field=FloatField(),
+        ))
+        .order_by('-xp', 'pk')
+    )
+
+
+def stats_row(user):
+    """Leaderboard row (same keys as compute_user_stats) of a user from annotate_user_stats."""
+    level, league = level_and_league(user.xp)
+    return {
+        "user": user,
+        "sessions_30d": user.sessions_30d,
+        "volume_30d": user.volume_30d,
+        "prs_count": user.prs_total,
+        "xp": user.xp,
+        "level": level,
+        "league": league,
+    }
+
+
 def get_leaderboard(current_user):
     """
     Build the full leaderboard list + current user's rank.
     Currently includes all active users. Could be filtered to friends in the future.
     """
-    # Only active accounts
-    users = User.objects.filter(is_superuser=False)
-
-    rows = []
-    for u in users:
-        stats = compute_user_stats(u)
-        rows.append(stats)
-
-    # Sort by XP descending
-    rows.sort(key=lambda r: r["xp"], reverse=True)
+    # Only active accounts, ranked by XP in the database
+    users = annotate_user_stats(User.objects.filter(is_superuser=False))
+    rows = [stats_row(u) for u in users]
 
     # Current user's rank
     current_rank = None
@@ -95,3 +144,159 @@ def get_leaderboard(current_user):
             break
 
     return rows, current_rank
+
+
+def refresh_leaderboard_snapshot():
+    """
+    Rebuild LeaderboardSnapshot from annotate_user_stats: one ranking query,
+    dense rank assigned in a single pass, rows swapped in one transaction.
+    On PostgreSQL an advisory lock serializes concurrent rebuilds (the
+    second one replaces the rows of the first instead of colliding on
+    the user OneToOne). Returns the number of ranked users.
+    """
+    now = timezone.now()
+    snapshots = []
+    rank = 0
+    previous_xp = None
+    for user in annotate_user_stats(User.objects.filter(is_superuser=False)):
+        row = stats_row(user)
+        if row["xp"] != previous_xp:
+            rank += 1
+            previous_xp = row["xp"]
+        row.pop("user")
+        snapshots.append(LeaderboardSnapshot(user=user, rank=rank, computed_at=now, **row))
+    leagues = Counter(snapshot.league for snapshot in snapshots)
+    for snapshot in snapshots:
+        snapshot.total_players = len(snapshots)
+        snapshot.league_players = leagues[snapshot.league]
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [REFRESH_ADVISORY_LOCK])
+        LeaderboardSnapshot.objects.all().delete()
+        LeaderboardSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+def snapshot_is_stale(computed_at):
+    """True when the snapshot is missing or older than LEADERBOARD_REFRESH_SECONDS."""
+    if computed_at is None:
+        return True
+    max_age = timedelta(seconds=settings.LEADERBOARD_REFRESH_SECONDS)
+    return timezone.now() - computed_at > max_age
+
+
+SCOPES = ("global", "friends", "league")
+
+
+def friends_filter(user):
+    """Filter on the user's accepted friends (both directions), as two id subqueries."""
+    sent = Friendship.objects.filter(from_user=user, status='accepted').values('to_user_id')
+    received = Friendship.objects.filter(to_user=user, status='accepted').values('from_user_id')
+    return Q(user_id__in=sent) | Q(user_id__in=received)
+
+
+def scoped_snapshot(user, scope, league=None):
+    """Snapshot rows visible in a scope: everyone, the user and their friends, or one league."""
+    rows = LeaderboardSnapshot.objects.all()
+    if scope == "friends":
+        rows = rows.filter(friends_filter(user) | Q(user_id=user.id))
+    elif scope == "league":
+        rows = rows.filter(league=league)
+    return rows
+
+
+def encode_cursor(row, position):
+    """Keyset cursor of the last row of a page: (xp, user_id) + its position."""
+    return f"{row.xp!r}:{row.user_id}:{position}"
+
+
+def decode_cursor(cursor):
+    """(xp, user_id, position) or None for a missing/invalid cursor (first page)."""
+    try:
+        xp, user_id, position = cursor.split(":")
+        return float(xp), int(user_id), int(position)
+    except (AttributeError, ValueError):
+        return None
+
+
+def dense_rank_in(rows, xp):
+    """Dense rank of an XP value among rows: distinct higher XP values + 1."""
+    return rows.filter(xp__gt=xp).values('xp').distinct().count() + 1
+
+
+def get_leaderboard_page(current_user, scope="global", cursor=None, size=10):
+    """
+    One page of the leaderboard from the snapshot. A request never rebuilds
+    it (the scheduled `refresh_leaderboard --loop` does): a stale snapshot is
+    served as is, with its computed_at and is_stale.
+
+    Pages are read with keyset pagination on (xp DESC, user_id): the cursor
+    holds the last row's xp and user id, so page N costs the same indexed
+    range scan as page 1. Positions are dense ranks within the scope (the
+    stored rank for the global board). A user that joined since the last
+    rebuild gets live stats and the rank their XP would have.
+    """
+    if scope not in SCOPES:
+        scope = "global"
+
+    # Any row carries the rebuild time and the board size
+    me = LeaderboardSnapshot.objects.filter(user=current_user).first()
+    reference = me or LeaderboardSnapshot.objects.first()
+    computed_at = reference.computed_at if reference else None
+
+    if me is None and not current_user.is_superuser:
+        me = compute_user_stats(current_user)
+    my_xp = None if me is None else (me["xp"] if isinstance(me, dict) else me.xp)
+    my_league = None if me is None else (me["league"] if isinstance(me, dict) else me.league)
+
+    rows_in_scope = scoped_snapshot(current_user, scope, league=my_league)
+
+    page = rows_in_scope.select_related('user').order_by('-xp', 'user_id')
+    after = decode_cursor(cursor)
+    if after is not None:
+        xp, user_id, position = after
+        page = page.filter(Q(xp__lt=xp) | Q(xp=xp, user_id__gt=user_id))
+        previous_xp = xp
+    else:
+        position, previous_xp = 0, None
+    rows = list(page[:size + 1])
+    has_next = len(rows) > size
+    rows = rows[:size]
+
+    for row in rows:
+        if scope == "global":
+            position = row.rank
+        elif row.xp != previous_xp:
+            position += 1
+        previous_xp = row.xp
+        row.position = position
+
+    if my_xp is None:
+        current_rank = None
+    elif scope == "global" and isinstance(me, LeaderboardSnapshot):
+        current_rank = me.rank
+    else:
+        current_rank = dense_rank_in(rows_in_scope, my_xp)
+
+    # Stored sizes; only the friends scope (a handful of rows) is counted
+    if scope == "global":
+        total_players = reference.total_players if reference else 0
+    elif scope == "league" and isinstance(me, LeaderboardSnapshot):
+        total_players = me.league_players
+    elif scope == "league":
+        total_players = rows_in_scope.values_list('league_players', flat=True).first() or 0
+    else:
+        total_players = rows_in_scope.count()
+
+    return {
+        "scope": scope,
+        "rows": rows,
+        "me": me,
+        "current_rank": current_rank,
+        "total_players": total_players,
+        "next_cursor": encode_cursor(rows[-1], rows[-1].position) if has_next else None,
+        "computed_at": computed_at,
+        "is_stale": snapshot_is_stale(computed_at),
+    }
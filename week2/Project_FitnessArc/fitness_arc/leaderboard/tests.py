@@ -1,8 +1,21 @@
 from django.test import TestCase
 
 # Create your tests here.
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from accounts.models import Friendship
+from workouts.models import Exercise, WorkoutSession, SetLog, PR
+from .models import LeaderboardSnapshot
+from .services import (
+    compute_user_stats, get_leaderboard, get_leaderboard_page, refresh_leaderboard_snapshot,
+)
 
 User = get_user_model()
 
@@ -15,6 +28,7 @@ class LeaderboardTests(TestCase):
         self.admin = User.objects.create_superuser("admin", password="123")
 
     def test_leaderboard_hides_admin(self):
+        refresh_leaderboard_snapshot()
         self.client.login(username="user1", password="123")
         response = self.client.get(reverse("leaderboard:index"))
 
@@ -22,4 +36,157 @@ class LeaderboardTests(TestCase):
 
         self.assertIn("user1", html)
         self.assertIn("user2", html)
-        self.assertNotIn("admin", html)
\ No newline at end of file
+        self.assertNotIn("admin", html)
+
+class LeaderboardServiceTests(TestCase):
+    def setUp(self):
+        self.exercise = Exercise.objects.create(
+            name="Squat", slug="squat", muscle_group="legs", equipment="barbell"
+        )
+        self.users = [User.objects.create_user(f"player{i}", password="123") for i in range(4)]
+        # player i: i completed sessions of 10 x (100 * i) kg, and i PRs
+        for i, user in enumerate(self.users):
+            for _ in range(i):
+                session = WorkoutSession.objects.create(owner=user)
+                SetLog.objects.create(session=session, exercise=self.exercise, set_number=1,
+                                      reps=10, weight_kg=Decimal(100 * i))
+                session.is_completed = True
+                session.duration_minutes = 30
+                session.save()
+            for metric in ("max_weight", "max_reps", "est_1rm")[:i]:
+                PR.objects.create(owner=user, exercise=self.exercise, metric=metric, value=Decimal('1.00'))
+
+    def test_rows_match_compute_user_stats(self):
+        rows, current_rank = get_leaderboard(self.users[1])
+
+        self.assertEqual([r["user"] for r in rows], list(reversed(self.users)))
+        self.assertEqual(current_rank, 3)
+        for row in rows:
+            self.assertEqual(row, compute_user_stats(row["user"]))
+
+    def test_query_count_does_not_depend_on_users(self):
+        with self.assertNumQueries(1):
+            get_leaderboard(self.users[0])
+
+
+class LeaderboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.exercise = Exercise.objects.create(
+            name="Bench", slug="bench", muscle_group="chest", equipment="barbell"
+        )
+        self.alice = User.objects.create_user("alice", password="123")
+        self.bob = User.objects.create_user("bob", password="123")
+        self.carol = User.objects.create_user("carol", password="123")
+        # alice and bob tie on one PR each, carol has nothing
+        for user in (self.alice, self.bob):
+            PR.objects.create(owner=user, exercise=self.exercise, metric="max_weight", value=Decimal('50.00'))
+
+    def test_refresh_assigns_dense_ranks(self):
+        self.assertEqual(refresh_leaderboard_snapshot(), 3)
+        ranks = dict(LeaderboardSnapshot.objects.values_list('user__username', 'rank'))
+        self.assertEqual(ranks, {"alice": 1, "bob": 1, "carol": 2})
+
+    def test_page_never_rebuilds_a_stale_snapshot(self):
+        refresh_leaderboard_snapshot()
+        PR.objects.create(owner=self.carol, exercise=self.exercise, metric="max_weight", value=Decimal('60.00'))
+        PR.objects.create(owner=self.carol, exercise=self.exercise, metric="max_reps", value=Decimal('5.00'))
+
+        page = get_leaderboard_page(self.carol)
+        self.assertEqual(page["current_rank"], 2)
+        self.assertFalse(page["is_stale"])
+
+        LeaderboardSnapshot.objects.update(computed_at=timezone.now() - timedelta(days=1))
+        page = get_leaderboard_page(self.carol)
+        self.assertEqual(page["current_rank"], 2)
+        self.assertTrue(page["is_stale"])
+        self.assertEqual(page["computed_at"], LeaderboardSnapshot.objects.first().computed_at)
+
+    def test_refresh_command_loop_rebuilds_every_period(self):
+        call_command("refresh_leaderboard", loop=True, every=0, runs=2, stdout=StringIO())
+        self.assertEqual(LeaderboardSnapshot.objects.count(), 3)
+
+        PR.objects.create(owner=self.carol, exercise=self.exercise, metric="max_weight", value=Decimal('60.00'))
+        PR.objects.create(owner=self.carol, exercise=self.exercise, metric="max_reps", value=Decimal('5.00'))
+        call_command("refresh_leaderboard", stdout=StringIO())
+        self.assertEqual(get_leaderboard_page(self.carol)["current_rank"], 1)
+
+    def test_new_user_gets_live_rank(self):
+        refresh_leaderboard_snapshot()
+        dave = User.objects.create_user("dave", password="123")
+
+        page = get_leaderboard_page(dave)
+        self.assertEqual(page["me"]["xp"], 0)
+        self.assertEqual(page["current_rank"], 2)
+
+    def test_index_query_count_does_not_depend_on_users(self):
+        refresh_leaderboard_snapshot()
+        self.client.force_login(self.alice)
+        self.client.get(reverse("leaderboard:index"))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse("leaderboard:index"))
+
+        for i in range(20):
+            User.objects.create_user(f"extra{i}", password="123")
+        refresh_leaderboard_snapshot()
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse("leaderboard:index"))
+        self.assertEqual(len(large), len(small))
+
+
+class LeaderboardScopeTests(TestCase):
+    def setUp(self):
+        self.exercise = Exercise.objects.create(
+            name="Row", slug="row", muscle_group="back", equipment="barbell"
+        )
+        self.me = User.objects.create_user("me", password="123")
+        self.friend = User.objects.create_user("friend", password="123")
+        self.stranger = User.objects.create_user("stranger", password="123")
+        Friendship.objects.create(from_user=self.friend, to_user=self.me, status='accepted')
+        Friendship.objects.create(from_user=self.me, to_user=self.stranger, status='pending')
+        PR.objects.create(owner=self.stranger, exercise=self.exercise, metric="max_weight", value=Decimal('1.00'))
+        PR.objects.create(owner=self.friend, exercise=self.exercise, metric="max_reps", value=Decimal('1.00'))
+        refresh_leaderboard_snapshot()
+
+    def test_friends_scope_only_lists_accepted_friends_and_me(self):
+        page = get_leaderboard_page(self.me, scope="friends")
+
+        self.assertEqual([r.user for r in page["rows"]], [self.friend, self.me])
+        self.assertEqual([r.position for r in page["rows"]], [1, 2])
+        self.assertEqual(page["current_rank"], 2)
+        self.assertEqual(page["total_players"], 2)
+
+    def test_league_scope_uses_my_league(self):
+        page = get_leaderboard_page(self.me, scope="league")
+        self.assertEqual(page["total_players"], 3)
+        self.assertTrue(all(r.league == "Bronze" for r in page["rows"]))
+
+    def test_global_total_comes_from_the_snapshot(self):
+        page = get_leaderboard_page(self.me)
+        self.assertEqual(page["total_players"], 3)
+        with CaptureQueriesContext(connection) as queries:
+            get_leaderboard_page(self.me)
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+
+    def test_keyset_pages_cover_every_row_once(self):
+        for i in range(12):
+            User.objects.create_user(f"extra{i:02d}", password="123")
+        refresh_leaderboard_snapshot()
+
+        seen, positions, cursor = [], [], None
+        while True:
+            page = get_leaderboard_page(self.me, cursor=cursor, size=4)
+            seen += [r.user_id for r in page["rows"]]
+            positions += [r.position for r in page["rows"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        expected = list(LeaderboardSnapshot.objects.order_by('-xp', 'user_id').values_list('user_id', 'rank'))
+        self.assertEqual(list(zip(seen, positions)), expected)
+
+    def test_scope_is_selected_from_the_query_string(self):
+        self.client.force_login(self.me)
+        response = self.client.get(reverse("leaderboard:index"), {"scope": "friends"})
+        html = response.content.decode()
+        self.assertIn("friend", html)
+        self.assertNotIn("stranger", html)
@@ -2,31 +2,33 @@ from django.contrib.auth.decorators import login_required
 from accounts.decorators import feature_required
 from django.shortcuts import render
 
-from .services import get_leaderboard
+from .services import get_leaderboard_page
 
 
 @login_required
 @feature_required('leaderboard')
 def index(request):
     """
-    Page principale du leaderboard.
+    Page principale du leaderboard (lue depuis le snapshot précalculé).
+    ?scope=global|friends|league, ?after=<curseur> pour la page suivante.
     """
-    rows, current_rank = get_leaderboard(request.user)
-
-    # Top 10 global
-    top_10 = rows[:10]
-
-    # Personal stats (or None if not found, unlikely)
-    me = None
-    for r in rows:
-        if r["user"] == request.user:
-            me = r
-            break
+    page = get_leaderboard_page(
+        request.user,
+        scope=request.GET.get("scope", "global"),
+        cursor=request.GET.get("after"),
+    )
 
     context = {
-        "top_10": top_10,
-        "me": me,
-        "current_rank": current_rank,
-        "total_players": len(rows),
+        "scope": page["scope"],
+        # Top 10 (or the requested page) of the scope
+        "top_10": page["rows"],
+        "is_first_page": not request.GET.get("after"),
+        "next_cursor": page["next_cursor"],
+        # Personal stats (None for admin accounts, which are not ranked)
+        "me": page["me"],
+        "current_rank": page["current_rank"],
+        "total_players": page["total_players"],
+        "computed_at": page["computed_at"],
+        "is_stale": page["is_stale"],
     }
-    return render(request, "leaderboard/index.html", context)
\ No newline at end of file
+    return render(request, "leaderboard/index.html", context)
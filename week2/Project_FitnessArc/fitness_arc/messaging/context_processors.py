@@ -1,19 +1,18 @@
-from .models import Message
+from accounts.context_processors import get_profile
+
 
 def unread_messages(request):
     """
     Add the number of unread messages for the logged-in user
-    to every template as 'unread_messages_count'.
+    to every template as 'unread_messages_count'
+    (Profile.unread_messages_count, read lazily).
     """
     user = getattr(request, "user", None)
     if not user or not user.is_authenticated:
         return {}
 
-    count = (
-        Message.objects
-        .filter(conversation__participants=user, is_read=False)
-        .exclude(sender=user)          # only messages sent BY others
-        .count()
-    )
+    def count():
+        profile = get_profile(request)
+        return profile.unread_messages_count if profile else 0
 
     return {"unread_messages_count": count}
@@ -0,0 +1,88 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_read_state(apps, schema_editor):
+    """
+    last_read_message_id / unread_count des participants existants, depuis
+    Message.is_read (supprimé juste après) : le dernier message lu est celui
+    qui précède le premier message non lu reçu, sinon le dernier message.
+    """
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    Message = apps.get_model('messaging', 'Message')
+
+    received_unread = (
+        Message.objects
+        .filter(conversation_id=OuterRef('conversation_id'), is_read=False)
+        .exclude(sender_id=OuterRef('user_id'))
+        .order_by()
+    )
+    in_conversation = Message.objects.filter(conversation_id=OuterRef('conversation_id')).order_by()
+
+    ConversationParticipant.objects.update(
+        unread_count=Coalesce(
+            Subquery(received_unread.annotate(n=Func(F('pk'), function='COUNT')).values('n')), 0
+        ),
+        last_read_message_id=Coalesce(
+            Subquery(received_unread.annotate(first=Func(F('pk'), function='MIN')).values('first')) - Value(1),
+            Subquery(in_conversation.annotate(last=Func(F('pk'), function='MAX')).values('last')),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('messaging', '0002_hot_path_indexes'),
+        # Its backfill still reads Message.is_read
+        ('accounts', '0006_profile_badge_counters'),
+    ]
+
+    operations = [
+        # The M2M table becomes an explicit through model (no table change)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='messaging.conversation')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'messaging_conversation_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='messaging.ConversationParticipant', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_read_state, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messaging_msg_unread',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def merge_private_conversations(apps, schema_editor):
+    """
+    Fusionne les conversations en double d'une même paire d'utilisateurs
+    (créées par des premiers messages simultanés) dans la plus ancienne,
+    puis remplit pair_key.
+    The read state is merged too: unread counts are added up (the badge
+    totals stay right), the furthest read marker is kept.
+    """
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    Message = apps.get_model('messaging', 'Message')
+
+    members = defaultdict(list)
+    for conversation_id, user_id in ConversationParticipant.objects.values_list('conversation_id', 'user_id'):
+        members[conversation_id].append(user_id)
+    by_pair = defaultdict(list)
+    for conversation_id, user_ids in members.items():
+        if len(user_ids) == 2:
+            low, high = sorted(user_ids)
+            by_pair[f"{low}:{high}"].append(conversation_id)
+
+    keys = []
+    for key, conversation_ids in by_pair.items():
+        keep, *duplicates = sorted(conversation_ids)
+        if duplicates:
+            Message.objects.filter(conversation_id__in=duplicates).update(conversation_id=keep)
+            for row in ConversationParticipant.objects.filter(conversation_id__in=duplicates):
+                kept = ConversationParticipant.objects.filter(conversation_id=keep, user_id=row.user_id)
+                kept.update(unread_count=F('unread_count') + row.unread_count)
+                kept.filter(last_read_message_id__lt=row.last_read_message_id).update(
+                    last_read_message_id=row.last_read_message_id
+                )
+            Conversation.objects.filter(pk__in=duplicates).delete()
+        keys.append(Conversation(pk=keep, pair_key=key))
+    Conversation.objects.bulk_update(keys, ['pair_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_conversationparticipant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='pair_key',
+            field=models.CharField(blank=True, editable=False, max_length=41, null=True),
+        ),
+        migrations.RunPython(merge_private_conversations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='conversation',
+            name='pair_key',
+            field=models.CharField(blank=True, editable=False, max_length=41, null=True, unique=True),
+        ),
+    ]
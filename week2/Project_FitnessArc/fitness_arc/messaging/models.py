@@ -6,16 +6,26 @@ class Conversation(models.Model):
     """
     Private conversation between 2 users (can be extended later).
     """
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(User, through='ConversationParticipant', related_name='conversations')
+    # "<smallest user id>:<largest user id>" of a private conversation: one
+    # conversation per pair, found by a single unique-index lookup
+    pair_key = models.CharField(max_length=41, unique=True, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-updated_at']
 
+    @staticmethod
+    def pair_key_for(user1, user2):
+        low, high = sorted((user1.pk, user2.pk))
+        return f"{low}:{high}"
+
     def __str__(self):
-        names = ", ".join(self.participants.values_list('username', flat=True))
-        return f"Conversation({names})"
+        # No query per row: the names only when the participants were prefetched
+        if 'participants' in getattr(self, '_prefetched_objects_cache', {}):
+            return f"Conversation({', '.join(user.username for user in self.participants.all())})"
+        return f"Conversation({self.pair_key or self.pk})"
 
 
 class Message(models.Model):
@@ -31,10 +41,37 @@ class Message(models.Model):
     )
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Messages of a conversation in order
+            models.Index(fields=['conversation', 'created_at'], name='messaging_msg_conv_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.sender.username}: {self.text[:40]}"
+
+
+class ConversationParticipant(models.Model):
+    """
+    Membership of a user in a conversation, with its read state:
+    messages after last_read_message_id are unread, unread_count keeps their
+    number (messages from the others only). Both are maintained with UPDATE
+    queries by messaging.services.
+    """
+    # The auto-created M2M table this model took over has a bigint primary
+    # key (DEFAULT_AUTO_FIELD = BigAutoField)
+    id = models.BigAutoField(primary_key=True)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Table of the former auto-created M2M, kept as is
+        db_table = 'messaging_conversation_participants'
+        unique_together = ('conversation', 'user')
 
     def __str__(self):
-        return f"{self.sender.username}: {self.text[:40]}"
\ No newline at end of file
+        return f"{self.user_id} in {self.conversation_id} ({self.unread_count} non lus)"
\ No newline at end of file
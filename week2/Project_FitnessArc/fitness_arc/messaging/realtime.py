@@ -0,0 +1,107 @@
+"""
+Temps réel pour la messagerie : couche de diffusion ("channel layer")
+et flux server-sent events.
+
+- publish(group, event, data) is called from synchronous code (signals,
+  after commit) and delivers to every subscriber of the group.
+- Groups: "conversation-<id>" (new messages of a conversation) and
+  "user-<id>" (unread badge of a user).
+- The layer class comes from settings.MESSAGING_CHANNEL_LAYER. The default
+  InMemoryChannelLayer only reaches subscribers of the same process: fine
+  for tests and a single ASGI worker, several nodes need a shared
+  implementation (e.g. Redis pub/sub) with the same three methods.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryChannelLayer:
+    """Subscribers are asyncio queues, fed thread-safely on their own event loop."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._groups = defaultdict(set)
+
+    def publish(self, group, message):
+        with self._lock:
+            subscribers = list(self._groups.get(group, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:
+                # Loop already closed: the subscriber is gone
+                pass
+
+    def has_subscribers(self, *groups):
+        """True when one of `groups` (any group without arguments) has a subscriber."""
+        with self._lock:
+            if not groups:
+                return bool(self._groups)
+            return any(group in self._groups for group in groups)
+
+    @staticmethod
+    def _deliver(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Abonné trop lent, message ignoré")
+
+    @asynccontextmanager
+    async def subscribe(self, *groups):
+        """async with layer.subscribe(group, ...) as queue: messages arrive on `queue`."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            for group in groups:
+                self._groups[group].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                for group in groups:
+                    self._groups[group].discard(subscriber)
+                    if not self._groups[group]:
+                        del self._groups[group]
+
+
+@lru_cache(maxsize=None)
+def get_channel_layer():
+    """The process-wide layer configured in settings.MESSAGING_CHANNEL_LAYER."""
+    return import_string(settings.MESSAGING_CHANNEL_LAYER)()
+
+
+def publish(group, event, data):
+    get_channel_layer().publish(group, {"event": event, "data": data})
+
+
+def has_subscribers(*groups):
+    return get_channel_layer().has_subscribers(*groups)
+
+
+async def event_stream(groups, heartbeat=None):
+    """
+    Server-sent events of the given groups, forever (the ASGI handler cancels
+    the iterator when the client disconnects). A comment line every
+    `heartbeat` seconds keeps proxies from closing an idle connection.
+    """
+    heartbeat = heartbeat or settings.MESSAGING_SSE_HEARTBEAT
+    async with get_channel_layer().subscribe(*groups) as queue:
+        # Tells the client to reconnect after 3 s if the stream drops
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
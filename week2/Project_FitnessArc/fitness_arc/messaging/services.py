@@ -0,0 +1,187 @@
+"""
+État de lecture des conversations.
+
+ConversationParticipant keeps, per member, the last message read and the
+number of unread messages; Profile.unread_messages_count is their total
+(navbar badge). Everything is maintained with UPDATE ... F() queries:
+- a new message adds one to the other members (the sender's own messages
+  never count as unread for it);
+- opening a conversation resets the reader's row and subtracts its former
+  unread_count from the badge.
+
+History is read with keyset pagination on (created_at, id), through the
+(conversation, created_at) index: the cost of a page does not depend on the
+length of the conversation.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from accounts.models import Profile
+from accounts.services import count_subquery
+
+from .models import ConversationParticipant, Message
+from .realtime import has_subscribers, publish
+
+
+def message_sent(message):
+    """One more unread message for the other participants."""
+    recipients = (
+        ConversationParticipant.objects
+        .filter(conversation_id=message.conversation_id)
+        .exclude(user_id=message.sender_id)
+    )
+    recipients.update(unread_count=F('unread_count') + 1)
+    Profile.objects.filter(user_id__in=recipients.values('user_id')).update(
+        unread_messages_count=F('unread_messages_count') + 1
+    )
+
+
+def message_payload(message):
+    """JSON-ready form of a message (history API and live events)."""
+    return {
+        "id": message.pk,
+        "conversation_id": message.conversation_id,
+        "sender": message.sender.username,
+        "text": message.text,
+        "created_at": message.created_at.isoformat(),
+        "display_date": date_format(timezone.localtime(message.created_at), "d/m H:i"),
+    }
+
+
+def broadcast_message(message):
+    """
+    Live events of a committed message: the message to the conversation
+    group, the new badge count to each recipient's user group.
+    Nothing is read when no stream is open (always the case under WSGI,
+    where the stream views answer 204).
+    """
+    if not has_subscribers():
+        return
+    publish(f"conversation-{message.conversation_id}", "message", message_payload(message))
+    badges = Profile.objects.filter(
+        user__conversation_memberships__conversation_id=message.conversation_id,
+    ).exclude(user_id=message.sender_id).values_list('user_id', 'unread_messages_count')
+    for user_id, count in badges:
+        publish(f"user-{user_id}", "unread", {"count": count})
+
+
+def unread_message_deleted(message):
+    """A message is deleted: one less for the members who had not read it yet."""
+    not_read_yet = (
+        ConversationParticipant.objects
+        .filter(conversation_id=message.conversation_id, last_read_message_id__lt=message.pk)
+        .exclude(user_id=message.sender_id)
+    )
+    Profile.objects.filter(user_id__in=not_read_yet.values('user_id')).update(
+        unread_messages_count=Greatest(F('unread_messages_count') - 1, 0)
+    )
+    not_read_yet.update(unread_count=Greatest(F('unread_count') - 1, 0))
+
+
+def mark_conversation_read(user, conversation):
+    """
+    `user` has read the whole conversation. The row is locked so that a
+    message sent meanwhile is either counted here or after the reset.
+    Returns the number of messages that were unread.
+    """
+    with transaction.atomic():
+        participant = (
+            ConversationParticipant.objects
+            .select_for_update()
+            .filter(conversation=conversation, user=user)
+            .first()
+        )
+        if participant is None:
+            return 0
+        last_id = conversation.messages.aggregate(last=Max('pk'))['last'] or 0
+        if participant.unread_count == 0 and participant.last_read_message_id >= last_id:
+            return 0
+        ConversationParticipant.objects.filter(pk=participant.pk).update(
+            unread_count=0, last_read_message_id=Greatest(F('last_read_message_id'), last_id),
+        )
+        if participant.unread_count:
+            Profile.objects.filter(user=user).update(
+                unread_messages_count=Greatest(F('unread_messages_count') - participant.unread_count, 0)
+            )
+        return participant.unread_count
+
+
+def refresh_unread_counts(conversation_ids):
+    """Recount unread_count from last_read_message_id (after bulk inserts), one UPDATE."""
+    unread = (
+        Message.objects
+        .filter(conversation_id=OuterRef('conversation_id'), pk__gt=OuterRef('last_read_message_id'))
+        .exclude(sender_id=OuterRef('user_id'))
+    )
+    ConversationParticipant.objects.filter(conversation_id__in=conversation_ids).update(
+        unread_count=count_subquery(unread)
+    )
+
+
+def refresh_unread_messages(user_ids):
+    """Recompute the badge total (Profile.unread_messages_count) of these users, one UPDATE."""
+    total = (
+        ConversationParticipant.objects
+        .filter(user_id=OuterRef('user_id'))
+        .order_by()
+        .values('user_id')
+        .annotate(total=Sum('unread_count'))
+        .values('total')
+    )
+    Profile.objects.filter(user_id__in=user_ids).update(
+        unread_messages_count=Coalesce(Subquery(total), 0)
+    )
+
+
+PAGE_SIZE = 50
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(message):
+    """Opaque position of a message: "<created_at in µs since epoch>:<id>"."""
+    return f"{(message.created_at - _EPOCH) // _MICROSECOND}:{message.pk}"
+
+
+def decode_cursor(cursor):
+    """(created_at, id) of a cursor, ValueError when it is malformed."""
+    micros, pk = (int(part) for part in cursor.split(":"))
+    return _EPOCH + timedelta(microseconds=micros), pk
+
+
+def history_page(conversation, before=None, size=PAGE_SIZE):
+    """
+    The `size` latest messages older than the `before` cursor (the latest
+    ones without cursor), in chronological order.
+    Returns (messages, cursor of the next older page or None).
+    """
+    messages = conversation.messages.select_related('sender').order_by('-created_at', '-pk')
+    if before:
+        created_at, pk = decode_cursor(before)
+        messages = messages.filter(created_at__lte=created_at).exclude(created_at=created_at, pk__gte=pk)
+    rows = list(messages[:size + 1])
+    has_older = len(rows) > size
+    rows = rows[:size]
+    rows.reverse()
+    return rows, (encode_cursor(rows[0]) if has_older else None)
+
+
+def messages_after(conversation, after_id, limit=PAGE_SIZE):
+    """
+    Messages posted after message `after_id` (polling), oldest first.
+    The anchor's created_at turns the id into an index range.
+    """
+    messages = conversation.messages.select_related('sender').order_by('created_at', 'pk')
+    anchor = conversation.messages.filter(pk=after_id).values_list('created_at', flat=True).first()
+    if anchor is None:
+        # Deleted anchor: ids still only grow
+        messages = messages.filter(pk__gt=after_id)
+    else:
+        messages = messages.filter(created_at__gte=anchor).exclude(created_at=anchor, pk__lte=after_id)
+    return list(messages[:limit])
@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Message
+from .services import broadcast_message, message_sent, unread_message_deleted
+
+
+@receiver(post_save, sender=Message)
+def count_new_message(sender, instance, created, **kwargs):
+    """Incrémente les compteurs de non lus des destinataires."""
+    if created:
+        message_sent(instance)
+        # Live subscribers only see committed messages
+        transaction.on_commit(lambda: broadcast_message(instance))
+
+
+@receiver(pre_delete, sender=Message)
+def uncount_deleted_message(sender, instance, **kwargs):
+    # pre_delete: the participants are still there (a conversation delete
+    # removes them in the same cascade)
+    unread_message_deleted(instance)
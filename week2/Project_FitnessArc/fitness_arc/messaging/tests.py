@@ -1,9 +1,17 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
 
 # Create your tests here.
 from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Conversation, Message
+from .models import Conversation, ConversationParticipant, Message
+from .realtime import InMemoryChannelLayer, event_stream, get_channel_layer, publish
+from .services import broadcast_message, refresh_unread_counts, refresh_unread_messages
 from .views import _get_or_create_private_conversation
 
 
@@ -27,6 +35,19 @@ class ConversationModelTests(TestCase):
         )
 
 
+    def test_private_conversation_is_found_by_pair_key(self):
+        conv = _get_or_create_private_conversation(self.bob, self.alice)
+        self.assertEqual(conv.pair_key, Conversation.pair_key_for(self.alice, self.bob))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(_get_or_create_private_conversation(self.alice, self.bob), conv)
+
+    def test_pair_key_is_unique(self):
+        Conversation.objects.create(pair_key=Conversation.pair_key_for(self.alice, self.bob))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Conversation.objects.create(pair_key=Conversation.pair_key_for(self.bob, self.alice))
+
+
 class MessagingViewsTests(TestCase):
     def setUp(self):
         self.alice = User.objects.create_user("alice", password="pwd12345")
@@ -61,7 +82,6 @@ class MessagingViewsTests(TestCase):
             conversation=conv,
             sender=self.bob,
             text="Unseen message",
-            is_read=False,
         )
 
         # Alice ouvre la conversation
@@ -71,8 +91,42 @@ class MessagingViewsTests(TestCase):
 
         self.assertEqual(resp.status_code, 200)
 
-        msg.refresh_from_db()
-        self.assertTrue(msg.is_read)
+        membership = ConversationParticipant.objects.get(conversation=conv, user=self.alice)
+        self.assertEqual(membership.unread_count, 0)
+        self.assertEqual(membership.last_read_message_id, msg.pk)
+        self.alice.profile.refresh_from_db()
+        self.assertEqual(self.alice.profile.unread_messages_count, 0)
+
+    def test_unread_counter_follows_sent_and_deleted_messages(self):
+        conv = _get_or_create_private_conversation(self.alice, self.bob)
+        Message.objects.create(conversation=conv, sender=self.bob, text="1")
+        Message.objects.create(conversation=conv, sender=self.bob, text="2")
+        Message.objects.create(conversation=conv, sender=self.alice, text="3")
+
+        self.alice.profile.refresh_from_db()
+        self.bob.profile.refresh_from_db()
+        self.assertEqual(self.alice.profile.unread_messages_count, 2)
+        self.assertEqual(self.bob.profile.unread_messages_count, 1)
+        memberships = {m.user_id: m for m in conv.memberships.all()}
+        self.assertEqual(memberships[self.alice.pk].unread_count, 2)
+        self.assertEqual(memberships[self.bob.pk].unread_count, 1)
+
+        conv.delete()
+        self.alice.profile.refresh_from_db()
+        self.assertEqual(self.alice.profile.unread_messages_count, 0)
+
+    def test_refresh_matches_incremental_counters(self):
+        conv = _get_or_create_private_conversation(self.alice, self.bob)
+        for text in ("1", "2", "3"):
+            Message.objects.create(conversation=conv, sender=self.bob, text=text)
+        ConversationParticipant.objects.update(unread_count=0)
+
+        refresh_unread_counts([conv.pk])
+        refresh_unread_messages([self.alice.pk, self.bob.pk])
+
+        self.assertEqual(conv.memberships.get(user=self.alice).unread_count, 3)
+        self.alice.profile.refresh_from_db()
+        self.assertEqual(self.alice.profile.unread_messages_count, 3)
 
     def test_inbox_lists_user_conversations(self):
         """
@@ -90,3 +144,189 @@ class MessagingViewsTests(TestCase):
 
         # Alice ne voit que ses conversations
         self.assertEqual(conversations, [conv_ab])
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pwd12345")
+        self.client.login(username="alice", password="pwd12345")
+
+    def _add_conversations(self, count, start=0):
+        others = User.objects.bulk_create(
+            [User(username=f"friend{start + i}") for i in range(count)]
+        )
+        conversations = Conversation.objects.bulk_create(
+            [Conversation(pair_key=Conversation.pair_key_for(self.alice, other)) for other in others]
+        )
+        ConversationParticipant.objects.bulk_create(
+            [ConversationParticipant(conversation=conv, user=user, unread_count=1 if user != self.alice else 0)
+             for conv, other in zip(conversations, others) for user in (self.alice, other)]
+        )
+        Message.objects.bulk_create(
+            [Message(conversation=conv, sender=other, text=f"Salut de {other.username}")
+             for conv, other in zip(conversations, others)]
+        )
+        return conversations
+
+    def test_inbox_shows_last_message_and_unread_count(self):
+        conv = _get_or_create_private_conversation(self.alice, User.objects.create_user("bob"))
+        Message.objects.create(conversation=conv, sender=conv.participants.get(username="bob"), text="Premier")
+        Message.objects.create(conversation=conv, sender=self.alice, text="Dernier")
+
+        resp = self.client.get(reverse("messaging:inbox"))
+
+        row = resp.context["conversations"][0]
+        self.assertEqual(row.last_message_text, "Dernier")
+        self.assertEqual(row.last_sender_id, self.alice.pk)
+        self.assertEqual(row.unread_count, 1)
+        self.assertContains(resp, "Vous : Dernier")
+
+    def test_inbox_cost_does_not_depend_on_conversation_count(self):
+        url = reverse("messaging:inbox")
+        self._add_conversations(5)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        self._add_conversations(495, start=5)
+        with CaptureQueriesContext(connection) as many:
+            resp = self.client.get(url)
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(resp.context["page_obj"].paginator.count, 500)
+        self.assertEqual(len(resp.context["conversations"]), 20)
+
+
+class ConversationHistoryTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pwd12345")
+        self.bob = User.objects.create_user("bob", password="pwd12345")
+        self.conv = _get_or_create_private_conversation(self.alice, self.bob)
+        self.client.login(username="alice", password="pwd12345")
+        self.url = reverse("messaging:conversation_messages", args=[self.bob.username])
+
+    def _add_messages(self, count):
+        # bulk_create: many messages share the same created_at, the id breaks ties
+        Message.objects.bulk_create(
+            [Message(conversation=self.conv, sender=self.bob, text=f"m{i}") for i in range(count)]
+        )
+        return list(self.conv.messages.order_by("created_at", "pk").values_list("pk", flat=True))
+
+    def test_page_shows_latest_messages_and_older_pages_follow(self):
+        ids = self._add_messages(120)
+
+        resp = self.client.get(reverse("messaging:conversation_with", args=[self.bob.username]))
+        self.assertEqual([m.pk for m in resp.context["messages"]], ids[-50:])
+
+        seen = [m.pk for m in resp.context["messages"]]
+        cursor = resp.context["older_cursor"]
+        while cursor:
+            data = self.client.get(self.url, {"before": cursor}).json()
+            seen = [m["id"] for m in data["messages"]] + seen
+            cursor = data["older_cursor"]
+        self.assertEqual(seen, ids)
+
+    def test_poll_returns_newer_messages_and_marks_them_read(self):
+        ids = self._add_messages(3)
+        Message.objects.create(conversation=self.conv, sender=self.bob, text="new")
+
+        data = self.client.get(self.url, {"after": ids[-1]}).json()
+
+        self.assertEqual([m["text"] for m in data["messages"]], ["new"])
+        self.assertFalse(data["messages"][0]["mine"])
+        self.assertEqual(self.conv.memberships.get(user=self.alice).unread_count, 0)
+        self.assertEqual(self.client.get(self.url, {"before": "oops"}).status_code, 400)
+
+    def test_page_cost_does_not_depend_on_conversation_length(self):
+        page = reverse("messaging:conversation_with", args=[self.bob.username])
+        self._add_messages(10)
+        with CaptureQueriesContext(connection) as short:
+            self.client.get(page)
+        self._add_messages(500)
+        with CaptureQueriesContext(connection) as long:
+            self.client.get(page)
+
+        self.assertEqual(len(short), len(long))
+
+
+class RecordingChannelLayer(InMemoryChannelLayer):
+    """Records what is published, as if a stream were open on every group."""
+    published = []
+
+    def has_subscribers(self, *groups):
+        return True
+
+    def publish(self, group, message):
+        self.published.append((group, message))
+        super().publish(group, message)
+
+
+@override_settings(MESSAGING_CHANNEL_LAYER="messaging.tests.RecordingChannelLayer")
+class RealtimeTests(TestCase):
+    def setUp(self):
+        get_channel_layer.cache_clear()
+        RecordingChannelLayer.published = []
+        self.addCleanup(get_channel_layer.cache_clear)
+        self.alice = User.objects.create_user("alice", password="pwd12345")
+        self.bob = User.objects.create_user("bob", password="pwd12345")
+
+    def test_committed_message_is_published(self):
+        conv = _get_or_create_private_conversation(self.alice, self.bob)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(conversation=conv, sender=self.bob, text="Salut")
+
+        groups = {group: message for group, message in RecordingChannelLayer.published}
+        self.assertEqual(groups[f"conversation-{conv.pk}"]["data"]["text"], "Salut")
+        self.assertEqual(groups[f"user-{self.alice.pk}"], {"event": "unread", "data": {"count": 1}})
+        self.assertNotIn(f"user-{self.bob.pk}", groups)
+
+    @override_settings(MESSAGING_CHANNEL_LAYER="messaging.realtime.InMemoryChannelLayer")
+    def test_nothing_is_read_without_subscribers(self):
+        get_channel_layer.cache_clear()
+        conv = _get_or_create_private_conversation(self.alice, self.bob)
+        message = Message.objects.create(conversation=conv, sender=self.bob, text="Salut")
+        with self.assertNumQueries(0):
+            broadcast_message(message)
+
+    def test_stream_answers_204_outside_asgi(self):
+        _get_or_create_private_conversation(self.alice, self.bob)
+        self.client.login(username="alice", password="pwd12345")
+
+        resp = self.client.get(reverse("messaging:conversation_stream", args=[self.bob.username]))
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(self.client.get(reverse("messaging:unread_stream")).status_code, 204)
+
+
+    async def test_asgi_stream_releases_the_database_connection(self):
+        await sync_to_async(_get_or_create_private_conversation)(self.alice, self.bob)
+        await self.async_client.aforce_login(self.alice)
+        with mock.patch("messaging.views.close_old_connections") as close:
+            resp = await self.async_client.get(reverse("messaging:unread_stream"))
+        self.assertTrue(resp.streaming)
+        close.assert_called_once_with()
+
+
+class ChannelLayerTests(SimpleTestCase):
+    async def test_event_stream_delivers_messages_published_from_another_thread(self):
+        layer = InMemoryChannelLayer()
+        received = []
+        async with layer.subscribe("conversation-1") as queue:
+            self.assertTrue(layer.has_subscribers("conversation-1"))
+            self.assertFalse(layer.has_subscribers("conversation-2"))
+            # publish() comes from synchronous code (signals) in another thread
+            await sync_to_async(layer.publish, thread_sensitive=False)("conversation-1", {"n": 1})
+            layer.publish("conversation-2", {"n": 2})
+            received.append(await asyncio.wait_for(queue.get(), timeout=1))
+            self.assertTrue(queue.empty())
+        self.assertEqual(received, [{"n": 1}])
+        self.assertEqual(dict(layer._groups), {})
+        self.assertFalse(layer.has_subscribers())
+
+    @override_settings(MESSAGING_CHANNEL_LAYER="messaging.realtime.InMemoryChannelLayer")
+    async def test_event_stream_formats_server_sent_events(self):
+        get_channel_layer.cache_clear()
+        stream = event_stream(["user-1"], heartbeat=0.05)
+        self.assertEqual(await anext(stream), "retry: 3000\n\n")
+        self.assertEqual(await anext(stream), ": ping\n\n")
+        publish("user-1", "unread", {"count": 2})
+        self.assertEqual(await anext(stream), 'event: unread\ndata: {"count": 2}\n\n')
+        await stream.aclose()
+        get_channel_layer.cache_clear()
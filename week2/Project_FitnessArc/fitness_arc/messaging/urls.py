@@ -5,5 +5,8 @@ app_name = "messaging"
 
 urlpatterns = [
     path('', views.inbox, name='inbox'),
+    path('stream/', views.unread_stream, name='unread_stream'),
     path('with/<str:username>/', views.conversation_with, name='conversation_with'),
+    path('with/<str:username>/messages/', views.conversation_messages, name='conversation_messages'),
+    path('with/<str:username>/stream/', views.conversation_stream, name='conversation_stream'),
 ]
\ No newline at end of file
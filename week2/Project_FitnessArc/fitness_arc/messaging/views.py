@@ -1,34 +1,64 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Max
+from django.db import IntegrityError, close_old_connections, transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.paginator import Paginator
+from django.db.models import F, OuterRef, Prefetch, Subquery
 
 from .models import Conversation, Message
+from .realtime import event_stream
+from .services import history_page, mark_conversation_read, message_payload, messages_after
+
+
+def _get_private_conversation(user1, user2):
+    return Conversation.objects.filter(pair_key=Conversation.pair_key_for(user1, user2)).first()
 
 
 def _get_or_create_private_conversation(user1, user2):
-    conv = (
-        Conversation.objects
-        .filter(participants=user1)
-        .filter(participants=user2)
-        .first()
-    )
-    if not conv:
-        conv = Conversation.objects.create()
-        conv.participants.add(user1, user2)
+    conv = _get_private_conversation(user1, user2)
+    if conv:
+        return conv
+    try:
+        with transaction.atomic():
+            conv = Conversation.objects.create(pair_key=Conversation.pair_key_for(user1, user2))
+            conv.participants.add(user1, user2)
+    except IntegrityError:
+        # Created meanwhile by a concurrent request (unique pair_key)
+        conv = _get_private_conversation(user1, user2)
     return conv
 
 
+INBOX_PAGE_SIZE = 20
+
+
 @login_required
 def inbox(request):
+    """
+    Conversations de l'utilisateur, la plus récente d'abord, paginées.
+    One query per page: last message (text, sender, date) and unread count
+    come from subqueries on the (conversation, created_at) index and the
+    user's participant row; the participants are prefetched.
+    """
+    last_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-pk')
     conversations = (
         Conversation.objects
-        .filter(participants=request.user)
-        .annotate(last_message_at=Max('messages__created_at'))
-        .order_by('-last_message_at')
+        .filter(memberships__user=request.user)
+        .annotate(
+            last_message_at=Subquery(last_message.values('created_at')[:1]),
+            last_message_text=Subquery(last_message.values('text')[:1]),
+            last_sender_id=Subquery(last_message.values('sender_id')[:1]),
+            unread_count=F('memberships__unread_count'),
+        )
+        .prefetch_related(Prefetch('participants', queryset=User.objects.only('id', 'username')))
+        .order_by(F('last_message_at').desc(nulls_last=True), '-pk')
     )
+    page = Paginator(conversations, INBOX_PAGE_SIZE).get_page(request.GET.get('page'))
     return render(request, 'messaging/inbox.html', {
-        'conversations': conversations,
+        'conversations': page,
+        'page_obj': page,
     })
 
 
@@ -45,20 +75,96 @@ def conversation_with(request, username):
     if request.method == 'POST':
         text = request.POST.get('text', '').strip()
         if text:
-            Message.objects.create(
-                conversation=conv,
-                sender=request.user,
-                text=text
-            )
+            # Message and unread counters together (post_save signal)
+            with transaction.atomic():
+                Message.objects.create(
+                    conversation=conv,
+                    sender=request.user,
+                    text=text
+                )
             return redirect('messaging:conversation_with', username=other.username)
 
-    messages = conv.messages.select_related('sender')
+    # Latest page only, older ones come from conversation_messages
+    messages, older_cursor = history_page(conv)
 
-    # Mark messages from the other user as read
-    conv.messages.filter(sender=other, is_read=False).update(is_read=True)
+    # Mark messages from the other user as read (one participant row)
+    mark_conversation_read(request.user, conv)
 
     return render(request, 'messaging/conversation_detail.html', {
         'conversation': conv,
         'other_user': other,
         'messages': messages,
-    })
\ No newline at end of file
+        'older_cursor': older_cursor,
+        'last_message_id': messages[-1].pk if messages else 0,
+    })
+
+
+def _message_json(message, user):
+    return {**message_payload(message), "mine": message.sender_id == user.pk}
+
+
+@login_required
+def conversation_messages(request, username):
+    """
+    Historique d'une conversation en JSON.
+    ?before=<cursor> : page plus ancienne (50 messages) ;
+    ?after=<message id> : messages plus récents (polling), marqués comme lus.
+    """
+    other = get_object_or_404(User, username=username)
+    conv = _get_private_conversation(request.user, other)
+    if conv is None:
+        raise Http404("Aucune conversation")
+
+    if 'after' in request.GET:
+        try:
+            after_id = int(request.GET['after'])
+        except ValueError:
+            return JsonResponse({"error": "Identifiant invalide"}, status=400)
+        messages = messages_after(conv, after_id)
+        if any(m.sender_id != request.user.pk for m in messages):
+            mark_conversation_read(request.user, conv)
+        return JsonResponse({"messages": [_message_json(m, request.user) for m in messages]})
+
+    try:
+        messages, older_cursor = history_page(conv, before=request.GET.get('before') or None)
+    except ValueError:
+        return JsonResponse({"error": "Curseur invalide"}, status=400)
+    return JsonResponse({
+        "messages": [_message_json(m, request.user) for m in messages],
+        "older_cursor": older_cursor,
+    })
+
+
+async def _sse_response(request, groups):
+    """
+    Server-sent events response. Only under ASGI: a WSGI worker would be held
+    by the stream for good, so it answers 204, which tells EventSource not
+    to reconnect (the page keeps polling instead).
+    The stream itself needs no database: the connection opened for the
+    checks is released here, not when the stream ends (request_finished).
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    await sync_to_async(close_old_connections)()
+    response = StreamingHttpResponse(event_stream(groups), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # no proxy buffering (nginx)
+    return response
+
+
+@login_required
+async def conversation_stream(request, username):
+    """Nouveaux messages d'une conversation, en direct (event: message)."""
+    user = await request.auser()
+    other = await aget_object_or_404(User, username=username)
+    conv = await sync_to_async(_get_private_conversation)(user, other)
+    if conv is None:
+        raise Http404("Aucune conversation")
+    return await _sse_response(request, [f"conversation-{conv.pk}"])
+
+
+@login_required
+async def unread_stream(request):
+    """Badge de messages non lus, en direct (event: unread)."""
+    user = await request.auser()
+    return await _sse_response(request, [f"user-{user.pk}"])
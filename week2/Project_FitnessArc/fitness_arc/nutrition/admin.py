@@ -13,10 +13,7 @@ class FoodLogAdmin(admin.ModelAdmin):
     list_filter = ('date', 'meal_type', 'owner')
     search_fields = ('owner__username', 'food__name')
     date_hierarchy = 'date'
-    
-    def kcal(self, obj):
-        return round(obj.kcal, 2)
-    kcal.short_description = 'Kcal'
+    readonly_fields = ('kcal', 'protein', 'carbs', 'fat')
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -47,12 +44,13 @@ class RecipeAdmin(admin.ModelAdmin):
             'fields': ('image_url',),
             'classes': ('collapse',)
         }),
+        ('Valeurs nutritionnelles', {
+            'fields': (Recipe.TOTAL_FIELDS, Recipe.PER_SERVING_FIELDS),
+            'description': "Calculées depuis les ingrédients à chaque modification",
+        }),
         ('Métadonnées', {
             'fields': ('created_by',),
             'classes': ('collapse',)
         }),
     )
-    
-    def kcal_per_serving(self, obj):
-        return round(obj.kcal_per_serving, 0)
-    kcal_per_serving.short_description = 'Kcal/portion'
+    readonly_fields = Recipe.TOTAL_FIELDS + Recipe.PER_SERVING_FIELDS
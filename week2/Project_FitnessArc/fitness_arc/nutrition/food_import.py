@@ -0,0 +1,311 @@
+"""
+Import en masse du catalogue d'aliments (commande import_foods).
+
+Rows are streamed from a CSV, JSON-lines or JSON array file (optionally
+gzipped), mapped to Food values and upserted by slug in batches: memory
+stays bounded by the batch size whatever the file size. Both our own column
+names and Open Food Facts ones are understood, and Django fixture entries
+(fixtures/foods.json: values nested under "fields") are flattened.
+"""
+import csv
+import gzip
+import json
+import re
+import sys
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+from django.db import reset_queries, transaction
+from django.utils.text import slugify
+
+from .models import Food, RecipeIngredient, normalize_string
+from .services import refresh_recipe_nutrition
+
+# Accepted column names per Food field, first non-empty one wins
+COLUMNS = {
+    'name': ('name', 'product_name', 'product_name_fr', 'generic_name'),
+    'slug': ('slug',),
+    'code': ('code', 'barcode'),
+    'kcal_per_100g': ('kcal_per_100g', 'energy-kcal_100g', 'energy_kcal_100g'),
+    'kj_per_100g': ('energy-kj_100g', 'energy_100g'),
+    'protein_per_100g': ('protein_per_100g', 'proteins_100g'),
+    'carbs_per_100g': ('carbs_per_100g', 'carbohydrates_100g'),
+    'fat_per_100g': ('fat_per_100g', 'fat_100g'),
+    'unit': ('unit_type', 'unit', 'quantity'),
+}
+
+# Unit spellings found in the dumps -> Food.unit_type
+UNITS = {
+    'g': 'g', 'gr': 'g', 'gram': 'g', 'grams': 'g', 'gramme': 'g', 'grammes': 'g', 'kg': 'g', 'mg': 'g',
+    'ml': 'ml', 'cl': 'ml', 'dl': 'ml', 'l': 'ml', 'litre': 'ml', 'litres': 'ml', 'liter': 'ml', 'liters': 'ml',
+    'oz': 'g', 'lb': 'g', 'floz': 'ml',
+    'unit': 'unit', 'units': 'unit', 'unite': 'unit', 'unites': 'unit', 'piece': 'unit', 'pieces': 'unit',
+    'pc': 'unit', 'pcs': 'unit', 'portion': 'unit', 'portions': 'unit', 'serving': 'unit',
+}
+
+# Largest values the Food decimal columns hold
+MAX_KCAL = Decimal('9999.99')
+MAX_MACRO = Decimal('999.99')
+KJ_PER_KCAL = Decimal('4.184')
+
+# Characters read at a time from a JSON array file, and the largest single
+# element the reader buffers before giving up
+JSON_CHUNK_SIZE = 1 << 16
+JSON_MAX_ITEM_SIZE = 8 * JSON_CHUNK_SIZE
+FIXTURE_MODEL = 'nutrition.food'
+
+SLUG_MAX_LENGTH = Food._meta.get_field('slug').max_length
+NAME_MAX_LENGTH = Food._meta.get_field('name').max_length
+UPDATE_FIELDS = [
+    'name', 'name_normalized', 'kcal_per_100g', 'protein_per_100g',
+    'carbs_per_100g', 'fat_per_100g', 'unit_type',
+]
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    imported: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+
+
+def open_text(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    name = str(path).removesuffix('.gz')
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.json'):
+        return 'json'
+    return 'csv'
+
+
+def iter_json_array(f):
+    """
+    Éléments d'un tableau JSON décodés un par un : the file is read by
+    JSON_CHUNK_SIZE characters, so memory holds one element and one chunk.
+    Raises ValueError when the file is not a well-formed JSON array, or when
+    an element does not fit in JSON_MAX_ITEM_SIZE characters.
+    """
+    decoder = json.JSONDecoder()
+    buffer, eof = '', False
+    read = 0
+
+    def fill(buffer):
+        nonlocal read
+        if len(buffer) > JSON_MAX_ITEM_SIZE:
+            raise ValueError(
+                f"élément JSON de plus de {JSON_MAX_ITEM_SIZE} caractères "
+                f"(caractère {read - len(buffer)}) : fichier invalide ou tronqué ?"
+            )
+        chunk = f.read(JSON_CHUNK_SIZE)
+        read += len(chunk)
+        return buffer + chunk, not chunk
+
+    buffer, eof = fill(buffer)
+    buffer = buffer.lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("le fichier JSON doit contenir un tableau")
+    buffer = buffer[1:]
+    expect_item = True
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if eof:
+                raise ValueError("tableau JSON non terminé")
+            buffer, eof = fill(buffer)
+            continue
+        if buffer[0] == ']':
+            return
+        if not expect_item:
+            if buffer[0] != ',':
+                raise ValueError("virgule attendue entre les éléments du tableau JSON")
+            buffer, expect_item = buffer[1:], True
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise
+            buffer, eof = fill(buffer)
+            continue
+        rest = buffer[end:].lstrip()
+        if not eof and (not rest or rest[0] not in ',]'):
+            # A number cut by the chunk end ("1" of "1.5") decodes too early
+            buffer, eof = fill(buffer)
+            continue
+        yield item
+        buffer, expect_item = buffer[end:], False
+
+
+def flatten_row(row):
+    """Ligne à plat : fixture entries give their "fields" (other models are skipped)."""
+    if not isinstance(row, dict):
+        return {}
+    if isinstance(row.get('fields'), dict):
+        if row.get('model', FIXTURE_MODEL).lower() != FIXTURE_MODEL:
+            return {}
+        return row['fields']
+    return row
+
+
+def iter_rows(path, fmt=None, delimiter=None):
+    """Dictionnaires lus un par un depuis un fichier CSV, JSON-lines ou tableau JSON."""
+    fmt = fmt or detect_format(path)
+    with open_text(path) as f:
+        if fmt == 'json':
+            for row in iter_json_array(f):
+                yield flatten_row(row)
+        elif fmt == 'jsonl':
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # Counted as skipped by import_rows
+                    yield {}
+                    continue
+                yield flatten_row(row)
+        else:
+            # Open Food Facts exports have very long text columns
+            csv.field_size_limit(sys.maxsize)
+            if delimiter is None:
+                delimiter = '\t' if '\t' in f.readline() else ','
+                f.seek(0)
+            yield from csv.DictReader(f, delimiter=delimiter)
+
+
+def _first(row, field):
+    for column in COLUMNS[field]:
+        value = row.get(column)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _decimal(value, maximum):
+    if value is None:
+        return None
+    try:
+        number = Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        return None
+    if not number.is_finite() or number < 0 or number > maximum:
+        return None
+    return number.quantize(Decimal('0.01'))
+
+
+def normalize_unit(value):
+    """'500 g', 'ml', '6 x 33 cl', 'pièce'... -> 'g' / 'ml' / 'unit' (defaut 'g')."""
+    if not value:
+        return 'g'
+    words = re.findall(r'[a-z]+', normalize_string(str(value)).replace('fl oz', 'floz'))
+    for word in reversed(words):
+        if word in UNITS:
+            return UNITS[word]
+    return 'g'
+
+
+def make_slug(name, code=None, slug=None):
+    if slug:
+        return slugify(slug)[:SLUG_MAX_LENGTH]
+    if code:
+        suffix = '-' + slugify(str(code))
+        return slugify(name)[:SLUG_MAX_LENGTH - len(suffix)].rstrip('-') + suffix
+    return slugify(name)[:SLUG_MAX_LENGTH]
+
+
+def parse_food(row):
+    """Food (non sauvegardé) depuis une ligne, ou None si la ligne est inutilisable."""
+    name = _first(row, 'name')
+    if not name or not str(name).strip():
+        return None
+    name = str(name).strip()[:NAME_MAX_LENGTH]
+
+    kcal = _decimal(_first(row, 'kcal_per_100g'), MAX_KCAL)
+    if kcal is None:
+        kj = _decimal(_first(row, 'kj_per_100g'), MAX_KCAL * KJ_PER_KCAL)
+        kcal = (kj / KJ_PER_KCAL).quantize(Decimal('0.01')) if kj is not None else None
+    macros = [_decimal(_first(row, field), MAX_MACRO)
+              for field in ('protein_per_100g', 'carbs_per_100g', 'fat_per_100g')]
+    if kcal is None or None in macros:
+        return None
+
+    slug = make_slug(name, _first(row, 'code'), _first(row, 'slug'))
+    if not slug:
+        return None
+    protein, carbs, fat = macros
+    return Food(
+        name=name,
+        name_normalized=normalize_string(name),
+        slug=slug,
+        kcal_per_100g=kcal,
+        protein_per_100g=protein,
+        carbs_per_100g=carbs,
+        fat_per_100g=fat,
+        unit_type=normalize_unit(_first(row, 'unit')),
+    )
+
+
+def upsert_foods(foods):
+    """
+    INSERT ... ON CONFLICT (slug) DO UPDATE: existing foods keep their id and
+    is_public. bulk_create sends no signal, the recipes using an updated food
+    are recomputed here.
+    """
+    Food.objects.bulk_create(
+        foods,
+        update_conflicts=True,
+        unique_fields=['slug'],
+        update_fields=UPDATE_FIELDS,
+    )
+    recipe_ids = (
+        RecipeIngredient.objects
+        .filter(food__slug__in=[food.slug for food in foods])
+        .values_list('recipe_id', flat=True)
+        .distinct()
+    )
+    refresh_recipe_nutrition(recipe_ids)
+
+
+def import_rows(rows, batch_size=5000, on_batch=None):
+    """
+    Upsert des lignes par lots de `batch_size`, chacun dans sa transaction.
+    Within a batch the last row of a slug wins (one statement cannot update a
+    row twice); across batches later rows overwrite earlier ones too.
+    on_batch(stats) is called after each batch.
+    """
+    stats = ImportStats()
+    batch = {}
+
+    def flush():
+        with transaction.atomic():
+            upsert_foods(list(batch.values()))
+        stats.imported += len(batch)
+        batch.clear()
+        # With DEBUG the connection keeps the SQL of every batch
+        reset_queries()
+        if on_batch:
+            on_batch(stats)
+
+    for row in rows:
+        stats.read += 1
+        food = parse_food(row)
+        if food is None:
+            stats.skipped += 1
+            continue
+        if food.slug in batch:
+            stats.duplicates += 1
+        batch[food.slug] = food
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
@@ -0,0 +1,108 @@
+"""
+Commande de management qui mesure l'optimiseur de plan de repas
+(nutrition.meal_planner) sur un catalogue synthétique en mémoire et affiche
+un rapport JSON : temps (percentiles), respect du budget, qualité des plans
+comparée à un choix glouton repas par repas.
+
+    python manage.py bench_meal_plan --recipes 10000 --budget-ms 200
+"""
+import json
+import random
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from common.management.commands.bench import percentile
+from nutrition import meal_planner
+from nutrition.models import FoodLog
+from nutrition.services import MEAL_PLAN_OPTIONAL, MEAL_PLAN_PORTIONS, RECIPE_FIT_WEIGHTS
+
+
+def synthetic_recipe(rng, kcal_range):
+    kcal = rng.uniform(*kcal_range)
+    # Random split of the calories: 4 kcal/g of protein and carbs, 9 of fat
+    protein_share, carbs_share = rng.uniform(0.1, 0.45), rng.uniform(0.2, 0.6)
+    fat_share = max(0.05, 1 - protein_share - carbs_share)
+    return (kcal, kcal * protein_share / 4, kcal * carbs_share / 4, kcal * fat_share / 9)
+
+
+def greedy(slots, target, weights):
+    """Référence : chaque créneau prend l'option la plus proche de sa part de l'objectif cumulé."""
+    totals = (0.0, 0.0, 0.0, 0.0)
+    for index, options in enumerate(slots, start=1):
+        goal = tuple(value * index / len(slots) for value in target)
+        best = min(
+            options,
+            key=lambda option: meal_planner.plan_score(
+                [total + value for total, value in zip(totals, option.macros)], goal, weights
+            ),
+        )
+        totals = tuple(total + value for total, value in zip(totals, best.macros))
+    return meal_planner.plan_score(totals, target, weights)
+
+
+class Command(BaseCommand):
+    help = "Mesure l'optimiseur de plan de repas sur un catalogue synthétique et affiche un rapport JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000, help='Recettes du catalogue, réparties par repas (défaut: 10000)')
+        parser.add_argument('--foods', type=int, default=60, help="Aliments d'appoint (défaut: 60)")
+        parser.add_argument('--budget-ms', type=int, default=200, help='Budget de recherche en ms (défaut: 200)')
+        parser.add_argument('--runs', type=int, default=20, help='Plans calculés, objectifs aléatoires (défaut: 20)')
+        parser.add_argument('--goal', choices=sorted(RECIPE_FIT_WEIGHTS), default='maintain', help='Pondération (défaut: maintain)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire (défaut: 42)')
+        parser.add_argument('--output', type=str, help='Écrire aussi le rapport JSON dans ce fichier')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        meals = [meal for meal, _ in FoodLog.MEAL_TYPES]
+        per_meal = max(1, options['recipes'] // len(meals))
+        slots = []
+        for meal in meals:
+            kcal_range = (100, 450) if meal in MEAL_PLAN_OPTIONAL else (250, 1000)
+            slots.append([
+                meal_planner.Option(kind='recipe', pk=pk, label=f'{meal} {pk}', quantity=1,
+                                    macros=synthetic_recipe(rng, kcal_range))
+                for pk in range(per_meal)
+            ])
+        foods = []
+        for pk in range(options['foods']):
+            per_100g = synthetic_recipe(rng, (20, 600))
+            for portion in MEAL_PLAN_PORTIONS:
+                foods.append(meal_planner.Option(kind='food', pk=pk, label=f'food {pk}', quantity=portion,
+                                                 macros=tuple(value * portion / 100 for value in per_100g)))
+        slots.append(foods)
+        optional = {index for index, meal in enumerate(meals) if meal in MEAL_PLAN_OPTIONAL} | {len(meals)}
+        weights = tuple(RECIPE_FIT_WEIGHTS[options['goal']][macro] for macro in FoodLog.MACRO_FIELDS)
+
+        elapsed, scores, baseline, nodes, complete = [], [], [], [], 0
+        for _ in range(max(1, options['runs'])):
+            kcal = rng.uniform(1200, 3200)
+            target = (kcal, kcal * rng.uniform(0.2, 0.35) / 4, kcal * rng.uniform(0.35, 0.55) / 4, kcal * 0.25 / 9)
+            plan = meal_planner.optimize(slots, target, weights, budget_s=options['budget_ms'] / 1000, optional=optional)
+            elapsed.append(plan.elapsed_ms)
+            scores.append(plan.score)
+            nodes.append(plan.nodes)
+            complete += plan.complete
+            # The greedy choice fills every meal, the snack included
+            baseline.append(greedy(slots[:len(meals)], target, weights))
+
+        report = {
+            "recipes": per_meal * len(meals),
+            "foods": options['foods'],
+            "budget_ms": options['budget_ms'],
+            "runs": len(elapsed),
+            "p50_ms": round(percentile(elapsed, 50), 2),
+            "p95_ms": round(percentile(elapsed, 95), 2),
+            "max_ms": round(max(elapsed), 2),
+            "proven_optimal": complete,
+            "mean_nodes": round(statistics.mean(nodes)),
+            "mean_score": round(statistics.mean(scores), 4),
+            "greedy_mean_score": round(statistics.mean(baseline), 4),
+        }
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options.get('output'):
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"✅ Rapport écrit dans {options['output']}"))
@@ -0,0 +1,73 @@
+"""
+Commande de management pour importer un catalogue d'aliments (CSV,
+JSON-lines ou tableau JSON, éventuellement .gz) : lecture en flux et upsert
+par lots sur le slug, pour des fichiers de plusieurs millions de lignes.
+
+    python manage.py import_foods fr.openfoodfacts.org.products.csv.gz
+    python manage.py import_foods aliments.jsonl --batch-size 10000
+    python manage.py import_foods fixtures/foods.json
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nutrition.food_import import import_rows, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Importe des aliments depuis un fichier CSV, JSON-lines ou JSON (upsert par slug, par lots)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Fichier à importer (.csv, .tsv, .jsonl, .json, éventuellement .gz)')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl', 'json'],
+            help='Format du fichier (défaut: déduit de l\'extension)',
+        )
+        parser.add_argument(
+            '--delimiter',
+            type=str,
+            help='Séparateur CSV (défaut: tabulation si la première ligne en contient, sinon virgule)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Nombre d\'aliments par upsert (défaut: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Fichier "{path}" introuvable')
+        delimiter = options.get('delimiter')
+        if delimiter == '\\t':
+            delimiter = '\t'
+
+        started = time.monotonic()
+
+        def progress(stats):
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"  → {stats.read} lignes lues, {stats.imported} aliments importés "
+                f"({stats.read / elapsed:.0f} lignes/s)"
+            )
+
+        rows = iter_rows(path, fmt=options.get('format'), delimiter=delimiter)
+        try:
+            stats = import_rows(rows, batch_size=max(1, options['batch_size']), on_batch=progress)
+        except ValueError as e:
+            raise CommandError(f'Fichier "{path}" illisible : {e}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Terminé en {elapsed:.1f}s : {stats.read} lignes, {stats.imported} aliments importés, "
+            f"{stats.duplicates} doublons, {stats.skipped} lignes ignorées "
+            f"({stats.read / max(elapsed, 1e-6):.0f} lignes/s)"
+        ))
+        if not stats.imported:
+            raise CommandError(
+                f"Aucun aliment importé : {stats.skipped} lignes ignorées sur {stats.read} "
+                f"(colonnes ou format non reconnus ?)"
+            )
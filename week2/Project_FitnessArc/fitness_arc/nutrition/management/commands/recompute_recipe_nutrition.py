@@ -0,0 +1,49 @@
+"""
+Commande de management pour recalculer les valeurs nutritionnelles stockées
+des recettes (totaux et par portion) depuis leurs ingrédients. À lancer
+après un chargement de fixtures ou une correction en masse des aliments.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nutrition.models import Recipe
+from nutrition.services import refresh_recipe_nutrition
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les totaux nutritionnels stockés des recettes par lots'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipe',
+            type=str,
+            help='Recalculer uniquement cette recette (slug)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Nombre de recettes traitées par lot (défaut: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('pk')
+        if options.get('recipe'):
+            recipes = recipes.filter(slug=options['recipe'])
+            if not recipes.exists():
+                self.stdout.write(self.style.ERROR(f'Recette "{options["recipe"]}" introuvable'))
+                return
+
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+        started = time.monotonic()
+        for i in range(0, len(recipe_ids), chunk_size):
+            with transaction.atomic():
+                refresh_recipe_nutrition(recipe_ids[i:i + chunk_size])
+            self.stdout.write(f"  → {min(i + chunk_size, len(recipe_ids))}/{len(recipe_ids)} recettes")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(recipe_ids)} recette(s) recalculée(s) en {time.monotonic() - started:.1f}s"
+        ))
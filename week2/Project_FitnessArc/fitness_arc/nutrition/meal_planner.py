@@ -0,0 +1,180 @@
+"""
+Optimiseur de plan de repas : choisit une option par créneau (recette d'un
+repas, complément alimentaire...) pour que la somme des macros soit la plus
+proche possible de l'apport restant.
+
+Pure Python, no Django: the callers (nutrition.services.build_meal_plan and
+the bench_meal_plan command) load the candidates.
+
+- Score of a plan: sum over kcal/protein/carbs/fat of
+  weight * |total - target| / max(target, 1), lower is better.
+- Each slot is first cut down to its `shortlist` best options against the
+  slot's share of the target, then a depth-first branch and bound explores
+  the combinations. The bound adds, per macro, the distance from the target
+  to the interval the remaining slots can still reach, so a pruned branch
+  can never beat the best plan.
+- The search stops at `budget_s` and returns the best plan found so far
+  (`complete` tells whether it is proven optimal over the shortlists). The
+  clock is read before each expansion, whose cost (one bound per option of
+  the level) dwarfs the read, and the search stops FINISH_RESERVE_S early to
+  unwind and build the plan within the budget.
+"""
+import heapq
+import time
+from dataclasses import dataclass
+
+MACROS = ('kcal', 'protein', 'carbs', 'fat')
+DEFAULT_WEIGHTS = (1.0, 1.0, 1.0, 1.0)
+DEFAULT_BUDGET_S = 0.2
+DEFAULT_SHORTLIST = 40
+# Part of the budget kept to unwind the search and build the MealPlan
+FINISH_RESERVE_S = 0.001
+
+
+@dataclass(frozen=True)
+class Option:
+    """Un choix possible pour un créneau : `macros` dans l'ordre de MACROS."""
+    kind: str
+    pk: int
+    label: str
+    quantity: float
+    macros: tuple
+
+
+# "Nothing in this slot", for the optional slots
+SKIP = Option(kind='skip', pk=0, label='', quantity=0, macros=(0.0, 0.0, 0.0, 0.0))
+
+
+@dataclass
+class MealPlan:
+    options: list
+    totals: tuple
+    score: float
+    complete: bool
+    nodes: int
+    elapsed_ms: float
+
+
+def plan_score(totals, target, weights=DEFAULT_WEIGHTS):
+    return sum(
+        weight * abs(total - goal) / max(goal, 1.0)
+        for total, goal, weight in zip(totals, target, weights)
+    )
+
+
+def shortlist(options, share, weights=DEFAULT_WEIGHTS, k=DEFAULT_SHORTLIST):
+    """Les `k` options les plus proches de `share` (la part du créneau), O(n)."""
+    if len(options) <= k:
+        return list(options)
+    # plan_score unrolled: this runs once per candidate of the catalog
+    (t0, t1, t2, t3) = share
+    (s0, s1, s2, s3) = (weight / max(goal, 1.0) for weight, goal in zip(weights, share))
+
+    def distance(option):
+        m0, m1, m2, m3 = option.macros
+        return abs(m0 - t0) * s0 + abs(m1 - t1) * s1 + abs(m2 - t2) * s2 + abs(m3 - t3) * s3
+
+    return heapq.nsmallest(k, options, key=distance)
+
+
+def optimize(slots, target, weights=DEFAULT_WEIGHTS, budget_s=DEFAULT_BUDGET_S,
+             shortlist_size=DEFAULT_SHORTLIST, optional=()):
+    """
+    Meilleure combinaison d'une option par créneau.
+    `slots` is a list of option lists, `target` the remaining (kcal, protein,
+    carbs, fat); the slots whose index is in `optional` may stay empty.
+    Returns a MealPlan; its options are None for a slot without candidates.
+    """
+    started = time.perf_counter()
+    deadline = started + max(budget_s - FINISH_RESERVE_S, 0.0)
+    target = tuple(max(float(value), 0.0) for value in target)
+    n_macros = len(MACROS)
+
+    # Shortlists against each slot's share of the target (optional slots weigh half)
+    shares = [0.5 if index in optional else 1.0 for index in range(len(slots))]
+    total_share = sum(shares) or 1.0
+    candidates = []
+    for index, options in enumerate(slots):
+        share = tuple(goal * shares[index] / total_share for goal in target)
+        chosen = shortlist(options, share, weights, shortlist_size)
+        if index in optional:
+            chosen.append(SKIP)
+        candidates.append(chosen)
+
+    # Slots without any candidate are left out of the search
+    searched = [index for index, options in enumerate(candidates) if options]
+    levels = [[option.macros for option in candidates[index]] for index in searched]
+    depth_count = len(levels)
+
+    # rest_min[d][m] / rest_max[d][m]: what slots d.. can still add to macro m
+    rest_min = [[0.0] * n_macros for _ in range(depth_count + 1)]
+    rest_max = [[0.0] * n_macros for _ in range(depth_count + 1)]
+    for depth in range(depth_count - 1, -1, -1):
+        for m in range(n_macros):
+            values = [macros[m] for macros in levels[depth]]
+            rest_min[depth][m] = rest_min[depth + 1][m] + min(values)
+            rest_max[depth][m] = rest_max[depth + 1][m] + max(values)
+
+    scale = [weight / max(goal, 1.0) for weight, goal in zip(weights, target)]
+    best = {'score': float('inf'), 'choice': None}
+    choice = [0] * depth_count
+    state = {'nodes': 0, 'timed_out': False}
+    clock = time.perf_counter
+
+    def bound(totals, depth):
+        low = rest_min[depth]
+        high = rest_max[depth]
+        result = 0.0
+        for m in range(n_macros):
+            reach_low = totals[m] + low[m]
+            reach_high = totals[m] + high[m]
+            if reach_low > target[m]:
+                result += (reach_low - target[m]) * scale[m]
+            elif reach_high < target[m]:
+                result += (target[m] - reach_high) * scale[m]
+        return result
+
+    def search(depth, totals):
+        if depth == depth_count:
+            score = sum(abs(totals[m] - target[m]) * scale[m] for m in range(n_macros))
+            if score < best['score']:
+                best['score'] = score
+                best['choice'] = list(choice)
+            return
+        if clock() > deadline:
+            state['timed_out'] = True
+        if state['timed_out'] and best['choice'] is not None:
+            return
+        # Most promising options first: good plans early, more pruning
+        scored = []
+        for position, macros in enumerate(levels[depth]):
+            after = [totals[m] + macros[m] for m in range(n_macros)]
+            scored.append((bound(after, depth + 1), position, after))
+        scored.sort(key=lambda item: item[0])
+        for lower, position, after in scored:
+            if lower >= best['score']:
+                # Sorted: the following options cannot do better either
+                break
+            state['nodes'] += 1
+            if state['timed_out'] and best['choice'] is not None:
+                return
+            choice[depth] = position
+            search(depth + 1, after)
+
+    search(0, [0.0] * n_macros)
+
+    options = [None] * len(slots)
+    totals = [0.0] * n_macros
+    if best['choice'] is not None:
+        for depth, position in enumerate(best['choice']):
+            option = candidates[searched[depth]][position]
+            options[searched[depth]] = None if option is SKIP else option
+            totals = [totals[m] + option.macros[m] for m in range(n_macros)]
+    return MealPlan(
+        options=options,
+        totals=tuple(totals),
+        score=plan_score(totals, target, weights),
+        complete=not state['timed_out'],
+        nodes=state['nodes'],
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0005_alter_food_carbs_per_100g_alter_food_fat_per_100g_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='foodlog',
+            index=models.Index(fields=['owner', 'date'], name='nutrition_foodlog_owner_date'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:42
+
+import unicodedata
+
+from django.db import migrations, models
+
+PREFIX_INDEX = "nutrition_food_name_norm_prefix"
+TRIGRAM_INDEX = "nutrition_food_name_norm_trgm"
+
+
+def normalize_string(s):
+    # Frozen copy of nutrition.models.normalize_string
+    nfkd_form = unicodedata.normalize('NFKD', s)
+    stripped = ''.join([c for c in nfkd_form if not unicodedata.combining(c)]).lower()
+    return stripped.replace('œ', 'oe').replace('æ', 'ae')
+
+
+def fill_name_normalized(apps, schema_editor):
+    Food = apps.get_model('nutrition', 'Food')
+    foods = []
+    for food in Food.objects.only('id', 'name').iterator(chunk_size=2000):
+        food.name_normalized = normalize_string(food.name)
+        foods.append(food)
+    Food.objects.bulk_update(foods, ['name_normalized'], batch_size=1000)
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Index de la recherche d'aliments (nutrition.services.search_foods).
+    PostgreSQL: b-tree with text_pattern_ops for the prefix LIKE, trigram
+    GIN for the substring LIKE. SQLite: NOCASE index, which its
+    case-insensitive LIKE can use for prefixes.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} ON nutrition_food ("name_normalized" text_pattern_ops)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON nutrition_food USING gin ("name_normalized" gin_trgm_ops)'
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} ON nutrition_food ("name_normalized" COLLATE NOCASE)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    for name in (PREFIX_INDEX, TRIGRAM_INDEX):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='name_normalized',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_name_normalized, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:55
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+from django.db.models.functions import Round
+
+
+def fill_macros(apps, schema_editor):
+    """Macros of the existing entries from the current food values, one UPDATE."""
+    Food = apps.get_model('nutrition', 'Food')
+    FoodLog = apps.get_model('nutrition', 'FoodLog')
+
+    def macro(field):
+        value = ExpressionWrapper(
+            Round(F(f'{field}_per_100g') * OuterRef('quantity') / 100, 2),
+            output_field=DecimalField(max_digits=9, decimal_places=2),
+        )
+        return Subquery(Food.objects.filter(pk=OuterRef('food_id')).annotate(v=value).values('v')[:1])
+
+    FoodLog.objects.update(**{field: macro(field) for field in ('kcal', 'protein', 'carbs', 'fat')})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0007_food_name_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodlog',
+            name='carbs',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='foodlog',
+            name='fat',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='foodlog',
+            name='kcal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='foodlog',
+            name='protein',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.RunPython(fill_macros, migrations.RunPython.noop),
+    ]
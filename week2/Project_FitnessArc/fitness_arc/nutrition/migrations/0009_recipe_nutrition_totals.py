@@ -0,0 +1,83 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:00
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+MACROS = ('kcal', 'protein', 'carbs', 'fat')
+
+
+def fill_recipe_nutrition(apps, schema_editor):
+    """Same computation as nutrition.services.refresh_recipe_nutrition, on the historical models."""
+    Recipe = apps.get_model('nutrition', 'Recipe')
+    RecipeIngredient = apps.get_model('nutrition', 'RecipeIngredient')
+    cent = Decimal('0.01')
+
+    totals = defaultdict(lambda: dict.fromkeys(MACROS, Decimal('0')))
+    rows = RecipeIngredient.objects.values_list('recipe_id', 'quantity', *(f'food__{m}_per_100g' for m in MACROS))
+    for recipe_id, quantity, *per_100g in rows.iterator(chunk_size=2000):
+        for macro, value in zip(MACROS, per_100g):
+            totals[recipe_id][macro] += value * quantity / 100
+
+    recipes = []
+    for recipe in Recipe.objects.only('id', 'servings').iterator(chunk_size=2000):
+        for macro, total in totals[recipe.pk].items():
+            total = total.quantize(cent, rounding=ROUND_HALF_UP)
+            per_serving = total / recipe.servings if recipe.servings > 0 else Decimal('0')
+            setattr(recipe, f'total_{macro}', total)
+            setattr(recipe, f'{macro}_per_serving', per_serving.quantize(cent, rounding=ROUND_HALF_UP))
+        recipes.append(recipe)
+    fields = [f'total_{m}' for m in MACROS] + [f'{m}_per_serving' for m in MACROS]
+    Recipe.objects.bulk_update(recipes, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0008_foodlog_macros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carbs_per_serving',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fat_per_serving',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='kcal_per_serving',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein_per_serving',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_carbs',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_fat',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_kcal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_protein',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=9),
+        ),
+        migrations.RunPython(fill_recipe_nutrition, migrations.RunPython.noop),
+    ]
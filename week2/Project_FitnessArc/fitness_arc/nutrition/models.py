@@ -1,6 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import User
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
+import unicodedata
+
+
+def normalize_string(s):
+    """Remove accents and special characters."""
+    nfkd_form = unicodedata.normalize('NFKD', s)
+    stripped = ''.join([c for c in nfkd_form if not unicodedata.combining(c)]).lower()
+    # Ligatures have no decomposition (same mapping as CustomSelect in base.html)
+    return stripped.replace('œ', 'oe').replace('æ', 'ae')
 
 
 class Food(models.Model):
@@ -11,6 +20,9 @@ class Food(models.Model):
     ]
     
     name = models.CharField(max_length=200)
+    # normalize_string(name), kept up to date by save(): accent-insensitive
+    # search (nutrition.services.search_foods, indexes of migration 0007)
+    name_normalized = models.CharField(max_length=200, editable=False, default='')
     slug = models.SlugField(unique=True)
     kcal_per_100g = models.DecimalField(max_digits=6, decimal_places=2, help_text="Calories (kcal) per 100g/100ml/unit")
     protein_per_100g = models.DecimalField(max_digits=5, decimal_places=2, help_text="Protein (g) per 100g/100ml/unit")
@@ -21,6 +33,13 @@ class Food(models.Model):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_string(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_normalized'}
+        super().save(*args, **kwargs)
     
     def get_unit_label(self):
         return dict(self.UNIT_TYPES).get(self.unit_type, 'g')
@@ -33,31 +52,49 @@ class FoodLog(models.Model):
         ('snack', 'Collation'),
     ]
 
+    MACRO_FIELDS = ('kcal', 'protein', 'carbs', 'fat')
+
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='food_logs')
     date = models.DateField()
     food = models.ForeignKey(Food, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=6, decimal_places=2, default=100, help_text="Quantity (in grams, ml or units)")
     meal_type = models.CharField(max_length=20, choices=MEAL_TYPES, default='snack')
+    # Macros of this entry, computed from the food when it is logged (see
+    # save()): totals are plain SUMs and a later correction of the food
+    # does not rewrite the history
+    kcal = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    protein = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+    carbs = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+    fat = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
     
     class Meta:
         ordering = ['date', 'meal_type']
+        # nutrition_today, dashboard and rollup: one user's logs for a date (range)
+        indexes = [models.Index(fields=['owner', 'date'], name='nutrition_foodlog_owner_date')]
         verbose_name_plural = "Food Logs"
 
-    @property
-    def kcal(self):
-        return (self.food.kcal_per_100g * self.quantity) / 100
-    
-    @property
-    def protein(self):
-        return (self.food.protein_per_100g * self.quantity) / 100
-    
-    @property
-    def carbs(self):
-        return (self.food.carbs_per_100g * self.quantity) / 100
-    
-    @property
-    def fat(self):
-        return (self.food.fat_per_100g * self.quantity) / 100
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the stored macros were computed from (None when deferred)
+        instance._macros_source = (instance.__dict__.get('food_id'), instance.__dict__.get('quantity'))
+        return instance
+
+    def compute_macros(self):
+        """Set kcal/protein/carbs/fat from the food values per 100 and the quantity."""
+        for field in self.MACRO_FIELDS:
+            value = getattr(self.food, f'{field}_per_100g') * Decimal(self.quantity) / 100
+            setattr(self, field, value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+    def save(self, *args, **kwargs):
+        # Only a new entry or a changed food/quantity takes the current food values
+        if self._state.adding or getattr(self, '_macros_source', None) != (self.food_id, self.quantity):
+            self.compute_macros()
+            self._macros_source = (self.food_id, self.quantity)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.MACRO_FIELDS}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         unit = self.food.get_unit_label()
@@ -92,6 +129,22 @@ class Recipe(models.Model):
     is_public = models.BooleanField(default=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_recipes')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    MACROS = ('kcal', 'protein', 'carbs', 'fat')
+    TOTAL_FIELDS = tuple(f'total_{macro}' for macro in MACROS)
+    PER_SERVING_FIELDS = tuple(f'{macro}_per_serving' for macro in MACROS)
+
+    # Nutrition of the ingredients, stored so that lists sort and filter in
+    # SQL; kept up to date by the nutrition signals (recompute_recipe_nutrition
+    # rebuilds them)
+    total_kcal = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    total_protein = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    total_carbs = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    total_fat = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    kcal_per_serving = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    protein_per_serving = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    carbs_per_serving = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
+    fat_per_serving = models.DecimalField(max_digits=9, decimal_places=2, default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
@@ -103,65 +156,35 @@ class Recipe(models.Model):
     def total_time_minutes(self):
         return self.prep_time_minutes + self.cook_time_minutes
     
-    @property
-    def total_kcal(self):
-        """Calories totales de la recette"""
-        total = Decimal('0')
-        for ingredient in self.ingredients.all():
-            total += (ingredient.food.kcal_per_100g * ingredient.quantity) / 100
-        return round(total, 2)
-    
-    @property
-    def total_protein(self):
-        """Protéines totales de la recette"""
-        total = Decimal('0')
-        for ingredient in self.ingredients.all():
-            total += (ingredient.food.protein_per_100g * ingredient.quantity) / 100
-        return round(total, 2)
-    
-    @property
-    def total_carbs(self):
-        """Glucides totaux de la recette"""
-        total = Decimal('0')
-        for ingredient in self.ingredients.all():
-            total += (ingredient.food.carbs_per_100g * ingredient.quantity) / 100
-        return round(total, 2)
-    
-    @property
-    def total_fat(self):
-        """Lipides totaux de la recette"""
-        total = Decimal('0')
-        for ingredient in self.ingredients.all():
-            total += (ingredient.food.fat_per_100g * ingredient.quantity) / 100
-        return round(total, 2)
-    
-    @property
-    def kcal_per_serving(self):
-        """Calories par portion"""
-        if self.servings > 0:
-            return round(self.total_kcal / self.servings, 2)
-        return 0
-    
-    @property
-    def protein_per_serving(self):
-        """Protéines par portion"""
-        if self.servings > 0:
-            return round(self.total_protein / self.servings, 2)
-        return 0
-    
-    @property
-    def carbs_per_serving(self):
-        """Glucides par portion"""
-        if self.servings > 0:
-            return round(self.total_carbs / self.servings, 2)
-        return 0
-    
-    @property
-    def fat_per_serving(self):
-        """Lipides par portion"""
-        if self.servings > 0:
-            return round(self.total_fat / self.servings, 2)
-        return 0
+    def set_per_serving(self):
+        """*_per_serving from the stored totals (0 without servings)."""
+        for macro in self.MACROS:
+            total = Decimal(getattr(self, f'total_{macro}'))
+            value = total / self.servings if self.servings > 0 else Decimal('0')
+            setattr(self, f'{macro}_per_serving', value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+    def save(self, *args, **kwargs):
+        # The totals are maintained by nutrition.services.refresh_recipe_nutrition:
+        # a full save of an existing recipe must not write back the values
+        # loaded before an ingredient or food change. The per-serving values
+        # follow servings, from the stored totals.
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or kwargs.get('force_insert'):
+            self.set_per_serving()
+        elif update_fields is None or 'servings' in update_fields:
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.TOTAL_FIELDS
+                ]
+            stale = [field for field in self.TOTAL_FIELDS if field not in update_fields]
+            if stale:
+                stored = type(self).objects.filter(pk=self.pk).values(*stale).first()
+                for field, value in (stored or {}).items():
+                    setattr(self, field, value)
+            self.set_per_serving()
+            kwargs['update_fields'] = {*update_fields, *self.PER_SERVING_FIELDS}
+        super().save(*args, **kwargs)
 
 
 class RecipeIngredient(models.Model):
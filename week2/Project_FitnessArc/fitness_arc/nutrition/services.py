@@ -0,0 +1,274 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, F, FloatField, IntegerField, Sum, Value, When
+from django.db.models.functions import Abs, Cast, Coalesce
+from django.utils import timezone
+
+from . import meal_planner
+from .models import Food, FoodLog, Recipe, RecipeIngredient, normalize_string
+
+FOOD_SEARCH_LIMIT = 20
+FOOD_SEARCH_MAX_LIMIT = 50
+# Below this length only prefixes are searched (a trigram index needs 3 characters)
+FOOD_SEARCH_MIN_SUBSTRING = 3
+
+RECIPE_PAGE_SIZE = 24
+# Weight of each macro in the "macros" ranking of recipe_list, per Profile.goal:
+# a cut favors protein, a bulk the calories and carbs
+RECIPE_FIT_WEIGHTS = {
+    'cut': {'kcal': 1.0, 'protein': 2.0, 'carbs': 0.5, 'fat': 0.5},
+    'bulk': {'kcal': 1.5, 'protein': 1.0, 'carbs': 1.0, 'fat': 0.5},
+    'maintain': {'kcal': 1.0, 'protein': 1.0, 'carbs': 1.0, 'fat': 1.0},
+}
+
+# Meal plan (build_meal_plan): recipes loaded per open meal, closest in kcal
+# to the meal's share; the optimizer then keeps its own shortlists
+MEAL_PLAN_CANDIDATES = 200
+# Optional complement: the richest g/ml foods in each macro, at these portions
+MEAL_PLAN_FOODS_PER_MACRO = 20
+MEAL_PLAN_PORTIONS = (50, 100, 150, 200)
+# Meals the plan may leave empty
+MEAL_PLAN_OPTIONAL = ('snack',)
+
+
+def search_foods(query, limit=FOOD_SEARCH_LIMIT):
+    """
+    Aliments publics dont le nom contient `query`, sans tenir compte des
+    accents ni de la casse.
+    Ranking: name starts with the query, then a word of the name does, then
+    any other substring; ties by name. Searches the stored name_normalized
+    column, served by the indexes of migration nutrition 0007 (prefix
+    b-tree, trigram GIN on PostgreSQL). An empty query lists the first
+    foods by name. At most `limit` rows, one query.
+    """
+    query = normalize_string(query.strip())
+    foods = Food.objects.filter(is_public=True).only('id', 'name', 'unit_type')
+    if not query:
+        return list(foods.order_by('name_normalized', 'pk')[:limit])
+    if len(query) < FOOD_SEARCH_MIN_SUBSTRING:
+        matches = foods.filter(name_normalized__startswith=query).order_by('name_normalized', 'pk')
+    else:
+        matches = (
+            foods
+            .filter(name_normalized__contains=query)
+            .annotate(rank=Case(
+                When(name_normalized__startswith=query, then=Value(0)),
+                When(name_normalized__contains=f' {query}', then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            ))
+            .order_by('rank', 'name_normalized', 'pk')
+        )
+    return list(matches[:limit])
+
+
+def daily_totals(user, day):
+    """{'kcal', 'protein', 'carbs', 'fat'} (Decimal) des entrées de `user` pour `day`, une requête."""
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=9, decimal_places=2))
+    return FoodLog.objects.filter(owner=user, date=day).aggregate(
+        **{field: Coalesce(Sum(field), zero) for field in FoodLog.MACRO_FIELDS}
+    )
+
+
+def refresh_recipe_nutrition(recipe_ids, batch_size=1000):
+    """
+    Recalcule les totaux et valeurs par portion stockés des recettes données
+    depuis leurs ingrédients : one query for the ingredients, one for the
+    recipes, then bulk_update. Decimal math as the former properties did.
+    Returns {recipe_id: {field: value}} of the updated recipes.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return {}
+    totals = defaultdict(lambda: dict.fromkeys(Recipe.MACROS, Decimal('0')))
+    rows = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', 'quantity', *(f'food__{macro}_per_100g' for macro in Recipe.MACROS)
+    )
+    for recipe_id, quantity, *per_100g in rows:
+        for macro, value in zip(Recipe.MACROS, per_100g):
+            totals[recipe_id][macro] += value * quantity / 100
+
+    recipes = list(Recipe.objects.filter(pk__in=recipe_ids).only('id', 'servings'))
+    values = {}
+    for recipe in recipes:
+        for macro, total in totals[recipe.pk].items():
+            setattr(recipe, f'total_{macro}', total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+        recipe.set_per_serving()
+        values[recipe.pk] = {field: getattr(recipe, field) for field in Recipe.TOTAL_FIELDS + Recipe.PER_SERVING_FIELDS}
+    Recipe.objects.bulk_update(recipes, Recipe.TOTAL_FIELDS + Recipe.PER_SERVING_FIELDS, batch_size=batch_size)
+    return values
+
+
+def refresh_recipes_using_foods(food_ids):
+    """Recettes contenant l'un de ces aliments, après une modification de leurs valeurs."""
+    recipe_ids = RecipeIngredient.objects.filter(food_id__in=food_ids).values_list('recipe_id', flat=True).distinct()
+    return refresh_recipe_nutrition(recipe_ids)
+
+
+def rank_recipes(recipes, remaining, goal=None, macro_fit=False):
+    """
+    Trie les recettes par pertinence par rapport à l'apport restant, en SQL.
+    Default: ORDER BY ABS(kcal_per_serving - remaining kcal). With
+    `macro_fit`, a weighted sum of the relative distances of the four
+    per-serving macros to what remains (weights of RECIPE_FIT_WEIGHTS for
+    `goal`). Nothing left to eat: the queryset order is kept.
+    Ties by pk, so that the pages are stable.
+    """
+    if remaining['kcal'] <= 0:
+        return recipes
+    if not macro_fit:
+        target = Value(remaining['kcal'], output_field=DecimalField(max_digits=9, decimal_places=2))
+        return recipes.alias(relevance=Abs(F('kcal_per_serving') - target)).order_by('relevance', 'pk')
+
+    weights = RECIPE_FIT_WEIGHTS.get(goal, RECIPE_FIT_WEIGHTS['maintain'])
+    score = None
+    for macro, weight in weights.items():
+        target = max(float(remaining[macro]), 0.0)
+        # Relative distance: grams and kcal become comparable
+        distance = (
+            Abs(Cast(f'{macro}_per_serving', FloatField()) - Value(target))
+            * Value(weight / max(target, 1.0))
+        )
+        score = distance if score is None else score + distance
+    return recipes.alias(relevance=score).order_by('relevance', 'pk')
+
+
+def calculate_daily_goal(profile):
+    """Calculate daily goals based on profile."""
+    # Simplified formula based on weight and goal
+    if not profile.weight_kg:
+        # Default values if no weight specified
+        return {
+            'kcal': 2000,
+            'protein': 150,
+            'carbs': 200,
+            'fat': 60
+        }
+    
+    weight = float(profile.weight_kg)
+    
+    if profile.goal == 'bulk':
+        # Bulking: caloric surplus
+        kcal = weight * 35
+        protein = weight * 2.2
+        carbs = weight * 5
+        fat = weight * 1
+    elif profile.goal == 'cut':
+        # Cutting: caloric deficit
+        kcal = weight * 25
+        protein = weight * 2.5
+        carbs = weight * 2
+        fat = weight * 0.8
+    else:  # maintain
+        # Maintenance
+        kcal = weight * 30
+        protein = weight * 2
+        carbs = weight * 3.5
+        fat = weight * 0.9
+    
+    return {
+        'kcal': round(kcal),
+        'protein': round(protein),
+        'carbs': round(carbs),
+        'fat': round(fat)
+    }
+
+
+def remaining_intake(daily_goal, intake):
+    """Objectif du jour moins les apports (Decimal, négatif si dépassé)."""
+    return {macro: Decimal(str(daily_goal[macro])) - intake[macro] for macro in FoodLog.MACRO_FIELDS}
+
+
+def _meal_plan_foods():
+    """Options « aliment d'appoint » : les aliments publics les plus riches en chaque macro, plusieurs portions."""
+    foods = {}
+    base = Food.objects.filter(is_public=True, unit_type__in=('g', 'ml')).only(
+        'id', 'name', 'unit_type', *(f'{macro}_per_100g' for macro in Recipe.MACROS)
+    )
+    for macro in ('protein', 'carbs', 'fat'):
+        for food in base.order_by(f'-{macro}_per_100g', 'pk')[:MEAL_PLAN_FOODS_PER_MACRO]:
+            foods[food.pk] = food
+    options = []
+    for food in foods.values():
+        per_100g = [float(getattr(food, f'{macro}_per_100g')) for macro in Recipe.MACROS]
+        for portion in MEAL_PLAN_PORTIONS:
+            options.append(meal_planner.Option(
+                kind='food', pk=food.pk, label=f'{food.name} ({portion} {food.get_unit_label()})',
+                quantity=portion, macros=tuple(value * portion / 100 for value in per_100g),
+            ))
+    return options
+
+
+def build_meal_plan(user, profile, day=None, budget_ms=None):
+    """
+    Propose une recette pour chaque repas pas encore saisi aujourd'hui (plus
+    un aliment d'appoint facultatif) pour combler au mieux les macros
+    restantes. Candidates come from SQL (MEAL_PLAN_CANDIDATES public recipes
+    per meal, one serving, closest in kcal to the meal's share); the choice
+    is made by meal_planner.optimize within `budget_ms` (default
+    settings.MEAL_PLAN_TIME_BUDGET_MS), weighted as the "macros" ranking of
+    recipe_list for the profile's goal.
+    Returns a dict: daily_goal, intake, remaining, items (meal, label,
+    option, slug), totals, score, complete, nodes, elapsed_ms; items is empty
+    when nothing is left to eat or every meal is logged.
+    """
+    day = day or timezone.now().date()
+    budget_ms = settings.MEAL_PLAN_TIME_BUDGET_MS if budget_ms is None else budget_ms
+    daily_goal = calculate_daily_goal(profile)
+    intake = daily_totals(user, day)
+    remaining = remaining_intake(daily_goal, intake)
+    result = {
+        'daily_goal': daily_goal, 'intake': intake, 'remaining': remaining,
+        'items': [], 'totals': None, 'score': None, 'complete': True, 'nodes': 0, 'elapsed_ms': 0,
+    }
+    logged = set(FoodLog.objects.filter(owner=user, date=day).values_list('meal_type', flat=True))
+    meals = [(meal, label) for meal, label in FoodLog.MEAL_TYPES if meal not in logged]
+    if remaining['kcal'] <= 0 or not meals:
+        return result
+
+    target = tuple(max(float(remaining[macro]), 0.0) for macro in Recipe.MACROS)
+    share = Value(Decimal(str(round(target[0] / len(meals), 2))), output_field=DecimalField(max_digits=9, decimal_places=2))
+    slots, slugs = [], {}
+    for meal, _ in meals:
+        rows = (
+            Recipe.objects
+            .filter(is_public=True, meal_type=meal)
+            .alias(relevance=Abs(F('kcal_per_serving') - share))
+            .order_by('relevance', 'pk')
+            .values_list('pk', 'name', 'slug', *Recipe.PER_SERVING_FIELDS)[:MEAL_PLAN_CANDIDATES]
+        )
+        options = []
+        for pk, name, slug, *macros in rows:
+            slugs[pk] = slug
+            options.append(meal_planner.Option(
+                kind='recipe', pk=pk, label=name, quantity=1, macros=tuple(float(value) for value in macros),
+            ))
+        slots.append(options)
+    slots.append(_meal_plan_foods())
+    labels = meals + [('complement', "Aliment d'appoint")]
+    optional_meals = set(MEAL_PLAN_OPTIONAL) | {'complement'}
+    optional = {index for index, (meal, _) in enumerate(labels) if meal in optional_meals}
+
+    weights = RECIPE_FIT_WEIGHTS.get(profile.goal, RECIPE_FIT_WEIGHTS['maintain'])
+    plan = meal_planner.optimize(
+        slots, target,
+        weights=tuple(weights[macro] for macro in Recipe.MACROS),
+        budget_s=budget_ms / 1000,
+        optional=optional,
+    )
+    for (meal, label), option in zip(labels, plan.options):
+        # Optional slots left empty are not shown; a required meal without any recipe is
+        if option is None and meal in optional_meals:
+            continue
+        result['items'].append({
+            'meal': meal, 'label': label, 'option': option,
+            'macros': dict(zip(Recipe.MACROS, option.macros)) if option else None,
+            'slug': slugs.get(option.pk) if option and option.kind == 'recipe' else None,
+        })
+    result.update(
+        totals=dict(zip(Recipe.MACROS, plan.totals)),
+        score=plan.score, complete=plan.complete, nodes=plan.nodes, elapsed_ms=plan.elapsed_ms,
+    )
+    return result
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Food, RecipeIngredient, normalize_string
+from .services import refresh_recipe_nutrition, refresh_recipes_using_foods
+
+
+@receiver(pre_save, sender=Food)
+def normalize_fixture_food(sender, instance, raw, **kwargs):
+    """loaddata saves fixtures in raw mode, without Food.save(): fill name_normalized here."""
+    if raw:
+        instance.name_normalized = normalize_string(instance.name)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_recipe_for_ingredient(sender, instance, **kwargs):
+    """Recalcule la nutrition stockée de la recette de l'ingrédient."""
+    values = refresh_recipe_nutrition([instance.recipe_id]).get(instance.recipe_id)
+    # The caller's recipe object (e.g. the admin one) sees the new values too
+    recipe = RecipeIngredient.recipe.field.get_cached_value(instance, None) if values else None
+    if recipe is not None:
+        for field, value in values.items():
+            setattr(recipe, field, value)
+
+
+@receiver(post_save, sender=Food)
+def refresh_recipes_for_food(sender, instance, created, raw, **kwargs):
+    """Corrected values of a food change the recipes using it."""
+    if not created and not raw:
+        refresh_recipes_using_foods([instance.pk])
@@ -1,12 +1,26 @@
 # nutrition/tests.py
 
+import gzip
+import itertools
+import os
+import random
+import tempfile
+from io import StringIO
+
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
 from decimal import Decimal
 from django.utils import timezone
-from .models import Food, FoodLog, Recipe, RecipeIngredient
-from .views import calculate_daily_goal, normalize_string
+from . import food_import, meal_planner
+from .models import Food, FoodLog, Recipe, RecipeIngredient, normalize_string
+from .views import calculate_daily_goal
+from .services import RECIPE_PAGE_SIZE, build_meal_plan, daily_totals, rank_recipes, search_foods
 from accounts.models import Profile
 
 class FoodModelTests(TestCase):
@@ -145,6 +159,36 @@ class FoodLogModelTests(TestCase):
         self.assertEqual(round(total_kcal, 2), Decimal('377.50'))
         self.assertEqual(round(total_protein, 2), Decimal('49.20'))
     
+    def test_macros_are_stored_and_kept_after_food_correction(self):
+        """Les macros sont figées à l'enregistrement"""
+        log = FoodLog.objects.create(
+            owner=self.user, date=self.date_today,
+            food=self.rice, quantity=Decimal('155.55'), meal_type='lunch'
+        )
+        self.rice.kcal_per_100g = Decimal('150.00')
+        self.rice.save()
+
+        log = FoodLog.objects.get(pk=log.pk)
+        self.assertEqual(log.kcal, Decimal('202.22'))
+        log.meal_type = 'dinner'
+        log.save()
+        self.assertEqual(FoodLog.objects.get(pk=log.pk).kcal, Decimal('202.22'))
+
+        # A new quantity takes the current food values
+        log.quantity = Decimal('100.00')
+        log.save(update_fields=['quantity'])
+        self.assertEqual(FoodLog.objects.get(pk=log.pk).kcal, Decimal('150.00'))
+
+    def test_daily_totals_single_query(self):
+        """Totaux du jour en une seule requête"""
+        self.assertEqual(daily_totals(self.user, self.date_today)['kcal'], Decimal('0'))
+        for food, quantity in ((self.chicken, '150.00'), (self.rice, '100.00')):
+            FoodLog.objects.create(owner=self.user, date=self.date_today, food=food, quantity=Decimal(quantity))
+        with self.assertNumQueries(1):
+            totals = daily_totals(self.user, self.date_today)
+        self.assertEqual(totals['kcal'], Decimal('377.50'))
+        self.assertEqual(totals['protein'], Decimal('49.20'))
+
     def test_food_log_str_representation(self):
         """Test de la représentation string"""
         log = FoodLog.objects.create(
@@ -241,6 +285,65 @@ class RecipeModelTests(TestCase):
         """Test de la représentation string"""
         self.assertEqual(str(self.recipe), "Omelette au fromage")
 
+    def _stored(self):
+        return Recipe.objects.values('total_kcal', 'kcal_per_serving', 'total_protein').get(pk=self.recipe.pk)
+
+    def test_totals_follow_ingredient_changes(self):
+        """Les totaux stockés suivent les ingrédients"""
+        self.assertEqual(self._stored()['total_kcal'], Decimal('342.30'))
+        cheese = self.recipe.ingredients.get(food=self.cheese)
+        cheese.quantity = Decimal('60.00')
+        cheese.save()
+        self.assertEqual(self._stored()['total_kcal'], Decimal('452.10'))
+        cheese.delete()
+        self.assertEqual(self._stored()['total_kcal'], Decimal('232.50'))
+        self.assertEqual(self._stored()['kcal_per_serving'], Decimal('116.25'))
+
+    def test_totals_follow_food_and_servings_changes(self):
+        """Correction d'un aliment et nombre de portions"""
+        self.cheese.kcal_per_100g = Decimal('400.00')
+        self.cheese.save()
+        self.assertEqual(self._stored()['total_kcal'], Decimal('352.50'))
+
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.servings = 3
+        recipe.save(update_fields=['servings'])
+        self.assertEqual(self._stored()['kcal_per_serving'], Decimal('117.50'))
+
+    def test_full_save_keeps_stored_totals(self):
+        """Une instance chargée avant un changement d'aliment ne réécrit pas ses anciens totaux"""
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        self.cheese.kcal_per_100g = Decimal('400.00')
+        self.cheese.save()
+
+        stale.name = "Omelette"
+        stale.servings = 3
+        stale.save()
+        self.assertEqual(self._stored()['total_kcal'], Decimal('352.50'))
+        self.assertEqual(self._stored()['kcal_per_serving'], Decimal('117.50'))
+        self.assertEqual(stale.kcal_per_serving, Decimal('117.50'))
+
+    def test_recompute_command(self):
+        """La commande recalcule les valeurs depuis les ingrédients"""
+        Recipe.objects.update(total_kcal=0, kcal_per_serving=0, total_protein=0)
+        out = StringIO()
+        call_command('recompute_recipe_nutrition', chunk_size=1, stdout=out)
+        self.assertIn("1 recette(s)", out.getvalue())
+        self.assertEqual(self._stored(), {
+            'total_kcal': Decimal('342.30'),
+            'kcal_per_serving': Decimal('171.15'),
+            'total_protein': Decimal('28.20'),
+        })
+
+    def test_recipe_list_reads_stored_columns(self):
+        """recipe_list ne parcourt plus les ingrédients"""
+        self.client.force_login(User.objects.create_user(username='cook', password='password123'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('recipe_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Omelette au fromage")
+        self.assertFalse(any('nutrition_recipeingredient' in q['sql'] for q in queries.captured_queries))
+
 
 class NutritionTodayViewTests(TestCase):
     """Tests pour la vue nutrition_today"""
@@ -452,6 +555,42 @@ class RecipeViewTests(TestCase):
         for recipe in recipes:
             self.assertEqual(recipe.meal_type, 'breakfast')
     
+    def _recipe(self, slug, kcal, protein=0, carbs=0, fat=0):
+        return Recipe.objects.create(
+            name=slug, slug=slug, instructions="Test", prep_time_minutes=5,
+            total_kcal=kcal, total_protein=protein,
+            total_carbs=carbs, total_fat=fat,
+        )
+
+    def test_rank_recipes_by_remaining_kcal(self):
+        """Tri SQL par distance aux calories restantes"""
+        for slug, kcal in (('r300', 300), ('r900', 900), ('r600', 600)):
+            self._recipe(slug, kcal)
+        remaining = {'kcal': Decimal('650'), 'protein': 0, 'carbs': 0, 'fat': 0}
+        ranked = rank_recipes(Recipe.objects.exclude(pk=self.recipe.pk), remaining)
+        self.assertEqual([r.slug for r in ranked], ['r600', 'r900', 'r300'])
+        self.assertIn('ABS', str(ranked.query).upper())
+
+    def test_rank_recipes_macro_fit_weighted_by_goal(self):
+        """Le score macros pondère selon l'objectif"""
+        self._recipe('protein', 500, protein=60, carbs=10, fat=5)
+        self._recipe('carbs', 500, protein=10, carbs=90, fat=5)
+        recipes = Recipe.objects.exclude(pk=self.recipe.pk)
+        remaining = {'kcal': Decimal('500'), 'protein': Decimal('60'), 'carbs': Decimal('90'), 'fat': Decimal('5')}
+        self.assertEqual(rank_recipes(recipes, remaining, 'cut', macro_fit=True)[0].slug, 'protein')
+        self.assertEqual(rank_recipes(recipes, remaining, 'bulk', macro_fit=True)[0].slug, 'carbs')
+
+    def test_recipe_list_is_paginated(self):
+        """La liste est paginée et garde les filtres"""
+        for i in range(RECIPE_PAGE_SIZE + 5):
+            self._recipe(f'lunch-{i}', 100 + i)
+        url = reverse('recipe_list')
+        response = self.client.get(url, {'meal_type': 'lunch', 'sort': 'macros'})
+        self.assertEqual(len(response.context['recipes']), RECIPE_PAGE_SIZE)
+        self.assertContains(response, 'meal_type=lunch&amp;sort=macros&amp;page=2')
+        response = self.client.get(url, {'meal_type': 'lunch', 'page': 2})
+        self.assertEqual(len(response.context['recipes']), 6)
+
     def test_recipe_detail_view(self):
         """Test de la vue détail d'une recette"""
         url = reverse('recipe_detail', args=[self.recipe.slug])
@@ -464,6 +603,266 @@ class RecipeViewTests(TestCase):
         self.assertIn('nutrition_info', response.context)
 
 
+class FoodSearchTests(TestCase):
+    """Recherche d'aliments sur name_normalized"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        self.url = reverse('food_search')
+        for name in ["Pâtes complètes", "Salade de pâtes", "Compote de pommes",
+                     "Œuf dur", "Pomme", "Pomme de terre"]:
+            self._food(name)
+
+    def _food(self, name, **kwargs):
+        return Food.objects.create(
+            name=name, slug=name.lower().replace(' ', '-'),
+            kcal_per_100g=Decimal('100.00'), protein_per_100g=Decimal('1.00'),
+            carbs_per_100g=Decimal('1.00'), fat_per_100g=Decimal('1.00'), **kwargs
+        )
+
+    def _names(self, query, **kwargs):
+        return [food.name for food in search_foods(query, **kwargs)]
+
+    def test_name_normalized_maintained_on_save(self):
+        food = Food.objects.get(slug='œuf-dur')
+        self.assertEqual(food.name_normalized, "oeuf dur")
+        food.name = "Crème brûlée"
+        food.save(update_fields=['name'])
+        food.refresh_from_db()
+        self.assertEqual(food.name_normalized, "creme brulee")
+
+    def test_name_normalized_filled_for_fixtures(self):
+        data = ('[{"model": "nutrition.food", "pk": 999, "fields": {"name": "Crêpe", "slug": "crepe",'
+                ' "kcal_per_100g": "200.00", "protein_per_100g": "6.00", "carbs_per_100g": "25.00",'
+                ' "fat_per_100g": "9.00", "unit_type": "g", "is_public": true}}]')
+        for obj in serializers.deserialize('json', data):
+            obj.save()
+        self.assertEqual(Food.objects.get(pk=999).name_normalized, "crepe")
+
+    def test_accent_and_case_insensitive(self):
+        self.assertEqual(self._names("PATES"), ["Pâtes complètes", "Salade de pâtes"])
+        self.assertEqual(self._names("oeuf"), ["Œuf dur"])
+
+    def test_ranking_prefix_then_word_then_substring(self):
+        self._food("Grenadepomme")
+        self.assertEqual(
+            self._names("pomme"),
+            ["Pomme", "Pomme de terre", "Compote de pommes", "Grenadepomme"],
+        )
+
+    def test_short_query_matches_prefixes_only(self):
+        self.assertEqual(self._names("po"), ["Pomme", "Pomme de terre"])
+
+    def test_limit_and_private_foods(self):
+        self._food("Pomme secrète", is_public=False)
+        self.assertEqual(len(self._names("pomme", limit=2)), 2)
+        self.assertNotIn("Pomme secrète", self._names("pomme"))
+
+    def test_endpoint(self):
+        response = self.client.get(self.url, {'q': 'pâte', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['name'], "Pâtes complètes")
+        self.assertEqual(results[0]['unit_label'], 'Grammes (g)')
+        self.assertEqual(self.client.get(self.url, {'limit': 'x'}).status_code, 400)
+
+    def test_endpoint_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url, {'q': 'pomme'}).status_code, 302)
+
+    def test_nutrition_today_no_longer_embeds_foods(self):
+        response = self.client.get(reverse('nutrition_today'))
+        self.assertNotContains(response, "Compote de pommes")
+
+
+class ImportFoodsCommandTests(TestCase):
+    """Tests de la commande import_foods"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, filename, content, compress=False):
+        path = os.path.join(self.tmp.name, filename)
+        opener = gzip.open if compress else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def _import(self, path, **options):
+        out = StringIO()
+        call_command('import_foods', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_csv_with_repo_columns(self):
+        path = self._write('foods.csv', (
+            "name,slug,kcal_per_100g,protein_per_100g,carbs_per_100g,fat_per_100g,unit_type\n"
+            "Riz blanc,riz-blanc,130,2.7,28,0.3,g\n"
+            "Lait,lait,42,3.4,5,1,ml\n"
+        ))
+        output = self._import(path)
+        self.assertIn("2 aliments importés", output)
+        lait = Food.objects.get(slug='lait')
+        self.assertEqual(lait.unit_type, 'ml')
+        self.assertEqual(lait.kcal_per_100g, Decimal('42.00'))
+
+    def test_import_open_food_facts_tsv_gzipped(self):
+        path = self._write('off.csv.gz', (
+            "code\tproduct_name\tquantity\tenergy_100g\tproteins_100g\tcarbohydrates_100g\tfat_100g\n"
+            "3017620422003\tPâte à tartiner\t400 g\t2252\t6,3\t57,5\t30,9\n"
+            "5449000000996\tSoda\t33 cl\t180\t0\t10.6\t0\n"
+            "42\tSans valeurs\t1 pièce\t\t\t\t\n"
+        ), compress=True)
+        output = self._import(path)
+        self.assertIn("1 lignes ignorées", output)
+        spread = Food.objects.get(slug='pate-a-tartiner-3017620422003')
+        self.assertEqual(spread.kcal_per_100g, Decimal('538.24'))  # 2252 kJ
+        self.assertEqual(spread.protein_per_100g, Decimal('6.30'))
+        self.assertEqual(spread.name_normalized, "pate a tartiner")
+        self.assertEqual(Food.objects.get(slug='soda-5449000000996').unit_type, 'ml')
+
+    def test_upsert_updates_existing_and_dedupes(self):
+        food = Food.objects.create(
+            name="Pomme", slug="pomme", kcal_per_100g=Decimal('50.00'),
+            protein_per_100g=Decimal('0.30'), carbs_per_100g=Decimal('14.00'),
+            fat_per_100g=Decimal('0.20'), is_public=False,
+        )
+        path = self._write('foods.jsonl', "\n".join([
+            '{"name": "Pomme", "slug": "pomme", "kcal_per_100g": 51, "protein_per_100g": 0.3, "carbs_per_100g": 14, "fat_per_100g": 0.2}',
+            'pas du json',
+            '{"name": "Pomme verte", "slug": "pomme", "kcal_per_100g": 52, "protein_per_100g": 0.4, "carbs_per_100g": 14, "fat_per_100g": 0.2, "unit": "pièce"}',
+            '{"name": "Poire", "kcal_per_100g": 57, "protein_per_100g": 0.4, "carbs_per_100g": 15, "fat_per_100g": 0.1}',
+        ]))
+        output = self._import(path, batch_size=2)
+        self.assertIn("1 doublons", output)
+        self.assertEqual(Food.objects.count(), 2)
+        food.refresh_from_db()
+        self.assertEqual(food.name, "Pomme verte")
+        self.assertEqual(food.kcal_per_100g, Decimal('52.00'))
+        self.assertEqual(food.unit_type, 'unit')
+        self.assertFalse(food.is_public)  # not overwritten by the import
+        self.assertTrue(Food.objects.filter(slug='poire').exists())
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            self._import('/nonexistent/foods.csv')
+
+    def test_import_fixture_json_array(self):
+        """Le format de fixtures/foods.json (tableau JSON, valeurs sous "fields")"""
+        fixture = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fixtures', 'foods.json')
+        output = self._import(fixture)
+        self.assertIn("0 lignes ignorées", output)
+        riz = Food.objects.get(slug='riz-blanc')
+        self.assertEqual(riz.kcal_per_100g, Decimal('130.00'))
+
+    def test_fails_when_every_row_is_skipped(self):
+        path = self._write('foods.csv', "nom,calories\nRiz,130\n")
+        with self.assertRaisesMessage(CommandError, "Aucun aliment importé"):
+            self._import(path)
+        with self.assertRaises(CommandError):
+            self._import(self._write('foods.json', '{"name": "Riz"}'))
+
+
+    def test_json_array_element_size_is_bounded(self):
+        items = food_import.iter_json_array(StringIO('[1, "' + 'x' * 2 * food_import.JSON_MAX_ITEM_SIZE + '"]'))
+        self.assertEqual(next(items), 1)
+        with self.assertRaisesMessage(ValueError, "caractère 4"):
+            next(items)
+
+
+class MealPlanTests(TestCase):
+    """Tests pour l'optimiseur et la vue du plan de repas"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='planner', password='password123')
+        self.profile, _ = Profile.objects.get_or_create(user=self.user)
+        self.profile.weight_kg = Decimal('70.00')
+        self.profile.goal = 'maintain'
+        self.profile.save()
+        self.client.login(username='planner', password='password123')
+        self.food = Food.objects.create(
+            name="Riz", slug="riz",
+            kcal_per_100g=Decimal('100.00'), protein_per_100g=Decimal('5.00'),
+            carbs_per_100g=Decimal('20.00'), fat_per_100g=Decimal('1.00'),
+        )
+
+    def _recipe(self, slug, meal_type, grams):
+        recipe = Recipe.objects.create(
+            name=slug, slug=slug, instructions="-", prep_time_minutes=5, servings=1, meal_type=meal_type,
+        )
+        RecipeIngredient.objects.create(recipe=recipe, food=self.food, quantity=Decimal(grams))
+        return recipe
+
+    def _options(self, rng, count):
+        return [
+            meal_planner.Option(kind='recipe', pk=pk, label=str(pk), quantity=1,
+                                macros=tuple(rng.uniform(0, 60) for _ in range(4)))
+            for pk in range(count)
+        ]
+
+    def test_optimize_matches_brute_force(self):
+        """Sans limite de temps, le meilleur plan est celui d'une recherche exhaustive"""
+        rng = random.Random(7)
+        for _ in range(10):
+            slots = [self._options(rng, 8) for _ in range(3)]
+            target = tuple(rng.uniform(20, 150) for _ in range(4))
+            plan = meal_planner.optimize(slots, target, budget_s=10, optional={2})
+            brute = min(
+                meal_planner.plan_score([sum(values) for values in zip(*(o.macros for o in combo))], target)
+                for combo in itertools.product(slots[0], slots[1], slots[2] + [meal_planner.SKIP])
+            )
+            self.assertTrue(plan.complete)
+            self.assertAlmostEqual(plan.score, brute, places=6)
+
+    def test_optimize_respects_budget(self):
+        """Grand catalogue : la recherche s'arrête au budget avec un plan complet"""
+        rng = random.Random(1)
+        slots = [self._options(rng, 2500) for _ in range(4)]
+        plan = meal_planner.optimize(slots, (2000, 150, 250, 70), budget_s=0.05)
+        self.assertLess(plan.elapsed_ms, 200)
+        self.assertTrue(all(option is not None for option in plan.options))
+
+    def test_build_meal_plan_fills_open_meals(self):
+        """Un repas déjà saisi n'est pas replanifié ; les recettes proposées existent"""
+        for meal_type in ('breakfast', 'lunch', 'dinner'):
+            for grams in ('200', '400', '600'):
+                self._recipe(f'{meal_type}-{grams}', meal_type, grams)
+        FoodLog.objects.create(owner=self.user, date=timezone.now().date(), food=self.food,
+                               quantity=Decimal('100'), meal_type='breakfast')
+
+        plan = build_meal_plan(self.user, self.profile)
+        meals = [item['meal'] for item in plan['items']]
+        self.assertNotIn('breakfast', meals)
+        self.assertIn('lunch', meals)
+        self.assertIn('dinner', meals)
+        for item in plan['items']:
+            if item['option'] and item['option'].kind == 'recipe':
+                self.assertEqual(Recipe.objects.get(pk=item['option'].pk).slug, item['slug'])
+
+    def test_build_meal_plan_nothing_left(self):
+        """Objectif calorique dépassé : pas de plan"""
+        FoodLog.objects.create(owner=self.user, date=timezone.now().date(), food=self.food,
+                               quantity=Decimal('3000'), meal_type='lunch')
+        self.assertEqual(build_meal_plan(self.user, self.profile)['items'], [])
+
+    def test_meal_plan_view(self):
+        """La vue affiche les recettes du plan"""
+        self._recipe('poulet-riz', 'lunch', '500')
+        response = self.client.get(reverse('meal_plan'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'nutrition/meal_plan.html')
+        self.assertContains(response, reverse('recipe_detail', args=['poulet-riz']))
+
+    def test_bench_meal_plan_command(self):
+        out = StringIO()
+        call_command('bench_meal_plan', recipes=400, runs=2, budget_ms=20, stdout=out)
+        self.assertIn('"greedy_mean_score"', out.getvalue())
+
+
 class UtilityFunctionsTests(TestCase):
     """Tests pour les fonctions utilitaires"""
     
@@ -7,11 +7,17 @@ urlpatterns = [
     # Display today's journal and allow adding entries
     path('today/', views.nutrition_today, name='nutrition_today'),
     
+    # Food autocomplete (JSON)
+    path('foods/search/', views.food_search, name='food_search'),
+
     # Route to delete a specific FoodLog by ID
     path('delete/<int:pk>/', views.delete_food_log, name='delete_food_log'),
     
     # Recipes
     path('recipes/', views.recipe_list, name='recipe_list'),
     path('recipes/<slug:slug>/', views.recipe_detail, name='recipe_detail'),
+
+    # Meal plan for the rest of the day
+    path('plan/', views.meal_plan, name='meal_plan'),
 ]
 
@@ -5,17 +5,17 @@ from django.contrib.auth.decorators import login_required
 from accounts.decorators import feature_required
 from django.contrib import messages
 from django.db.models import Sum
+from django.core.paginator import Paginator
 from django.utils import timezone
+from django.http import JsonResponse
 from .models import Food, FoodLog
 from .forms import FoodLogForm
+from .services import (
+    FOOD_SEARCH_LIMIT, FOOD_SEARCH_MAX_LIMIT, RECIPE_PAGE_SIZE,
+    build_meal_plan, calculate_daily_goal, daily_totals, rank_recipes,
+    remaining_intake, search_foods,
+)
 import json
-from decimal import Decimal
-import unicodedata
-
-def normalize_string(s):
-    """Remove accents and special characters."""
-    nfkd_form = unicodedata.normalize('NFKD', s)
-    return ''.join([c for c in nfkd_form if not unicodedata.combining(c)]).lower()
 
 @login_required
 @feature_required('nutrition')
@@ -36,12 +36,7 @@ def nutrition_today(request):
     
     logs = FoodLog.objects.filter(owner=request.user, date=today).select_related('food')
     
-    totals = {
-        'kcal': sum(float(log.kcal) for log in logs),
-        'protein': sum(float(log.protein) for log in logs),
-        'carbs': sum(float(log.carbs) for log in logs),
-        'fat': sum(float(log.fat) for log in logs)
-    }
+    totals = {field: float(value) for field, value in daily_totals(request.user, today).items()}
     
     logs_json = json.dumps([{
         'id': log.id,
@@ -62,23 +57,40 @@ def nutrition_today(request):
         'fat': round(totals['fat'], 1)
     })
     
-    foods_json = json.dumps([{
-        'id': f.id,
-        'name': f.name,
-        'name_normalized': normalize_string(f.name),
-        'unit_type': f.unit_type
-    } for f in Food.objects.filter(is_public=True).order_by('name')])
-    
     return render(request, 'nutrition/nutrition_today.html', {
         'form': form,
         'logs': logs,
         'totals': totals,
         'logs_json': logs_json,
         'totals_json': totals_json,
-        'foods_json': foods_json,
         'current_date': today
     })
 
+@login_required
+@feature_required('nutrition')
+def food_search(request):
+    """
+    Autocomplétion des aliments (JSON) : ?q=<texte>&limit=<n>
+    Accent and case insensitive, best matches first.
+    """
+    try:
+        limit = int(request.GET.get('limit', FOOD_SEARCH_LIMIT))
+    except ValueError:
+        return JsonResponse({"error": "Limite invalide"}, status=400)
+    limit = min(max(limit, 1), FOOD_SEARCH_MAX_LIMIT)
+    foods = search_foods(request.GET.get('q', ''), limit=limit)
+    return JsonResponse({
+        "results": [
+            {
+                "id": food.pk,
+                "name": food.name,
+                "unit_type": food.unit_type,
+                "unit_label": food.get_unit_label(),
+            }
+            for food in foods
+        ],
+    })
+
 @login_required
 def delete_food_log(request, pk):
     log_to_delete = get_object_or_404(FoodLog, pk=pk, owner=request.user)
@@ -94,7 +106,7 @@ def recipe_list(request):
     from .models import Recipe
     
     user_profile = request.user.profile
-    recipes = Recipe.objects.filter(is_public=True).prefetch_related('ingredients__food')
+    recipes = Recipe.objects.filter(is_public=True)
     
     # Filter by meal type (optional)
     meal_filter = request.GET.get('meal_type')
@@ -111,32 +123,19 @@ def recipe_list(request):
     
     # Get current day's intake
     today = timezone.now().date()
-    logs = FoodLog.objects.filter(owner=request.user, date=today)
-    current_intake = {
-        'kcal': sum(Decimal(str(log.kcal)) for log in logs),
-        'protein': sum(Decimal(str(log.protein)) for log in logs),
-        'carbs': sum(Decimal(str(log.carbs)) for log in logs),
-        'fat': sum(Decimal(str(log.fat)) for log in logs)
-    }
+    current_intake = daily_totals(request.user, today)
     
-    remaining = {
-        'kcal': Decimal(str(daily_goal['kcal'])) - current_intake['kcal'],
-        'protein': Decimal(str(daily_goal['protein'])) - current_intake['protein'],
-        'carbs': Decimal(str(daily_goal['carbs'])) - current_intake['carbs'],
-        'fat': Decimal(str(daily_goal['fat'])) - current_intake['fat']
-    }
+    remaining = remaining_intake(daily_goal, current_intake)
     
-    # Tri des recettes par pertinence (calories proches du restant)
-    if remaining['kcal'] > 0:
-        recipes_with_score = []
-        for recipe in recipes:
-            kcal_diff = abs(Decimal(str(recipe.kcal_per_serving)) - remaining['kcal'])
-            recipes_with_score.append((recipe, kcal_diff))
-        recipes_with_score.sort(key=lambda x: x[1])
-        recipes = [r[0] for r in recipes_with_score]
+    # Tri des recettes par pertinence (calories ou macros proches du restant), en SQL
+    sort = request.GET.get('sort')
+    recipes = rank_recipes(recipes, remaining, goal=user_profile.goal, macro_fit=sort == 'macros')
+    page = Paginator(recipes, RECIPE_PAGE_SIZE).get_page(request.GET.get('page'))
     
     context = {
-        'recipes': recipes,
+        'recipes': page,
+        'page_obj': page,
+        'sort': sort,
         'daily_goal': daily_goal,
         'current_intake': current_intake,
         'remaining': remaining,
@@ -181,42 +180,9 @@ def recipe_detail(request, slug):
     return render(request, 'nutrition/recipe_detail.html', context)
 
 
-def calculate_daily_goal(profile):
-    """Calculate daily goals based on profile."""
-    # Simplified formula based on weight and goal
-    if not profile.weight_kg:
-        # Default values if no weight specified
-        return {
-            'kcal': 2000,
-            'protein': 150,
-            'carbs': 200,
-            'fat': 60
-        }
-    
-    weight = float(profile.weight_kg)
-    
-    if profile.goal == 'bulk':
-        # Bulking: caloric surplus
-        kcal = weight * 35
-        protein = weight * 2.2
-        carbs = weight * 5
-        fat = weight * 1
-    elif profile.goal == 'cut':
-        # Cutting: caloric deficit
-        kcal = weight * 25
-        protein = weight * 2.5
-        carbs = weight * 2
-        fat = weight * 0.8
-    else:  # maintain
-        # Maintenance
-        kcal = weight * 30
-        protein = weight * 2
-        carbs = weight * 3.5
-        fat = weight * 0.9
-    
-    return {
-        'kcal': round(kcal),
-        'protein': round(protein),
-        'carbs': round(carbs),
-        'fat': round(fat)
-    }
\ No newline at end of file
+@login_required
+@feature_required('nutrition')
+def meal_plan(request):
+    """Plan de repas pour le reste de la journée, au plus près des macros restantes."""
+    plan = build_meal_plan(request.user, request.user.profile)
+    return render(request, 'nutrition/meal_plan.html', {'plan': plan})
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('running', '0004_alter_garminauth_email_alter_garminauth_is_active_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='run',
+            index=models.Index(fields=['user', '-start_date'], name='running_run_user_start'),
+        ),
+    ]
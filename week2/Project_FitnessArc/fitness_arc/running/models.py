@@ -96,6 +96,8 @@ class Run(models.Model):
 
     class Meta:
         ordering = ["-start_date"]
+        # my_runs (latest first) and the per-day calories of a user
+        indexes = [models.Index(fields=["user", "-start_date"], name="running_run_user_start")]
 
     def __str__(self):
         return f"{self.name} ({self.distance_km:.1f} km)"
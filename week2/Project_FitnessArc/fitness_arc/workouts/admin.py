@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Exercise, WorkoutTemplate, TemplateItem, WorkoutSession, SetLog, PR, SportCategory
+from .models import Exercise, WorkoutTemplate, TemplateItem, WorkoutSession, SetLog, PR, PRHistory, SportCategory
 
 @admin.register(SportCategory)
 class SportCategoryAdmin(admin.ModelAdmin):
@@ -29,7 +29,13 @@ class SetLogInline(admin.TabularInline):
 
 @admin.register(WorkoutSession)
 class WorkoutSessionAdmin(admin.ModelAdmin):
-    list_display = ("owner","date","from_template")
+    list_display = ("owner","date","from_template","total_sets","total_volume")
+    readonly_fields = ("total_volume","total_sets","total_reps")
     inlines = [SetLogInline]
 
-admin.site.register(PR)
\ No newline at end of file
+admin.site.register(PR)
+
+@admin.register(PRHistory)
+class PRHistoryAdmin(admin.ModelAdmin):
+    list_display = ("owner","exercise","metric","value","date")
+    list_filter = ("metric",)
@@ -0,0 +1,55 @@
+"""
+Commande de management pour reconstruire l'historique des PR (PRHistory)
+en rejouant les séances de chaque utilisateur dans l'ordre chronologique.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from workouts.models import PRHistory
+from workouts.pr_engine import rebuild_pr_history
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit l\'historique des records (PRHistory) à partir des séries enregistrées'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Reconstruire uniquement pour cet utilisateur (username)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Nombre d\'utilisateurs traités par lot (défaut: 200)',
+        )
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Ne rien faire si la table contient déjà des lignes (utile en release)',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and PRHistory.objects.exists():
+            self.stdout.write("PRHistory déjà rempli, skip")
+            return
+
+        users = User.objects.order_by('pk')
+        if options.get('user'):
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f'Utilisateur "{options["user"]}" introuvable'))
+                return
+
+        user_ids = list(users.values_list('pk', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+        total = 0
+        for i in range(0, len(user_ids), chunk_size):
+            with transaction.atomic():
+                total += rebuild_pr_history(user_ids[i:i + chunk_size])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} entrées d'historique créées pour {len(user_ids)} utilisateur(s)"))
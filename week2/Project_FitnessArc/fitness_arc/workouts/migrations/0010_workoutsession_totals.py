@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0009_exercise_image_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutsession',
+            name='total_reps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workoutsession',
+            name='total_sets',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workoutsession',
+            name='total_volume',
+            field=models.FloatField(db_index=True, default=0, help_text='Sum of the sets volume (kg)'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_session_totals(apps, schema_editor):
+    """Remplit total_volume/total_sets/total_reps des séances existantes en un seul UPDATE."""
+    WorkoutSession = apps.get_model('workouts', 'WorkoutSession')
+    SetLog = apps.get_model('workouts', 'SetLog')
+
+    # Same expression as workouts.models.set_volume_expression (frozen here)
+    volume = Case(
+        When(reps__gt=0, then=F('weight_kg') * F('reps')),
+        default=F('weight_kg'),
+        output_field=FloatField(),
+    )
+    per_session = SetLog.objects.filter(session=OuterRef('pk')).values('session')
+
+    WorkoutSession.objects.update(
+        total_volume=Coalesce(
+            Subquery(per_session.annotate(v=Sum(volume)).values('v'), output_field=FloatField()),
+            0.0,
+        ),
+        total_sets=Coalesce(
+            Subquery(per_session.annotate(n=Count('id')).values('n'), output_field=IntegerField()),
+            0,
+        ),
+        total_reps=Coalesce(
+            Subquery(per_session.annotate(r=Sum('reps')).values('r'), output_field=IntegerField()),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0010_workoutsession_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_session_totals, migrations.RunPython.noop),
+    ]
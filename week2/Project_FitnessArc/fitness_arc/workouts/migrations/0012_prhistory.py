@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0011_backfill_session_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PRHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('max_weight', 'Charge max'), ('max_reps', 'Reps max'), ('est_1rm', '1RM estimé')], max_length=20)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workouts.exercise')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pr_history', to=settings.AUTH_USER_MODEL)),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pr_history', to='workouts.workoutsession')),
+            ],
+            options={
+                'verbose_name': 'PR history',
+                'verbose_name_plural': 'PR history',
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['owner', 'exercise', 'metric', 'date'], name='workouts_pr_owner_i_6ceef0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0012_prhistory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pr',
+            index=models.Index(fields=['owner', 'date'], name='workouts_pr_owner_date'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutsession',
+            index=models.Index(fields=['owner', 'date'], name='workouts_session_owner_date'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutsession',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['owner', 'date'], name='workouts_session_done_date'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0013_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pr',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterField(
+            model_name='pr',
+            name='value',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='prhistory',
+            name='value',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
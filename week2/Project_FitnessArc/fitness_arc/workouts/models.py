@@ -1,5 +1,8 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
@@ -77,12 +80,38 @@ class WorkoutSession(models.Model):
     is_completed = models.BooleanField(default=False, help_text="Session completed")
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Totaux dénormalisés des SetLog, tenus à jour par workouts.signals (refresh_totals)
+    total_volume = models.FloatField(default=0, db_index=True, help_text="Sum of the sets volume (kg)")
+    total_sets = models.PositiveIntegerField(default=0)
+    total_reps = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            # Dashboard current week / streak (all sessions of a user since a date)
+            models.Index(fields=["owner", "date"], name="workouts_session_owner_date"),
+            # History, calendar, rollup: completed sessions only
+            models.Index(
+                fields=["owner", "date"], name="workouts_session_done_date",
+                condition=models.Q(is_completed=True),
+            ),
+        ]
     
     def __str__(self): return f"Session {self.date}"
     
-    @property
-    def total_volume(self):
-        return sum(sl.volume for sl in self.set_logs.all())
+    def refresh_totals(self):
+        """
+        Recompute total_volume/total_sets/total_reps from the set logs with one
+        aggregate and store them with an UPDATE (no save() signals).
+        """
+        totals = SetLog.objects.filter(session_id=self.pk).aggregate(
+            total_volume=Coalesce(Sum(set_volume_expression()), 0.0),
+            total_sets=Count('id'),
+            total_reps=Coalesce(Sum('reps'), 0),
+        )
+        WorkoutSession.objects.filter(pk=self.pk).update(**totals)
+        for field, value in totals.items():
+            setattr(self, field, value)
+        return totals
     
     @property
     def estimated_calories_burned(self):
@@ -91,6 +120,18 @@ class WorkoutSession(models.Model):
             return 0
         return self.duration_minutes * 5
 
+def set_volume_expression(prefix=""):
+    """
+    SQL counterpart of SetLog.volume: weight x reps, or the weight alone for
+    time-based sets. `prefix` allows aggregating through a relation
+    (e.g. "set_logs__" from WorkoutSession).
+    """
+    return Case(
+        When(**{f"{prefix}reps__gt": 0}, then=F(f"{prefix}weight_kg") * F(f"{prefix}reps")),
+        default=F(f"{prefix}weight_kg"),
+        output_field=FloatField(),
+    )
+
 class SetLog(models.Model):
     session = models.ForeignKey(WorkoutSession, on_delete=models.CASCADE, related_name="set_logs")
     exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
@@ -122,6 +163,34 @@ class PR(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="prs")
     exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
     metric = models.CharField(max_length=20, choices=METRIC)
-    value = models.DecimalField(max_digits=6, decimal_places=2)
-    date = models.DateField(auto_now_add=True)
-    class Meta: unique_together = ("owner","exercise","metric")
\ No newline at end of file
+    # Up to an est_1rm of 9999.99 kg x 32767 reps (see pr_engine.est_1rm_expression)
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    # Date of the session that set the record (pr_engine sets it explicitly)
+    date = models.DateField(default=timezone.localdate)
+    class Meta:
+        unique_together = ("owner","exercise","metric")
+        # Recent PRs and per-day PR counts of a user
+        indexes = [models.Index(fields=["owner", "date"], name="workouts_pr_owner_date")]
+
+class PRHistory(models.Model):
+    """
+    Historique des records (append-only) : une ligne chaque fois qu'un PR est
+    établi ou battu, pour tracer la progression sans relire les SetLog.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pr_history")
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    metric = models.CharField(max_length=20, choices=PR.METRIC)
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    # The session that set the record; its history goes away with it
+    session = models.ForeignKey(WorkoutSession, on_delete=models.CASCADE, null=True, blank=True, related_name="pr_history")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["date", "id"]
+        indexes = [models.Index(fields=["owner", "exercise", "metric", "date"])]
+        verbose_name = "PR history"
+        verbose_name_plural = "PR history"
+
+    def __str__(self):
+        return f"{self.exercise} {self.metric} {self.value} ({self.date})"
@@ -0,0 +1,274 @@
+"""
+Moteur de PR (records personnels) incrémental.
+
+- Ajout de séries : les maxima de la séance (une requête groupée) sont comparés
+  aux PR existants (une requête), seuls les records battus sont écrits.
+- Suppression : on ne relit l'historique que pour les records détenus par les
+  séries supprimées, avec un seul agrégat groupé pour tous les exercices ;
+  leur PRHistory est rejoué depuis les séries restantes.
+
+Metrics: max_weight (kg), max_reps, est_1rm (Epley: weight x (1 + reps / 30),
+the weight itself for a single rep; time-based sets have no 1RM).
+
+Every record set or beaten is also appended to PRHistory, which backs the
+progression curves (progression()). PR.date is the date of the session that
+set the current value, never the day the row was written.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Max, Q, Value, When
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import PR, PRHistory, SetLog
+
+METRICS = ("max_weight", "max_reps", "est_1rm")
+
+# Sent after PRs were created in bulk (no post_save signals),
+# with owner_id and the set of dates of the new PR rows.
+prs_changed = Signal()
+
+_TWO_PLACES = Decimal("0.01")
+
+
+def est_1rm_expression():
+    """SQL Epley estimate of a set's one-rep max (NULL for sets without reps)."""
+    return Case(
+        When(reps=1, then=F("weight_kg")),
+        When(reps__gt=1, then=ExpressionWrapper(
+            F("weight_kg") * (Value(1.0) + F("reps") / Value(30.0)),
+            output_field=DecimalField(max_digits=12, decimal_places=4),
+        )),
+        default=None,
+        output_field=DecimalField(max_digits=12, decimal_places=4),
+    )
+
+
+def _as_pr_value(value):
+    """Values are stored as PR.value (2 decimal places)."""
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(_TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+def maxima_by_exercise(set_logs):
+    """
+    Best value of each metric per exercise in a SetLog queryset, in one grouped query.
+    Returns {exercise_id: {metric: Decimal or None}}.
+    """
+    rows = (
+        set_logs
+        .order_by()
+        .values("exercise_id")
+        .annotate(
+            max_weight=Max("weight_kg"),
+            max_reps=Max("reps"),
+            est_1rm=Max(est_1rm_expression()),
+        )
+    )
+    return {
+        row["exercise_id"]: {metric: _as_pr_value(row[metric]) for metric in METRICS}
+        for row in rows
+    }
+
+
+def _current_prs(user, exercise_ids):
+    """{(exercise_id, metric): PR} for the given exercises."""
+    prs = PR.objects.filter(owner=user, exercise_id__in=exercise_ids)
+    return {(pr.exercise_id, pr.metric): pr for pr in prs}
+
+
+def apply_new_set_logs(user, set_logs, day=None, session=None):
+    """
+    Raise the user's PRs with the best values of the given (new) set logs.
+    Compares against the current PR rows only: one grouped aggregate, one PR
+    lookup, then at most one bulk insert, one bulk update and one PRHistory
+    insert. New and improved PRs, and their history, are dated `day` (the
+    session date, today by default).
+    Returns the list of PRs created or improved.
+    """
+    maxima = maxima_by_exercise(set_logs)
+    if not maxima:
+        return []
+    day = day or timezone.localdate()
+    current = _current_prs(user, maxima.keys())
+
+    to_create, to_update, dates = [], [], set()
+    for exercise_id, values in maxima.items():
+        for metric, value in values.items():
+            if value is None:
+                continue
+            pr = current.get((exercise_id, metric))
+            if pr is None:
+                to_create.append(PR(owner=user, exercise_id=exercise_id, metric=metric, value=value, date=day))
+            elif value > pr.value:
+                dates.add(pr.date)
+                pr.value, pr.date = value, day
+                to_update.append(pr)
+
+    if to_create:
+        PR.objects.bulk_create(to_create)
+    if to_update:
+        PR.objects.bulk_update(to_update, ["value", "date"])
+    if to_create or to_update:
+        PRHistory.objects.bulk_create([
+            PRHistory(owner=user, exercise_id=pr.exercise_id, metric=pr.metric,
+                      value=pr.value, date=day, session=session)
+            for pr in to_create + to_update
+        ])
+        # The per-day PR counts of the new date and of the ones improved PRs left
+        prs_changed.send(sender=PR, owner_id=user.pk, dates=dates | {day})
+    return to_create + to_update
+
+
+def update_prs_for_session(session):
+    """
+    Met à jour les PR (records) de l'utilisateur pour tous les exercices
+    présents dans cette séance.
+    """
+    return apply_new_set_logs(session.owner, session.set_logs.all(), day=session.date, session=session)
+
+
+def held_records(user, set_logs):
+    """
+    To call BEFORE deleting set logs: the (exercise_id, metric) records that
+    these rows hold (their best value reaches the current PR).
+    """
+    maxima = maxima_by_exercise(set_logs)
+    if not maxima:
+        return set()
+    held = set()
+    for (exercise_id, metric), pr in _current_prs(user, maxima.keys()).items():
+        value = maxima[exercise_id][metric]
+        if value is not None and value >= pr.value:
+            held.add((exercise_id, metric))
+    return held
+
+
+def recompute_records(user, records):
+    """
+    To call AFTER the deletion: recompute the given records from the remaining
+    history with one grouped aggregate over the affected exercises. A record
+    with no remaining set is deleted. The PRHistory of these records is
+    replayed from the remaining sets, so the curves drop the deleted values,
+    and its last row gives the value and date of each remaining record.
+    """
+    if not records:
+        return
+    by_exercise = defaultdict(set)
+    for exercise_id, metric in records:
+        by_exercise[exercise_id].add(metric)
+
+    history = [
+        row for row in _replay_history(
+            SetLog.objects.filter(session__owner=user, exercise_id__in=by_exercise.keys())
+        )
+        if row.metric in by_exercise[row.exercise_id]
+    ]
+    # Replayed in date order, each record's last row is its current best
+    best = {(row.exercise_id, row.metric): row for row in history}
+    current = _current_prs(user, by_exercise.keys())
+
+    to_update, to_delete, dates = [], [], set()
+    for exercise_id, metrics in by_exercise.items():
+        for metric in metrics:
+            pr = current.get((exercise_id, metric))
+            if pr is None:
+                continue
+            row = best.get((exercise_id, metric))
+            if row is None:
+                to_delete.append(pr)
+            elif (row.value, row.date) != (pr.value, pr.date):
+                dates |= {pr.date, row.date}
+                pr.value, pr.date = row.value, row.date
+                to_update.append(pr)
+
+    if to_update:
+        PR.objects.bulk_update(to_update, ["value", "date"])
+        prs_changed.send(sender=PR, owner_id=user.pk, dates=dates)
+    if to_delete:
+        # Rare: a regular delete, the PR post_delete signals update the counts
+        PR.objects.filter(pk__in=[pr.pk for pr in to_delete]).delete()
+
+    affected = Q()
+    for exercise_id, metrics in by_exercise.items():
+        affected |= Q(exercise_id=exercise_id, metric__in=metrics)
+    PRHistory.objects.filter(affected, owner=user).delete()
+    PRHistory.objects.bulk_create(history)
+
+
+def progression(user, exercise_id, metric="est_1rm", start=None, end=None, downsample=None):
+    """
+    Record curve of one exercise/metric from PRHistory (index owner, exercise,
+    metric, date). downsample="week" or "month" keeps the best value of each
+    period, so years of data stay a few hundred points.
+    Returns [{"date": date, "value": float}, ...] in date order.
+    """
+    rows = PRHistory.objects.filter(owner=user, exercise_id=exercise_id, metric=metric)
+    if start is not None:
+        rows = rows.filter(date__gte=start)
+    if end is not None:
+        rows = rows.filter(date__lte=end)
+
+    if downsample in ("week", "month"):
+        trunc = TruncWeek if downsample == "week" else TruncMonth
+        rows = (
+            rows.order_by()
+            .annotate(period=trunc("date"))
+            .values("period")
+            .annotate(best=Max("value"))
+            .order_by("period")
+        )
+        return [{"date": row["period"], "value": float(row["best"])} for row in rows]
+
+    return [
+        {"date": day, "value": float(value)}
+        for day, value in rows.order_by("date", "id").values_list("date", "value")
+    ]
+
+
+def _replay_history(set_logs):
+    """
+    Unsaved PRHistory rows of a SetLog queryset, replaying its sessions in
+    date order: one grouped query of per-session maxima, running best kept
+    in memory.
+    """
+    rows = (
+        set_logs
+        .values("session__owner_id", "session_id", "session__date", "exercise_id")
+        .annotate(
+            max_weight=Max("weight_kg"),
+            max_reps=Max("reps"),
+            est_1rm=Max(est_1rm_expression()),
+        )
+        .order_by("session__date", "session_id")
+    )
+
+    best = {}
+    history = []
+    for row in rows:
+        for metric in METRICS:
+            value = _as_pr_value(row[metric])
+            key = (row["session__owner_id"], row["exercise_id"], metric)
+            if value is None or (key in best and value <= best[key]):
+                continue
+            best[key] = value
+            history.append(PRHistory(
+                owner_id=key[0], exercise_id=key[1], metric=metric, value=value,
+                date=row["session__date"], session_id=row["session_id"],
+            ))
+    return history
+
+
+def rebuild_pr_history(user_ids):
+    """
+    Rebuild PRHistory of the given users by replaying their sessions (see
+    _replay_history), history rows bulk inserted. Returns the number of
+    rows written.
+    """
+    history = _replay_history(SetLog.objects.filter(session__owner_id__in=user_ids))
+    PRHistory.objects.filter(owner_id__in=user_ids).delete()
+    PRHistory.objects.bulk_create(history, batch_size=1000)
+    return len(history)
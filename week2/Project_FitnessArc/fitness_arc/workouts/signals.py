@@ -1,7 +1,27 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import WorkoutTemplate, TemplateItem, Exercise
+from .models import WorkoutTemplate, TemplateItem, Exercise, WorkoutSession, SetLog
+
+
+@receiver(post_save, sender=SetLog)
+@receiver(post_delete, sender=SetLog)
+def refresh_session_totals(sender, instance, **kwargs):
+    """
+    Tient à jour les totaux dénormalisés de la séance (volume, séries, reps)
+    à chaque ajout/modification/suppression d'un SetLog.
+    """
+    origin = kwargs.get('origin')
+    if isinstance(origin, (WorkoutSession, User)):
+        # La séance est supprimée avec ses séries, rien à recalculer
+        return
+
+    # Reuse the in-memory session when there is one so callers see fresh totals
+    if SetLog.session.is_cached(instance):
+        session = instance.session
+    else:
+        session = WorkoutSession(pk=instance.session_id)
+    session.refresh_totals()
 
 
 @receiver(post_save, sender=User)
@@ -1,12 +1,16 @@
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import date, timedelta
 from decimal import Decimal
 from .models import (
     SportCategory, Exercise, WorkoutTemplate, TemplateItem, 
-    WorkoutSession, SetLog, PR
+    WorkoutSession, SetLog, PR, PRHistory
 )
 from .views import update_prs_for_session
+from . import pr_engine
 
 User = get_user_model()
 
@@ -259,7 +263,29 @@ class WorkoutSessionModelTests(TestCase):
         
         expected_volume = (100 * 5) + (120 * 5)
         self.assertEqual(session.total_volume, expected_volume)
-    
+
+    def test_stored_totals_follow_set_logs(self):
+        """Test des totaux stockés en base (ajout puis suppression de séries)"""
+        session = WorkoutSession.objects.create(owner=self.user)
+        first = SetLog.objects.create(
+            session=session, exercise=self.exercise, set_number=1,
+            reps=5, weight_kg=Decimal('100.00')
+        )
+        SetLog.objects.create(
+            session=session, exercise=self.exercise, set_number=2,
+            reps=8, weight_kg=Decimal('80.00')
+        )
+
+        stored = WorkoutSession.objects.values('total_volume', 'total_sets', 'total_reps').get(pk=session.pk)
+        self.assertEqual(stored, {'total_volume': 1140.0, 'total_sets': 2, 'total_reps': 13})
+
+        # Deleted from a fresh instance (session not cached on the log)
+        SetLog.objects.get(pk=first.pk).delete()
+        session.refresh_from_db()
+        self.assertEqual(session.total_volume, 640.0)
+        self.assertEqual(session.total_sets, 1)
+        self.assertEqual(session.total_reps, 8)
+
     def test_estimated_calories_burned(self):
         """Test du calcul des calories brûlées"""
         session = WorkoutSession.objects.create(
@@ -420,6 +446,183 @@ class UpdatePRsFunctionTests(TestCase):
         self.assertEqual(pr.value, Decimal('120.00'))
 
 
+class PREngineTests(TestCase):
+    """Tests du moteur de PR incrémental"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lifter', password='password123')
+        self.exercises = [
+            Exercise.objects.create(name=f"Exercise {i}", slug=f"exercise-{i}", equipment="barbell")
+            for i in range(10)
+        ]
+        self.exercise = self.exercises[0]
+
+    def _session(self, *sets):
+        session = WorkoutSession.objects.create(owner=self.user)
+        for n, (exercise, reps, weight) in enumerate(sets, start=1):
+            SetLog.objects.create(session=session, exercise=exercise, set_number=n,
+                                  reps=reps, weight_kg=Decimal(weight))
+        return session
+
+    def _prs(self, exercise=None):
+        return dict(PR.objects.filter(owner=self.user, exercise=exercise or self.exercise)
+                    .values_list('metric', 'value'))
+
+    def test_est_1rm_uses_epley(self):
+        """1RM estimé = charge x (1 + reps / 30), la charge seule pour 1 rep"""
+        update_prs_for_session(self._session((self.exercise, 10, '90.00'), (self.exercise, 1, '115.00')))
+        self.assertEqual(self._prs()['est_1rm'], Decimal('120.00'))
+
+    def test_only_beaten_records_are_updated(self):
+        update_prs_for_session(self._session((self.exercise, 5, '100.00')))
+        update_prs_for_session(self._session((self.exercise, 8, '90.00')))
+
+        self.assertEqual(self._prs(), {
+            'max_weight': Decimal('100.00'),
+            'max_reps': Decimal('8.00'),
+            'est_1rm': Decimal('116.67'),
+        })
+
+    def test_query_count_does_not_grow_with_exercises(self):
+        """Une séance de 10 exercices coûte autant de requêtes qu'une séance d'un exercice"""
+        single = self._session((self.exercise, 5, '50.00'))
+        with CaptureQueriesContext(connection) as one:
+            update_prs_for_session(single)
+
+        PR.objects.all().delete()
+        session = self._session(*[(ex, 5, '50.00') for ex in self.exercises])
+        with CaptureQueriesContext(connection) as ten:
+            update_prs_for_session(session)
+
+        self.assertEqual(len(ten), len(one))
+        self.assertEqual(PR.objects.filter(owner=self.user).count(), 30)
+
+    def test_deleting_the_record_holder_recomputes_from_history(self):
+        update_prs_for_session(self._session((self.exercise, 5, '100.00')))
+        best = self._session((self.exercise, 3, '120.00'))
+        update_prs_for_session(best)
+
+        records = pr_engine.held_records(self.user, best.set_logs.all())
+        self.assertEqual(records, {(self.exercise.pk, 'max_weight'), (self.exercise.pk, 'est_1rm')})
+        best.delete()
+        pr_engine.recompute_records(self.user, records)
+
+        self.assertEqual(self._prs()['max_weight'], Decimal('100.00'))
+        self.assertEqual(self._prs()['est_1rm'], Decimal('116.67'))
+
+    def test_deleting_other_sets_does_not_touch_records(self):
+        update_prs_for_session(self._session((self.exercise, 5, '100.00')))
+        weaker = self._session((self.exercise, 2, '60.00'))
+        update_prs_for_session(weaker)
+
+        self.assertEqual(pr_engine.held_records(self.user, weaker.set_logs.all()), set())
+
+    def test_records_are_deleted_with_the_last_set(self):
+        session = self._session((self.exercise, 5, '100.00'))
+        update_prs_for_session(session)
+        records = pr_engine.held_records(self.user, session.set_logs.all())
+        session.delete()
+        pr_engine.recompute_records(self.user, records)
+
+        self.assertEqual(self._prs(), {})
+
+
+    def test_records_are_dated_by_their_session(self):
+        old, older = date.today() - timedelta(days=3), date.today() - timedelta(days=10)
+        first = self._session((self.exercise, 5, '100.00'))
+        first.date = older
+        first.save()
+        update_prs_for_session(first)
+        best = self._session((self.exercise, 3, '120.00'))
+        best.date = old
+        best.save()
+        update_prs_for_session(best)
+
+        dates = dict(PR.objects.filter(owner=self.user).values_list('metric', 'date'))
+        self.assertEqual(dates, {'max_weight': old, 'max_reps': older, 'est_1rm': old})
+
+        records = pr_engine.held_records(self.user, best.set_logs.all())
+        best.delete()
+        pr_engine.recompute_records(self.user, records)
+        self.assertEqual(set(PR.objects.filter(owner=self.user).values_list('date', flat=True)), {older})
+
+
+class PRHistoryTests(TestCase):
+    """Tests de l'historique des PR et des courbes de progression"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='progress', password='password123')
+        self.exercise = Exercise.objects.create(name="Press", slug="press", equipment="barbell")
+        self.start = date(2024, 1, 1)
+        # One session per week, 2.5 kg more each time (1 rep: est_1rm == weight)
+        for week in range(8):
+            session = WorkoutSession.objects.create(owner=self.user)
+            WorkoutSession.objects.filter(pk=session.pk).update(date=self.start + timedelta(weeks=week))
+            session.refresh_from_db()
+            SetLog.objects.create(session=session, exercise=self.exercise, set_number=1,
+                                  reps=1, weight_kg=Decimal('60.00') + Decimal('2.5') * week)
+            update_prs_for_session(session)
+
+    def test_each_record_is_appended(self):
+        history = PRHistory.objects.filter(owner=self.user, metric="max_weight")
+        self.assertEqual(history.count(), 8)
+        self.assertEqual(history.last().date, self.start + timedelta(weeks=7))
+        # max_reps only set once (always 1 rep)
+        self.assertEqual(PRHistory.objects.filter(owner=self.user, metric="max_reps").count(), 1)
+
+    def test_progression_range_and_downsampling(self):
+        points = pr_engine.progression(self.user, self.exercise.pk, start=date(2024, 1, 15), end=date(2024, 1, 31))
+        self.assertEqual([p["value"] for p in points], [65.0, 67.5, 70.0])
+
+        monthly = pr_engine.progression(self.user, self.exercise.pk, downsample="month")
+        self.assertEqual(monthly, [
+            {"date": date(2024, 1, 1), "value": 70.0},
+            {"date": date(2024, 2, 1), "value": 77.5},
+        ])
+
+    def test_rebuild_replays_sessions(self):
+        before = list(PRHistory.objects.values_list('metric', 'value', 'date').order_by('date', 'metric'))
+        PRHistory.objects.all().delete()
+
+        rebuilt = pr_engine.rebuild_pr_history([self.user.pk])
+
+        self.assertEqual(rebuilt, len(before))
+        self.assertEqual(list(PRHistory.objects.values_list('metric', 'value', 'date').order_by('date', 'metric')), before)
+
+    def test_history_goes_away_with_the_session(self):
+        WorkoutSession.objects.filter(owner=self.user).order_by('-date').first().delete()
+        self.assertEqual(PRHistory.objects.filter(owner=self.user, metric="max_weight").count(), 7)
+
+    def test_deleting_the_record_set_rewrites_history(self):
+        session = WorkoutSession.objects.filter(owner=self.user).order_by('-date').first()
+        record = SetLog.objects.create(session=session, exercise=self.exercise, set_number=2,
+                                       reps=1, weight_kg=Decimal('200.00'))
+        pr_engine.apply_new_set_logs(self.user, SetLog.objects.filter(pk=record.pk), day=session.date, session=session)
+        self.assertEqual(pr_engine.progression(self.user, self.exercise.pk, metric="max_weight")[-1]["value"], 200.0)
+
+        self.client.force_login(self.user)
+        self.client.post(reverse('workouts:set_log_delete', args=[session.pk, record.pk]))
+
+        for metric in ("max_weight", "est_1rm"):
+            self.assertEqual(PR.objects.get(owner=self.user, exercise=self.exercise, metric=metric).value, Decimal('77.50'))
+            points = pr_engine.progression(self.user, self.exercise.pk, metric=metric)
+            self.assertEqual(len(points), 8)
+            self.assertEqual(max(p["value"] for p in points), 77.5)
+        data = self.client.get(reverse('workouts:exercise_progression', args=[self.exercise.pk])).json()
+        self.assertEqual(data["points"][-1]["value"], 77.5)
+
+    def test_progression_endpoint(self):
+        self.client.force_login(self.user)
+        url = reverse('workouts:exercise_progression', args=[self.exercise.pk])
+
+        response = self.client.get(url, {"metric": "max_weight", "downsample": "week"})
+        data = response.json()
+        self.assertEqual(len(data["points"]), 8)
+        self.assertEqual(data["points"][0], {"date": "2024-01-01", "value": 60.0})
+
+        self.assertEqual(self.client.get(url, {"metric": "bogus"}).status_code, 400)
+
+
 class WorkoutViewTests(TestCase):
     """Tests pour les vues de l'app workouts"""
     
@@ -5,6 +5,7 @@ app_name = 'workouts'
 
 urlpatterns = [
     path("exercises/", views.exercise_list, name="exercise_list"),
+    path("exercises/<int:pk>/progression/", views.exercise_progression, name="exercise_progression"),
     path("templates/", views.template_list, name="template_list"),
     path("templates/new/", views.template_create, name="template_create"),
     path("templates/<int:pk>/", views.template_detail, name="template_detail"),
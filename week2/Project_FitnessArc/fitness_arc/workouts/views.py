@@ -1,13 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
+from django.utils.dateparse import parse_date
 from django.contrib.auth.decorators import login_required
 from accounts.decorators import feature_required
 from .models import Exercise, WorkoutTemplate, TemplateItem, WorkoutSession, SetLog, SportCategory
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Max
 from .forms import TemplateItemForm
 import json
-from django.db.models import Max
 from .models import WorkoutSession, SetLog, PR 
+from . import pr_engine
+# Re-exported: historical import path of the PR update
+from .pr_engine import update_prs_for_session
 
 @feature_required('workouts')
 def exercise_list(request):
@@ -122,7 +127,9 @@ def session_detail(request, pk):
             if reps:
                 set_log_data["reps"] = int(reps)
         
-        SetLog.objects.create(**set_log_data)
+        # Le SetLog et les totaux de la séance (signal) sont écrits ensemble
+        with transaction.atomic():
+            SetLog.objects.create(**set_log_data)
         return redirect("workouts:session_detail", pk=pk)
     return render(request, "workouts/session_detail.html", {"session": sess})
 
@@ -177,60 +184,6 @@ def template_delete(request, pk):
         return redirect("workouts:template_list")
     return render(request, "workouts/template_confirm_delete.html", {"template": tpl})
 
-def update_prs_for_session(session):
-    """
-    Met à jour les PR (records) de l'utilisateur pour tous les exercices
-    présents dans cette séance.
-    """
-    user = session.owner
-
-    # All exercises used in this session
-    exercise_ids = (
-        session.set_logs
-        .values_list('exercise_id', flat=True)
-        .distinct()
-    )
-
-    for ex_id in exercise_ids:
-
-        # ----- PR de CHARGE MAX (max_weight) -----
-        agg_weight = (
-            SetLog.objects
-            .filter(session__owner=user, exercise_id=ex_id)
-            .aggregate(max_w=Max("weight_kg"))
-        )
-        max_weight = agg_weight["max_w"]
-
-        if max_weight is not None:
-            pr, created = PR.objects.get_or_create(
-                owner=user,
-                exercise_id=ex_id,
-                metric="max_weight",
-                defaults={"value": max_weight},
-            )
-            if not created and max_weight > pr.value:
-                pr.value = max_weight
-                pr.save()
-
-        # ----- PR de REPS MAX (max_reps) -----
-        agg_reps = (
-            SetLog.objects
-            .filter(session__owner=user, exercise_id=ex_id)
-            .aggregate(max_r=Max("reps"))
-        )
-        max_reps = agg_reps["max_r"]
-
-        if max_reps is not None:
-            pr, created = PR.objects.get_or_create(
-                owner=user,
-                exercise_id=ex_id,
-                metric="max_reps",
-                defaults={"value": max_reps},
-            )
-            if not created and max_reps > pr.value:
-                pr.value = max_reps
-                pr.save()
-
 @login_required
 def complete_session(request, pk):
     """Terminer une séance et afficher le récapitulatif"""
@@ -252,8 +205,9 @@ def complete_session(request, pk):
         # Otherwise, finish the session normally
         sess.duration_minutes = max(1, duration_minutes)  # Minimum 1 minute
         sess.is_completed = True
-        sess.save()
-        update_prs_for_session(sess)
+        with transaction.atomic():
+            sess.save()
+            update_prs_for_session(sess)
         messages.success(request, f"Séance terminée ! Durée : {sess.duration_minutes} min | Calories : {sess.estimated_calories_burned} kcal")
         return redirect("workouts:session_summary", pk=sess.pk)
     
@@ -264,10 +218,6 @@ def session_summary(request, pk):
     """Afficher le récapitulatif d'une séance terminée"""
     sess = get_object_or_404(WorkoutSession, pk=pk, owner=request.user)
     
-    # Calculer les statistiques
-    total_sets = sess.set_logs.count()
-    total_reps = sum(log.reps if log.reps else 0 for log in sess.set_logs.all())
-    
     # Grouper les logs par exercice
     exercises_data = {}
     for log in sess.set_logs.select_related('exercise'):
@@ -299,8 +249,8 @@ def session_summary(request, pk):
     
     context = {
         'session': sess,
-        'total_sets': total_sets,
-        'total_reps': total_reps,
+        'total_sets': sess.total_sets,
+        'total_reps': sess.total_reps,
         'exercises_data': exercises_data,
     }
     return render(request, "workouts/session_summary.html", context)
@@ -311,60 +261,12 @@ def session_delete(request, pk):
     sess = get_object_or_404(WorkoutSession, pk=pk, owner=request.user)
     
     if request.method == "POST":
-        # Get all affected exercises before deletion
-        exercise_ids = set(sess.set_logs.values_list('exercise_id', flat=True))
-        
-        # Delete session (SetLogs will be deleted by cascade)
-        sess.delete()
-        
-        # Recalculate PRs for all affected exercises
-        for ex_id in exercise_ids:
-            # Recalculer max_weight
-            agg_weight = SetLog.objects.filter(
-                session__owner=request.user,
-                exercise_id=ex_id
-            ).aggregate(max_w=Max("weight_kg"))
-            max_weight = agg_weight["max_w"]
-            
-            if max_weight is not None:
-                pr, _ = PR.objects.get_or_create(
-                    owner=request.user,
-                    exercise_id=ex_id,
-                    metric="max_weight",
-                    defaults={"value": max_weight}
-                )
-                pr.value = max_weight
-                pr.save()
-            else:
-                # Plus aucun log pour cet exercice, supprimer le PR
-                PR.objects.filter(
-                    owner=request.user,
-                    exercise_id=ex_id,
-                    metric="max_weight"
-                ).delete()
-            
-            # Recalculer max_reps
-            agg_reps = SetLog.objects.filter(
-                session__owner=request.user,
-                exercise_id=ex_id
-            ).aggregate(max_r=Max("reps"))
-            max_reps = agg_reps["max_r"]
-            
-            if max_reps is not None:
-                pr, _ = PR.objects.get_or_create(
-                    owner=request.user,
-                    exercise_id=ex_id,
-                    metric="max_reps",
-                    defaults={"value": max_reps}
-                )
-                pr.value = max_reps
-                pr.save()
-            else:
-                PR.objects.filter(
-                    owner=request.user,
-                    exercise_id=ex_id,
-                    metric="max_reps"
-                ).delete()
+        with transaction.atomic():
+            # Records held by this session's sets, recomputed once it is gone
+            records = pr_engine.held_records(request.user, sess.set_logs.all())
+            # Delete session (SetLogs will be deleted by cascade)
+            sess.delete()
+            pr_engine.recompute_records(request.user, records)
         
         messages.success(request, "Séance supprimée. Les statistiques ont été mises à jour.")
         return redirect("dashboard:index")
@@ -378,54 +280,42 @@ def set_log_delete(request, session_pk, log_pk):
     log = get_object_or_404(SetLog, pk=log_pk, session=sess)
     
     if request.method == "POST":
-        exercise_id = log.exercise_id
-        log.delete()
-        
-        # Recalculer les PRs pour cet exercice
-        agg_weight = SetLog.objects.filter(
-            session__owner=request.user,
-            exercise_id=exercise_id
-        ).aggregate(max_w=Max("weight_kg"))
-        max_weight = agg_weight["max_w"]
-        
-        if max_weight is not None:
-            pr, _ = PR.objects.get_or_create(
-                owner=request.user,
-                exercise_id=exercise_id,
-                metric="max_weight",
-                defaults={"value": max_weight}
-            )
-            pr.value = max_weight
-            pr.save()
-        else:
-            PR.objects.filter(
-                owner=request.user,
-                exercise_id=exercise_id,
-                metric="max_weight"
-            ).delete()
-        
-        agg_reps = SetLog.objects.filter(
-            session__owner=request.user,
-            exercise_id=exercise_id
-        ).aggregate(max_r=Max("reps"))
-        max_reps = agg_reps["max_r"]
-        
-        if max_reps is not None:
-            pr, _ = PR.objects.get_or_create(
-                owner=request.user,
-                exercise_id=exercise_id,
-                metric="max_reps",
-                defaults={"value": max_reps}
-            )
-            pr.value = max_reps
-            pr.save()
-        else:
-            PR.objects.filter(
-                owner=request.user,
-                exercise_id=exercise_id,
-                metric="max_reps"
-            ).delete()
+        with transaction.atomic():
+            # Only a set holding a record triggers a recompute from history
+            records = pr_engine.held_records(request.user, SetLog.objects.filter(pk=log.pk))
+            log.delete()
+            pr_engine.recompute_records(request.user, records)
         
         messages.success(request, "Série supprimée.")
     
-    return redirect("workouts:session_detail", pk=session_pk)
\ No newline at end of file
+    return redirect("workouts:session_detail", pk=session_pk)
+
+@login_required
+def exercise_progression(request, pk):
+    """
+    Courbe de progression d'un exercice (JSON) lue depuis PRHistory.
+    ?metric=est_1rm|max_weight|max_reps&start=YYYY-MM-DD&end=YYYY-MM-DD&downsample=week|month
+    """
+    exercise = get_object_or_404(Exercise, pk=pk)
+    metric = request.GET.get("metric", "est_1rm")
+    if metric not in pr_engine.METRICS:
+        return JsonResponse({"error": f"Métrique inconnue : {metric}"}, status=400)
+    downsample = request.GET.get("downsample") or None
+    if downsample not in (None, "week", "month"):
+        return JsonResponse({"error": f"Regroupement inconnu : {downsample}"}, status=400)
+
+    try:
+        start = parse_date(request.GET.get("start", ""))
+        end = parse_date(request.GET.get("end", ""))
+    except ValueError:
+        return JsonResponse({"error": "Date invalide"}, status=400)
+
+    points = pr_engine.progression(
+        request.user, exercise.pk, metric=metric, start=start, end=end, downsample=downsample,
+    )
+    return JsonResponse({
+        "exercise": exercise.name,
+        "metric": metric,
+        "downsample": downsample,
+        "points": [{"date": p["date"].isoformat(), "value": p["value"]} for p in points],
+    })